@@ -0,0 +1,54 @@
+"""Compares two benchmark reports created by `run.py`.
+
+Usage::
+
+	python benchmarks/compare.py baseline.json current.json --threshold 10
+
+Exits with status 1 if any case regressed by more than the threshold percentage."""
+
+import argparse, json, sys
+from pathlib import Path
+
+def load(path: str)->tuple[dict, dict]:
+	"""Loads a report and indexes its results by `(case, terrain, size)`."""
+	report = json.loads(Path(path).read_text("utf-8"))
+	return report, {(r["case"], r["terrain"], r["size"]): r for r in report["results"]}
+
+def main(argv: list[str]|None = None)->int:
+	parser = argparse.ArgumentParser(description="Compare Hydra benchmark reports")
+	parser.add_argument("baseline")
+	parser.add_argument("current")
+	parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown of the median in percent")
+	parser.add_argument("--metric", default="median", choices=("min", "median", "mean"))
+	args = parser.parse_args(argv)
+
+	base_report, base = load(args.baseline)
+	cur_report, cur = load(args.current)
+
+	if base_report["platform"].get("gl_renderer") != cur_report["platform"].get("gl_renderer"):
+		print("Warning: reports come from different GL renderers.", file=sys.stderr)
+	if base_report["settings"] != cur_report["settings"]:
+		print("Warning: reports use different settings.", file=sys.stderr)
+
+	print(f"{'case':<26} {'terrain':<7} {'size':>5} {'base ms':>10} {'cur ms':>10} {'change':>8}")
+	regressions = 0
+	for key in sorted(base.keys() & cur.keys(), key=lambda k: (k[2], k[1], k[0])):
+		a = base[key][args.metric]
+		b = cur[key][args.metric]
+		change = (b - a) / a * 100 if a > 0 else 0.0
+		flag = ""
+		if change > args.threshold:
+			flag = "  REGRESSION"
+			regressions += 1
+		ra, rb = base[key].get("result"), cur[key].get("result")
+		if ra and rb and ra["checksum"] != rb["checksum"]:
+			flag += "  OUTPUT CHANGED"
+		print(f"{key[0]:<26} {key[1]:<7} {key[2]:>5} {a * 1000:10.2f} {b * 1000:10.2f} {change:+7.1f}%{flag}")
+
+	for key in sorted(base.keys() ^ cur.keys()):
+		print(f"{key[0]:<26} {key[1]:<7} {key[2]:>5} only in {'baseline' if key in base else 'current'}")
+
+	return 1 if regressions else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,303 @@
+"""Headless benchmark runner for Hydra solvers and texture utilities.
+
+Runs inside Blender in background mode, using a standalone ModernGL context::
+
+	blender -b --factory-startup --python benchmarks/run.py -- --sizes 256 1024 --output bench.json
+
+Arguments after `--` are passed to this script, see `--help`. Results are written as JSON
+and can be compared between commits with `benchmarks/compare.py`."""
+
+import argparse, contextlib, importlib.util, io, json, platform, statistics, subprocess, sys, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT.joinpath("src", "hydra")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import synthetic
+
+SCHEMA_VERSION = 1
+"""Version of the emitted JSON layout. Increase when fields change meaning."""
+
+DEFAULT_SIZES = (256, 512, 1024, 2048, 4096, 8192)
+"""Heightmap sizes benchmarked by default."""
+
+PROFILE = {
+	"erosion_subres": 100.0,
+	"erosion_subres_filter": "bilinear",
+	"erosion_hardness_src": "",
+	"mei_water_src": "",
+	"part_iter_num": 10,
+	"mei_iter_num": 20,
+	"thermal_iter_num": 100,
+	"snow_iter_num": 100,
+	"flow_iter_num": 20,
+	"color_iter_num": 20,
+	"erosion_seed": 1,
+	"erosion_deterministic": False,
+}
+"""Fixed settings applied to every benchmarked target. Iteration counts are kept low, so that
+large sizes finish in reasonable time, but are never changed between runs."""
+
+# --------------------------------------------------------- Setup
+
+def load_addon():
+	"""Imports the add-on from the source tree under its installed package name and
+	registers the settings property group.
+
+	:return: Imported `Hydra` package."""
+	spec = importlib.util.spec_from_file_location("Hydra", SRC.joinpath("__init__.py"),
+		submodule_search_locations=[str(SRC)])
+	module = importlib.util.module_from_spec(spec)
+	sys.modules["Hydra"] = module
+	spec.loader.exec_module(module)
+
+	if module._hydra_invalid:
+		raise RuntimeError("ModernGL is not installed for Blender's Python.")
+
+	from Hydra.addon import properties
+	bpy.utils.register_class(properties.ErosionGroup)
+	bpy.types.Image.hydra_erosion = bpy.props.PointerProperty(type=properties.ErosionGroup)
+	return module
+
+def init_context(backend: str|None)->None:
+	"""Creates the standalone context and compiles programs."""
+	from Hydra import common, opengl
+	common.data = common.HydraData()
+	common.data.init_context(standalone=True, backend=backend)
+	opengl.init_context()
+
+def git_info()->dict:
+	"""Returns the current commit and whether the tree has local changes."""
+	def run(*args):
+		return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+	try:
+		return {"commit": run("rev-parse", "HEAD"), "dirty": run("status", "--porcelain", "--untracked-files=no") != ""}
+	except (OSError, subprocess.CalledProcessError):
+		return {"commit": None, "dirty": None}
+
+def make_image(name: str, heights: np.ndarray, profile: dict)->bpy.types.Image:
+	"""Creates a float Blender image from a heightmap array.
+
+	:param name: Image name.
+	:type name: :class:`str`
+	:param heights: Heightmap of shape `(height, width)`.
+	:type heights: :class:`numpy.ndarray`
+	:param profile: Settings to apply to the image.
+	:type profile: :class:`dict`
+	:return: Created image.
+	:rtype: :class:`bpy.types.Image`"""
+	h, w = heights.shape
+	if name in bpy.data.images:
+		bpy.data.images.remove(bpy.data.images[name])
+	img = bpy.data.images.new(name, w, h, alpha=False, float_buffer=True)
+	img.colorspace_settings.name = "Non-Color"
+
+	pixels = np.ones((h, w, 4), dtype=np.float32)
+	pixels[:, :, :3] = heights[:, :, np.newaxis]
+	img.pixels.foreach_set(pixels.ravel())
+
+	hyd = img.hydra_erosion
+	for k, v in profile.items():
+		setattr(hyd, k, v)
+	hyd.img_size = img.size
+	return img
+
+# --------------------------------------------------------- Cases
+
+class Timer:
+	"""Context manager measuring wall time of GPU work. Flushes the GL pipeline on both ends."""
+	def __init__(self, ctx):
+		self.ctx = ctx
+		self.elapsed = 0.0
+
+	def __enter__(self):
+		self.ctx.finish()
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *args):
+		self.ctx.finish()
+		self.elapsed = time.perf_counter() - self.start
+
+def get_cases()->dict:
+	"""Creates the benchmark case table. Each case takes a prepared image and returns elapsed seconds."""
+	from Hydra import common
+	from Hydra.sim import erosion_mei, erosion_particle, thermal, snow, flow, heightmap
+	from Hydra.utils import texture
+
+	def source(img):
+		return common.data.get_map(img.hydra_erosion.map_source).texture
+
+	def timed(fn):
+		def case(img):
+			with Timer(common.data.context) as t:
+				fn(img)
+			return t.elapsed
+		return case
+
+	def particle_color(img):
+		img.hydra_erosion.color_solver = "particle"
+		erosion_particle.color(img)
+
+	def mei_color(img):
+		img.hydra_erosion.color_solver = "pipe"
+		erosion_mei.color(img)
+
+	def clone(img):
+		with Timer(common.data.context) as t:
+			txt = texture.clone(source(img))
+		txt.release()
+		return t.elapsed
+
+	def create(img):
+		with Timer(common.data.context) as t:
+			txt = texture.create_texture(tuple(img.size), channels=1, image=img)
+		txt.release()
+		return t.elapsed
+
+	def write(img):
+		src = source(img)
+		with Timer(common.data.context) as t:
+			texture.write_image("HYD_Bench_Write", src)
+		return t.elapsed
+
+	def half_size(img):
+		return (max(img.size[0] // 2, 1), max(img.size[1] // 2, 1))
+
+	def resize(img):
+		with Timer(common.data.context) as t:
+			txt = heightmap.resize_texture(source(img), half_size(img))
+		txt.release()
+		return t.elapsed
+
+	def subres(img):
+		src = source(img)
+		low = heightmap.resize_texture(src, half_size(img))
+		prior = texture.clone(low)
+		with Timer(common.data.context) as t:
+			txt = heightmap.add_subres(low, prior, src)	# releases low and prior
+		txt.release()
+		return t.elapsed
+
+	return {
+		"mei.erode": timed(erosion_mei.erode),
+		"mei.color": timed(mei_color),
+		"particle.erode": timed(erosion_particle.erode),
+		"particle.color": timed(particle_color),
+		"thermal.erode": timed(thermal.erode),
+		"snow.simulate": timed(snow.simulate),
+		"flow.generate": timed(flow.generate_flow),
+		"texture.clone": clone,
+		"texture.create_texture": create,
+		"texture.write_image": write,
+		"heightmap.resize_texture": resize,
+		"heightmap.add_subres": subres,
+	}
+
+# --------------------------------------------------------- Run
+
+def run(args)->dict:
+	"""Runs all selected cases and returns the JSON report."""
+	load_addon()
+	init_context(args.backend)
+
+	from Hydra import common
+	from Hydra.sim import heightmap
+	from Hydra.utils import texture
+
+	ctx = common.data.context
+	cases = get_cases()
+	selected = [c for c in cases if not args.cases or any(c.startswith(p) for p in args.cases)]
+	profile = {**PROFILE, "erosion_deterministic": args.deterministic}
+
+	results = []
+	for size in args.sizes:
+		for terrain in args.terrains:
+			heights = synthetic.GENERATORS[terrain]((size, size), seed=args.seed)
+			img = make_image(f"HYD_Bench_{terrain}_{size}", heights, profile)
+			img.hydra_erosion.color_src = img.name
+			heightmap.prepare_heightmap(img)
+
+			for name in selected:
+				hyd = img.hydra_erosion
+				common.data.try_release_map(hyd.map_result)
+				hyd.map_result = ""
+
+				times = []
+				for _ in range(args.warmup + args.repeat):
+					common.data.shaders.reset_stats()	# every repetition dispatches the same work
+					out = io.StringIO()
+					with contextlib.redirect_stdout(out if not args.verbose else sys.stdout):
+						times.append(cases[name](img))
+				times = times[args.warmup:]
+
+				entry = {
+					"case": name,
+					"terrain": terrain,
+					"size": size,
+					"times": times,
+					"min": min(times),
+					"median": statistics.median(times),
+					"mean": statistics.fmean(times),
+					"dispatches": {k: v.to_dict() for k, v in common.data.shaders.stats.items()},
+				}
+				if common.data.has_map(hyd.map_result):	# solver output, checksums match between commits in deterministic mode
+					entry["result"] = texture.get_statistics(common.data.get_map(hyd.map_result).texture)
+				results.append(entry)
+				print(f"{name:<26} {terrain:<5} {size:>5}: {statistics.median(times) * 1000:10.2f} ms", file=sys.stderr)
+
+			common.data.free_all()
+			bpy.data.images.remove(img)
+
+	return {
+		"schema": SCHEMA_VERSION,
+		"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		**git_info(),
+		"platform": {
+			"python": platform.python_version(),
+			"blender": bpy.app.version_string,
+			"system": platform.platform(),
+			"gl_vendor": ctx.info.get("GL_VENDOR"),
+			"gl_renderer": ctx.info.get("GL_RENDERER"),
+			"gl_version": ctx.info.get("GL_VERSION"),
+		},
+		"settings": {
+			"seed": args.seed,
+			"repeat": args.repeat,
+			"warmup": args.warmup,
+			"profile": profile,
+		},
+		"results": results,
+	}
+
+def parse_args(argv: list[str]):
+	parser = argparse.ArgumentParser(prog="run.py", description="Hydra benchmark suite")
+	parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Square heightmap sizes in pixels")
+	parser.add_argument("--terrains", nargs="+", default=list(synthetic.GENERATORS), choices=list(synthetic.GENERATORS))
+	parser.add_argument("--cases", nargs="+", default=[], help="Only run cases starting with these prefixes, e.g. 'mei' or 'texture.clone'")
+	parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per case")
+	parser.add_argument("--warmup", type=int, default=1, help="Untimed repetitions per case")
+	parser.add_argument("--seed", type=int, default=0, help="Terrain generator seed")
+	parser.add_argument("--deterministic", action="store_true", help="Use deterministic particle accumulation, so result checksums are comparable")
+	parser.add_argument("--backend", default=None, help="Standalone context backend, e.g. 'egl' for headless machines")
+	parser.add_argument("--output", default=None, help="JSON output path. Prints to stdout if omitted")
+	parser.add_argument("--verbose", action="store_true", help="Show solver output")
+	return parser.parse_args(argv)
+
+def main():
+	argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+	args = parse_args(argv)
+	report = json.dumps(run(args), indent=1)
+
+	if args.output:
+		Path(args.output).write_text(report, "utf-8")
+	else:
+		print(report)
+
+if __name__ == "__main__":
+	main()
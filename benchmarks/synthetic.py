@@ -0,0 +1,94 @@
+"""Synthetic heightmap generators used by the benchmark suite.
+
+All generators are seeded and return `float32` arrays of shape `(height, width)` in the range [0,1],
+so the same terrain is produced on every machine and every commit."""
+
+import numpy as np
+
+def _upsample(grid: np.ndarray, size: tuple[int,int])->np.ndarray:
+	"""Bilinearly upsamples a coarse grid to the specified size.
+
+	:param grid: Coarse grid of shape `(gy, gx)`.
+	:type grid: :class:`numpy.ndarray`
+	:param size: Target size as `(width, height)`.
+	:type size: :class:`tuple[int,int]`
+	:return: Upsampled grid.
+	:rtype: :class:`numpy.ndarray`"""
+	gy, gx = grid.shape
+	x = np.linspace(0, gx - 1, size[0], dtype=np.float32)
+	y = np.linspace(0, gy - 1, size[1], dtype=np.float32)
+
+	x0 = np.minimum(x.astype(np.int32), gx - 2)
+	y0 = np.minimum(y.astype(np.int32), gy - 2)
+	fx = (x - x0)[np.newaxis, :]
+	fy = (y - y0)[:, np.newaxis]
+
+	top = grid[y0][:, x0] * (1 - fx) + grid[y0][:, x0 + 1] * fx
+	bottom = grid[y0 + 1][:, x0] * (1 - fx) + grid[y0 + 1][:, x0 + 1] * fx
+	return top * (1 - fy) + bottom * fy
+
+def _normalize(ar: np.ndarray)->np.ndarray:
+	"""Rescales an array into the range [0,1]."""
+	lo, hi = ar.min(), ar.max()
+	if hi - lo < 1e-12:
+		return np.zeros_like(ar, dtype=np.float32)
+	return ((ar - lo) / (hi - lo)).astype(np.float32)
+
+def fbm(size: tuple[int,int], seed: int=0, octaves: int=8, persistence: float=0.5)->np.ndarray:
+	"""Fractional Brownian motion built from octaves of value noise.
+
+	:param size: Heightmap size as `(width, height)`.
+	:type size: :class:`tuple[int,int]`
+	:param seed: Random generator seed.
+	:type seed: :class:`int`
+	:param octaves: Number of noise octaves.
+	:type octaves: :class:`int`
+	:param persistence: Amplitude multiplier between octaves.
+	:type persistence: :class:`float`
+	:return: Normalized heightmap.
+	:rtype: :class:`numpy.ndarray`"""
+	rng = np.random.default_rng(seed)
+	ret = np.zeros((size[1], size[0]), dtype=np.float32)
+	amplitude = 1.0
+	for octave in range(octaves):
+		cells = 2 ** (octave + 1) + 1
+		if cells > max(size):
+			break
+		grid = rng.random((cells, cells), dtype=np.float32)
+		ret += amplitude * _upsample(grid, size)
+		amplitude *= persistence
+	return _normalize(ret)
+
+def ramp(size: tuple[int,int], seed: int=0)->np.ndarray:
+	"""Linear slope along the X axis with a faint noise layer to seed erosion channels.
+
+	:param size: Heightmap size as `(width, height)`.
+	:type size: :class:`tuple[int,int]`
+	:param seed: Random generator seed.
+	:type seed: :class:`int`
+	:return: Normalized heightmap.
+	:rtype: :class:`numpy.ndarray`"""
+	x = np.linspace(0, 1, size[0], dtype=np.float32)[np.newaxis, :]
+	ret = np.broadcast_to(x, (size[1], size[0])) + 0.02 * fbm(size, seed=seed, octaves=6)
+	return _normalize(ret)
+
+def cone(size: tuple[int,int], seed: int=0)->np.ndarray:
+	"""Single centered peak with a faint noise layer.
+
+	:param size: Heightmap size as `(width, height)`.
+	:type size: :class:`tuple[int,int]`
+	:param seed: Random generator seed.
+	:type seed: :class:`int`
+	:return: Normalized heightmap.
+	:rtype: :class:`numpy.ndarray`"""
+	x = np.linspace(-1, 1, size[0], dtype=np.float32)[np.newaxis, :]
+	y = np.linspace(-1, 1, size[1], dtype=np.float32)[:, np.newaxis]
+	ret = np.maximum(1 - np.sqrt(x * x + y * y), 0) + 0.02 * fbm(size, seed=seed, octaves=6)
+	return _normalize(ret)
+
+GENERATORS = {
+	"fbm": fbm,
+	"ramp": ramp,
+	"cone": cone,
+}
+"""Available terrain generators by name."""
@@ -7,6 +7,8 @@ layout (r32f) uniform image2D img_add;
 
 void main(void) {
     ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(base, imageSize(img_in_out))))
+        return;
     vec4 add = imageLoad(img_add, base) + imageLoad(img_in_out, base);
     imageStore(img_in_out, base, add);
     imageStore(img_add, base, vec4(0.0));
@@ -0,0 +1,17 @@
+#version 430
+
+layout(local_size_x = 32, local_size_y = 32, local_size_z = 1) in;
+
+layout (r32f) uniform image2D height_map;
+layout (r32i) uniform iimage2D delta_map;
+
+uniform float fixed_scale = 1048576.0;
+
+void main(void) {
+	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(height_map)))) return;
+
+	float delta = float(imageLoad(delta_map, base).x) / fixed_scale;
+	imageStore(height_map, base, imageLoad(height_map, base) + vec4(delta));
+	imageStore(delta_map, base, ivec4(0));
+}
@@ -8,6 +8,8 @@ layout (r32f) uniform image2D img_out;
 
 void main(void) {
     ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(base, imageSize(img_in))))
+        return;
     
     float weights[5] = float[](0.15246914402033734, 0.22184129554377693, 0, 0.22184129554377693, 0.15246914402033734);
     
@@ -0,0 +1,20 @@
+#version 430
+
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
+
+layout (r32f) uniform image2D A;
+layout (r32f) uniform image2D B;
+layout (rgba32f) uniform image2D O;//output
+
+uniform float factor = 1.0;
+uniform float scale = 1.0;
+uniform ivec2 size;
+
+void main() {
+	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, size)))
+		return;
+
+	float value = scale * (imageLoad(A, base).x + factor * imageLoad(B, base).x);
+	imageStore(O, base, vec4(value, value, value, 1.0));
+}
@@ -4,6 +4,7 @@ layout(local_size_x = 32, local_size_y = 32, local_size_z = 1) in;
 
 uniform sampler2D height_sampler;
 layout (r32f) uniform image2D flow;
+layout (r32ui) uniform uimage2D flow_log;	// fixed-point -log(1-flow) in deterministic mode
 
 uniform ivec2 tile_size = ivec2(32, 32);
 uniform vec2 tile_mult = vec2(1.0/512.0,1.0/512.0);
@@ -17,30 +18,32 @@ uniform float strength = 0.10;
 
 uniform int seed = 1;
 
+uniform bool deterministic = false;
+uniform float fixed_scale = 1048576.0;
+
+const uint SATURATED = 1u << 30; // 1 - exp(-1024) == 1.0, further additions can't change the result
+
+void blend(ivec2 pos, float f) {
+	if (deterministic) {
+		// surf * (1-f) + f == 1 - (1-surf) * (1-f) -> sum logarithms of (1-f) in integers
+		if (imageLoad(flow_log, pos).x < SATURATED) {
+			imageAtomicAdd(flow_log, pos, uint(round(-log(1 - f) * fixed_scale)));
+		}
+	} else {
+		float surf = imageLoad(flow, pos).x;
+		imageStore(flow, pos, vec4(surf * (1-f) + f));
+	}
+}
+
 void add_flow(vec2 pos, float strength) {
 	pos -= vec2(0.5,0.5);
 	vec2 factor = pos - floor(pos);
 	ivec2 corner = ivec2(floor(pos));
 	
-	//X Y
-	float f = strength * (1-factor.x) * (1-factor.y);
-	float surf = imageLoad(flow, corner).x;
-	imageStore(flow, corner, vec4(surf * (1-f) + f));
-	
-	//X+1 Y
-	f = strength * factor.x * (1-factor.y);
-	surf = imageLoad(flow, corner + ivec2(1,0)).x;
-	imageStore(flow, corner + ivec2(1,0), vec4(surf * (1-f) + f));
-
-	//X Y+1
-	f = strength * (1-factor.x) * factor.y;
-	surf = imageLoad(flow, corner + ivec2(0,1)).x;
-	imageStore(flow, corner + ivec2(0,1), vec4(surf * (1-f) + f));
-	
-	//X+1 Y+1
-	f = strength * factor.x * factor.y;
-	surf = imageLoad(flow, corner + ivec2(1,1)).x;
-	imageStore(flow, corner + ivec2(1,1), vec4(surf * (1-f) + f));
+	blend(corner, strength * (1-factor.x) * (1-factor.y));	//X Y
+	blend(corner + ivec2(1,0), strength * factor.x * (1-factor.y));	//X+1 Y
+	blend(corner + ivec2(0,1), strength * (1-factor.x) * factor.y);	//X Y+1
+	blend(corner + ivec2(1,1), strength * factor.x * factor.y);	//X+1 Y+1
 }
 
 // pcg3d hashing algorithm from:
@@ -0,0 +1,16 @@
+#version 430
+
+layout(local_size_x = 32, local_size_y = 32, local_size_z = 1) in;
+
+layout (r32ui) uniform uimage2D flow_log;
+layout (r32f) uniform image2D flow;
+
+uniform float fixed_scale = 1048576.0;
+
+void main(void) {
+	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(flow)))) return;
+
+	float acc = float(imageLoad(flow_log, base).x) / fixed_scale;
+	imageStore(flow, base, vec4(1 - exp(-acc)));
+}
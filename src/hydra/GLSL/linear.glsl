@@ -1,6 +1,6 @@
 #version 430
 
-layout(local_size_x = 1, local_size_y = 1, local_size_z = 1) in;
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
 
 layout (r32f) uniform image2D map;
 
@@ -13,6 +13,8 @@ float toLinear(float C) {
 
 void main(void) {
     ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(base, imageSize(map))))
+        return;
 	
 	vec4 col = imageLoad(map, base);
 	col.x = toLinear(col.x);
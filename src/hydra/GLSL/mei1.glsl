@@ -22,6 +22,8 @@ uint pcg(uint v)
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(d_map))))
+		return;
 	vec4 d = imageLoad(d_map, pos);
 
 	float kr;
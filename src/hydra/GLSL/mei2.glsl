@@ -29,6 +29,8 @@ float heightAt(ivec2 pos) {
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(pipe_map))))
+		return;
 
 	float h = heightAt(pos); 
 	vec4 pipe = imageLoad(pipe_map, pos);
@@ -21,6 +21,8 @@ uniform float ly = 1;
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(pipe_map))))
+		return;
 
     vec4 pipe = imageLoad(pipe_map, pos);
     float inflow =
@@ -31,6 +31,8 @@ float heightAt(ivec2 pos) {
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(pipe_map))))
+		return;
 
     vec4 pipe = imageLoad(pipe_map, pos);
     float dmean = imageLoad(dmean_map, pos).r;
@@ -55,7 +57,6 @@ void main(void) {
     float slope = sqrt(gradient);
     
     float C = slope * length(vec2(u,v)) * Kc * max(1 - depth_scale * dmean, 0);
-    ivec2 size = imageSize(pipe_map);
 
     imageStore(dmean_map, pos, vec4(C));
 }//main
@@ -16,6 +16,8 @@ uniform float Kd = 0.25;
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(d_map))))
+		return;
 
 	float c = imageLoad(c_map, pos).x;
     float b = imageLoad(b_map, pos).x;
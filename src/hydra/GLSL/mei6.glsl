@@ -14,6 +14,8 @@ uniform vec2 tile_mult = vec2(1/512, 1/512);
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(v_map))))
+		return;
 
 	vec2 vel = dt * imageLoad(v_map, pos).xy;
     vec2 vpos = vec2(pos) - vel;
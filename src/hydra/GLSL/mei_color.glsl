@@ -18,6 +18,8 @@ uniform vec2 tile_mult = vec2(1/512, 1/512);
 
 void main(void) {
 	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, imageSize(v_map))))
+		return;
 
 	vec2 vel = imageLoad(v_map, pos).xy;
 	float color_factor = clamp(
@@ -6,6 +6,7 @@ uniform sampler2D height_sampler;
 uniform sampler2D hardness_sampler;
 
 layout (r32f) uniform image2D height_map;
+layout (r32i) uniform iimage2D delta_map;	// fixed-point changes in deterministic mode
 
 uniform ivec2 tile_size = ivec2(32,32);
 uniform vec2 tile_mult = vec2(1.0/512.0,1.0/512.0);
@@ -28,6 +29,9 @@ uniform float max_change = 0.01;
 uniform bool use_hardness = false;
 uniform bool invert_hardness = false;
 
+uniform bool deterministic = false;
+uniform float fixed_scale = 1048576.0;
+
 // pcg3d hashing algorithm from:
 // Author: Mark Jarzynski and Marc Olano
 // Title: Hash Functions for GPU Rendering
@@ -88,7 +92,11 @@ void erode(uvec2 base, int seed) {
 		saturation += dif;
 		
 		ivec2 ipos = ivec2(floor(pos));
-		imageStore(height_map, ipos, imageLoad(height_map, ipos) - vec4(dif));
+		if (deterministic) { // integer addition is order-independent
+			imageAtomicAdd(delta_map, ipos, -int(round(dif * fixed_scale)));
+		} else {
+			imageStore(height_map, ipos, imageLoad(height_map, ipos) - vec4(dif));
+		}
 
 		pos += dir;
 		
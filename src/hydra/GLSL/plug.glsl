@@ -1,12 +1,14 @@
 #version 430
 
-layout(local_size_x = 32, local_size_y = 32, local_size_z = 1) in;
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
 
 layout (r32f) uniform image2D inMap;
 layout (r32f) uniform image2D outMap;
 
 void main(void) {
     ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(base, imageSize(inMap))))
+        return;
 	
 	vec4 col = imageLoad(inMap, base);
     float val = imageLoad(inMap, base+ivec2(-1,0)).x +
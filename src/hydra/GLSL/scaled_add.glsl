@@ -1,6 +1,6 @@
 #version 430
 
-layout(local_size_x = 1, local_size_y = 1, local_size_z = 1) in;
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
 
 layout (r32f) uniform image2D A;//output
 layout (r32f) uniform image2D B;//base
@@ -10,6 +10,8 @@ uniform float scale = 1.0;
 
 void main() {
 	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(A))))
+		return;
 	vec4 dif = scale * (imageLoad(A,base) + factor * imageLoad(B,base));
 	imageStore(A, base, dif);
 }
@@ -1,11 +1,13 @@
 #version 430
 
-layout(local_size_x = 1, local_size_y = 1, local_size_z = 1) in;
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
 
 layout (r32f) uniform image2D A;//output
 uniform float scale = 1.0;
 
 void main() {
 	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(A))))
+		return;
 	imageStore(A, base, imageLoad(A,base) * scale);
 }
\ No newline at end of file
@@ -8,6 +8,8 @@ uniform float snow_add = 0.0;
 
 void main(void) {
     ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(base, imageSize(mapH))))
+        return;
     float h1 = imageLoad(mapH, base).x;
     imageStore(mapH, base, vec4(h1 + snow_add));
 }
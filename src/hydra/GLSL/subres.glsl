@@ -0,0 +1,49 @@
+#version 430
+
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
+
+uniform sampler2D height;//low resolution result
+uniform sampler2D prior;//low resolution source
+layout (r32f) uniform image2D base;//full resolution source
+layout (r32f) uniform image2D O;//output
+
+uniform ivec2 size;
+uniform bool bicubic = false;
+
+vec4 catmull_rom(float t) {
+	return vec4(
+		t * (-0.5 + t * (1.0 - 0.5 * t)),
+		1.0 + t * t * (-2.5 + 1.5 * t),
+		t * (0.5 + t * (2.0 - 1.5 * t)),
+		t * t * (-0.5 + 0.5 * t)
+	);
+}
+
+float difference(vec2 uv) {
+	if (!bicubic)
+		return texture(height, uv).x - texture(prior, uv).x;
+
+	ivec2 low = textureSize(height, 0);
+	vec2 p = uv * vec2(low) - 0.5;
+	vec2 i = floor(p);
+	vec4 wx = catmull_rom(p.x - i.x);
+	vec4 wy = catmull_rom(p.y - i.y);
+
+	float ret = 0.0;
+	for (int y = 0; y < 4; y++) {
+		for (int x = 0; x < 4; x++) {
+			ivec2 c = clamp(ivec2(i) + ivec2(x - 1, y - 1), ivec2(0), low - 1);
+			ret += wx[x] * wy[y] * (texelFetch(height, c, 0).x - texelFetch(prior, c, 0).x);
+		}
+	}
+	return ret;
+}
+
+void main() {
+	ivec2 pos = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(pos, size)))
+		return;
+
+	vec2 uv = (vec2(pos) + 0.5) / vec2(size);
+	imageStore(O, pos, vec4(imageLoad(base, pos).x + difference(uv)));
+}
@@ -36,6 +36,8 @@ float getH(ivec2 pos) {
 
 void main(void) {
 	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(mapH))))
+		return;
 	
 	float lx = (diagonal ? bx * sqrt(2) : bx) * ds;
 	float ly = (diagonal ? by * sqrt(2) : by) * ds;
@@ -17,6 +17,8 @@ uniform bool diagonal = false;
 
 void main(void) {
 	ivec2 base = ivec2(gl_GlobalInvocationID.xy);
+	if (any(greaterThanEqual(base, imageSize(mapH))))
+		return;
 	
 	float nh = imageLoad(mapH, base).x;
 	vec4 request = imageLoad(requests, base);
@@ -39,6 +39,7 @@ from Hydra import startup
 if not _hydra_invalid:
 	from Hydra import common, opengl
 	from Hydra.addon import get_exports, properties
+	from Hydra.utils import model
 	_classes = get_exports()
 else:
 	from Hydra.addon.preferences import get_exports
@@ -73,6 +74,7 @@ def register():
 
 		bpy.types.Object.hydra_erosion = PointerProperty(type=properties.ErosionGroup)
 		bpy.types.Image.hydra_erosion = PointerProperty(type=properties.ErosionGroup)
+		model.add_handlers()
 
 def unregister():
 	"""Blender Addon unregister function.
@@ -86,6 +88,7 @@ def unregister():
 	if not _hydra_invalid:
 		del bpy.types.Object.hydra_erosion
 		del bpy.types.Image.hydra_erosion
+		model.remove_handlers()
 
 		common.data.free_all()
 		common.data = None
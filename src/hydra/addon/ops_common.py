@@ -2,12 +2,31 @@
 
 import bpy
 from bpy.props import BoolProperty
+import time
 
 from Hydra import common, opengl
-from Hydra.sim import flow, thermal, heightmap, erosion_particle, erosion_mei, snow
-from Hydra.utils import nav, apply
+from Hydra.sim import flow, thermal, heightmap, erosion_particle, erosion_mei, snow, results, history
+from Hydra.utils import nav, apply, texture, cache
 
-class HydraOperator(bpy.types.Operator):
+def is_running()->bool:
+	"""Checks if a progressive solver run is in progress, see :class:`ProgressiveOperator`.
+
+	:return: `True` while running.
+	:rtype: :class:`bool`"""
+	return ProgressiveOperator._active
+
+class LockedOperator(bpy.types.Operator):
+	"""Base for all Hydra operators. Disabled during progressive runs, since they could replace or free maps
+	and change uniforms of programs the run uses."""
+
+	@classmethod
+	def poll(cls, ctx):
+		if is_running():
+			cls.poll_message_set("An erosion is running. Press Esc to stop it")
+			return False
+		return True
+
+class HydraOperator(LockedOperator):
 	bl_options = {'REGISTER'}
 
 	@classmethod
@@ -19,7 +38,7 @@ class HydraOperator(bpy.types.Operator):
 		else:
 			return ctx.object
 
-class ImageOperator(bpy.types.Operator):
+class ImageOperator(LockedOperator):
 	bl_options = {'REGISTER'}
 
 	@classmethod
@@ -31,7 +50,7 @@ class ImageOperator(bpy.types.Operator):
 	def is_space_type(self, name:str)->bool:
 		return name == common._SPACE_IMAGE
 	
-class ObjectOperator(bpy.types.Operator):
+class ObjectOperator(LockedOperator):
 	bl_options = {'REGISTER'}
 
 	@classmethod
@@ -42,8 +61,166 @@ class ObjectOperator(bpy.types.Operator):
 		return name == common._SPACE_OBJECT
 
 #-------------------------------------------- Erosion
+
+SLICE_SECONDS: float = 0.1
+"""Time spent running solver steps per modal timer event. Keeps the UI responsive during progressive runs."""
+
+class ProgressiveOperator(HydraOperator):
+	"""Base for solver operators. Runs solver steps at once, or in time slices with intermediate previews if enabled in preferences."""
+
+	_active: bool = False
+	"""`True` while a progressive run is in progress. Solvers share programs and maps, so all other Hydra operators are disabled meanwhile, see :class:`LockedOperator`."""
+
+	def prepare_key(self, target, solver: str)->None:
+		"""Creates the result key from the settings the run starts with, see :func:`Hydra.sim.results.store`.
+
+		:param target: Object or image being eroded.
+		:type target: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+		:param solver: Solver name, see :data:`Hydra.sim.results.SOLVER_FIELDS`.
+		:type solver: :class:`str`"""
+		if not common.data.has_map(target.hydra_erosion.map_base):	# the key contains the Source map
+			heightmap.prepare_heightmap(target)
+		self._key = results.get_key(target, solver)
+
+	def run_steps(self, ctx, target, steps)->set[str]:
+		"""Runs solver steps and calls :meth:`finish` afterwards.
+
+		:param target: Object or image being eroded.
+		:type target: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+		:param steps: Generator yielding `(done, total, height)`, e.g. :func:`Hydra.sim.thermal.erode_steps`.
+		:return: Operator state."""
+		if not common.get_preferences().progressive:
+			for _ in steps:
+				pass
+			return self.finish(ctx, target, True)
+
+		if self.refuse_running():
+			steps.close()
+			return {'CANCELLED'}
+
+		try:
+			self._progress = next(steps)
+		except StopIteration:
+			return self.finish(ctx, target, True)
+
+		self._target = target
+		self._steps = steps
+		self._preview_step = 0
+		self._preview_time = time.perf_counter()
+		self._timer = ctx.window_manager.event_timer_add(0.01, window=ctx.window)
+		ctx.window_manager.modal_handler_add(self)
+		ProgressiveOperator._active = True
+		return {'RUNNING_MODAL'}
+
+	def refuse_running(self)->bool:
+		"""Reports an error if a progressive run is in progress. Has to be checked before changing any maps.
+
+		:return: `True` if the operator must not run.
+		:rtype: :class:`bool`"""
+		if is_running():
+			self.report({'ERROR'}, "Another erosion is running. Press Esc to stop it.")
+			return True
+		return False
+
+	def has_target(self)->bool:
+		"""Checks if the eroded entity still exists.
+
+		:return: `False` if it was removed during the run.
+		:rtype: :class:`bool`"""
+		try:
+			self._target.name
+		except ReferenceError:
+			return False
+		return True
+
+	def modal(self, ctx, event):
+		if not self.has_target():
+			return self.abort(ctx, "The eroded entity was removed.")
+
+		try:
+			if event.type == 'ESC' and event.value == 'PRESS':
+				try:
+					self._steps.send(True)	# creates the Result from the current state
+				except StopIteration:
+					pass
+				return self.end(ctx, False)
+
+			if event.type != 'TIMER':
+				return {'PASS_THROUGH'}
+
+			deadline = time.perf_counter() + SLICE_SECONDS
+			try:
+				while time.perf_counter() < deadline:
+					self._progress = next(self._steps)
+					common.data.context.finish()	# otherwise steps only queue up and the slice doesn't limit GPU time
+			except StopIteration:
+				return self.end(ctx, True)
+
+			done, total, height = self._progress
+			ctx.workspace.status_text_set(f"Hydra: iteration {done}/{total}. Press Esc to stop")
+
+			prefs = common.get_preferences()
+			by_step = prefs.preview_iterations > 0 and done - self._preview_step >= prefs.preview_iterations
+			by_time = prefs.preview_seconds > 0 and time.perf_counter() - self._preview_time >= prefs.preview_seconds
+			if by_step or by_time:
+				apply.update_preview(self._target, height)
+				self._preview_step = done
+				self._preview_time = time.perf_counter()
+		except Exception as e:
+			return self.abort(ctx, f"Erosion failed: {e}")
+
+		return {'RUNNING_MODAL'}
+
+	def stop(self, ctx)->None:
+		"""Removes the timer and unlocks other operators. Safe to call repeatedly."""
+		if self._timer is not None:
+			ctx.window_manager.event_timer_remove(self._timer)
+			self._timer = None
+		ctx.workspace.status_text_set(None)
+		ProgressiveOperator._active = False
+
+	def abort(self, ctx, message: str)->set[str]:
+		"""Cancels a progressive run without creating a Result map.
+
+		:param message: Reported error.
+		:type message: :class:`str`
+		:return: Operator state."""
+		self.stop(ctx)
+		try:
+			self._steps.close()
+		except Exception:	# the run is discarded anyway
+			pass
+		self.report({'ERROR'}, message)
+		return {'CANCELLED'}
+
+	def cancel(self, ctx)->None:
+		"""Called by Blender instead of :meth:`modal` when the handler is removed, e.g. on file load. Discards the run."""
+		self.stop(ctx)
+		try:
+			self._steps.close()
+		except Exception:	# the run is discarded anyway
+			pass
+
+	def end(self, ctx, complete: bool)->set[str]:
+		"""Finishes a progressive run."""
+		self.stop(ctx)
+		if not complete:
+			common.data.add_message("Stopped early.")
+		return self.finish(ctx, self._target, complete)
+
+	def finish(self, ctx, target, complete: bool)->set[str]:
+		"""Called after the solver created the Result map.
+
+		:param target: Object or image being eroded.
+		:type target: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+		:param complete: `False` if the run was stopped early.
+		:type complete: :class:`bool`
+		:return: Operator state."""
+		apply.add_preview(target)
+		common.data.report(self, callerName="Erosion")
+		return {'FINISHED'}
 	
-class ErosionOperator(HydraOperator):
+class ErosionOperator(ProgressiveOperator):
 	bl_label = "Erode"
 	bl_idname = "hydra.erode"
 	bl_description = "Erode object using current settings, or set current result as source and continue"
@@ -54,25 +231,62 @@ class ErosionOperator(HydraOperator):
 	)
 
 	def invoke(self, ctx, event):
+		if self.refuse_running():
+			return {'CANCELLED'}
+
 		target = self.get_target(ctx)
 		hyd = target.hydra_erosion
 
 		if self.apply:
-			heightmap.set_result_as_source(target)
+			history.commit_result(target)
 
+		if results.restore(target, hyd.erosion_solver):
+			common.data.add_message("Restored a cached result.")
+			return self.finish(ctx, target, False)
+
+		self.prepare_key(target, hyd.erosion_solver)
 		if hyd.erosion_solver == "particle":
-			erosion_particle.erode(target)
+			steps = erosion_particle.erode_steps(target)
 		else:
-			erosion_mei.erode(target)
+			steps = erosion_mei.erode_steps(target)
+		return self.run_steps(ctx, target, steps)
 
-		apply.add_preview(target)
+	def finish(self, ctx, target, complete: bool):
+		hyd = target.hydra_erosion
+		if complete:	# stopped runs don't match their settings
+			results.store(target, self._key[1], self._key)	# with the solver the run started with
 
-		common.data.report(self, callerName="Erosion")
-		return {'FINISHED'}
+		if hyd.erosion_deterministic:
+			stats = texture.get_statistics(common.data.get_map(hyd.map_result).texture)
+			common.data.add_message(f"Checksum: {stats['checksum']}")
+
+		return super().finish(ctx, target, complete)
+
+class ResumeOperator(ProgressiveOperator):
+	"""Checkpoint resume operator."""
+	bl_label = "Resume"
+	bl_idname = "hydra.erode_resume"
+	bl_description = "Continues an interrupted water erosion from its last checkpoint"
+
+	def invoke(self, ctx, event):
+		if self.refuse_running():
+			return {'CANCELLED'}
+
+		target = self.get_target(ctx)
+
+		if not erosion_mei.can_resume(target):
+			self.report({'ERROR'}, "No unfinished run to resume.")
+			return {'CANCELLED'}
+
+		try:
+			return self.run_steps(ctx, target, erosion_mei.erode_steps(target, resume=True))
+		except ValueError as e:
+			self.report({'ERROR'}, str(e))
+			return {'CANCELLED'}
 	
 #-------------------------------------------- Thermal
 	
-class ThermalOperator(HydraOperator):
+class ThermalOperator(ProgressiveOperator):
 	"""Thermal erosion operator."""
 	bl_label = "Erode"
 	bl_idname = "hydra.thermal"
@@ -84,17 +298,25 @@ class ThermalOperator(HydraOperator):
 	)
 	
 	def invoke(self, ctx, event):
+		if self.refuse_running():
+			return {'CANCELLED'}
+
 		target = self.get_target(ctx)
 
 		if self.apply:
-			heightmap.set_result_as_source(target)
+			history.commit_result(target)
 
-		thermal.erode(target)
+		if results.restore(target, "thermal"):
+			common.data.add_message("Restored a cached result.")
+			return self.finish(ctx, target, False)
 
-		apply.add_preview(target)
+		self.prepare_key(target, "thermal")
+		return self.run_steps(ctx, target, thermal.erode_steps(target))
 
-		common.data.report(self, callerName="Erosion")
-		return {'FINISHED'}
+	def finish(self, ctx, target, complete: bool):
+		if complete:
+			results.store(target, "thermal", self._key)
+		return super().finish(ctx, target, complete)
 	
 #-------------------------------------------- Snow
 
@@ -113,7 +335,7 @@ class SnowOperator(HydraOperator):
 		target = self.get_target(ctx)
 
 		if self.apply:
-			heightmap.set_result_as_source(target)
+			history.commit_result(target)
 
 		img = snow.simulate(target)
 
@@ -195,7 +417,7 @@ class DecoupleOperator(HydraOperator):
 	
 #-------------------------------------------- Cleanup
 
-class CleanupOperator(bpy.types.Operator):
+class CleanupOperator(LockedOperator):
 	"""Resource release operator."""
 	bl_idname = "hydra.release_cache"
 	bl_label = "Clear all cached data and previews?"
@@ -212,9 +434,38 @@ class CleanupOperator(bpy.types.Operator):
 	def invoke(self, ctx, event):
 		return ctx.window_manager.invoke_confirm(self, event)
 
+class EvictOperator(HydraOperator):
+	"""Inactive map eviction operator."""
+	bl_idname = "hydra.evict_cache"
+	bl_label = "Free VRAM"
+	bl_description = "Moves cached heightmaps of other objects and images out of video memory. They are restored when needed"
+
+	def execute(self, ctx):
+		hyd = self.get_target(ctx).hydra_erosion
+		count = common.data.evict_inactive({hyd.map_base, hyd.map_source, hyd.map_result})
+		common.data.buffers.clear()
+		common.data.render.release_framebuffers()
+		self.report({'INFO'}, f"Evicted {count} cached textures.")
+		return {'FINISHED'}
+
+class ClearDiskCacheOperator(LockedOperator):
+	"""Persistent heightmap cache removal operator."""
+	bl_idname = "hydra.clear_disk_cache"
+	bl_label = "Delete all cached heightmaps from disk?"
+	bl_description = "Deletes the persistent heightmap cache"
+	bl_options = {'REGISTER'}
+
+	def execute(self, ctx):
+		cache.clear()
+		self.report({'INFO'}, "Successfuly deleted cached heightmaps.")
+		return {'FINISHED'}
+
+	def invoke(self, ctx, event):
+		return ctx.window_manager.invoke_confirm(self, event)
+
 #-------------------------------------------- Debug
 	
-class ReloadShadersOperator(bpy.types.Operator):
+class ReloadShadersOperator(LockedOperator):
 	"""Operator for reloading shaders."""
 	bl_idname = "hydra.reload_shaders"
 	bl_label = "Reload shaders"
@@ -230,11 +481,14 @@ class ReloadShadersOperator(bpy.types.Operator):
 def get_exports()->list:
 	return [
 		ErosionOperator,
+		ResumeOperator,
 		FlowOperator,
 		ThermalOperator,
 		SnowOperator,
 		ColorOperator,
 		DecoupleOperator,
 		CleanupOperator,
+		EvictOperator,
+		ClearDiskCacheOperator,
 		ReloadShadersOperator
 	]
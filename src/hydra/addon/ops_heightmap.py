@@ -4,7 +4,7 @@ import bpy, bpy.types
 from bpy.props import StringProperty, BoolProperty
 
 from Hydra import common
-from Hydra.sim import heightmap
+from Hydra.sim import heightmap, history
 from Hydra.utils import nav, texture, apply
 from Hydra.addon import ops_common
 
@@ -33,8 +33,11 @@ class RemovePreviewOp(ops_common.HydraOperator):
 	bl_description = "Remove preview modifier"
 	bl_options = {'REGISTER'}
 
+	keep: BoolProperty(default=False)
+	"""Keeps preview images and node groups for following previews if `True`."""
+
 	def invoke(self, ctx, event):
-		apply.remove_preview()
+		apply.remove_preview(keep=self.keep)
 		return {'FINISHED'}
 
 #-------------------------------------------- Merge
@@ -48,7 +51,7 @@ class MergeOp(ops_common.HydraOperator):
 
 	@classmethod
 	def poll(cls, ctx):
-		return not ctx.object.data.shape_keys or len(ctx.object.data.shape_keys.key_blocks) == 0
+		return super().poll(ctx) and (not ctx.object.data.shape_keys or len(ctx.object.data.shape_keys.key_blocks) == 0)
 
 	def invoke(self, ctx, event):
 		lst = [x for x in ctx.object.modifiers]
@@ -59,7 +62,7 @@ class MergeOp(ops_common.HydraOperator):
 				break
 		
 		apply.remove_preview()
-		heightmap.set_result_as_source(ctx.object, as_base=True)
+		history.commit_result(ctx.object, as_base=True)
 		nav.goto_modifier()
 		return {'FINISHED'}
 
@@ -74,7 +77,7 @@ class MergeShapeOp(ops_common.HydraOperator):
 	def poll(cls, ctx):
 		target = cls.get_target(ctx)
 		m = next((m for m in target.modifiers if m.name.startswith("HYD_")), None)
-		return m and m.type == "DISPLACE"
+		return super().poll(ctx) and m is not None and m.type == "DISPLACE"
 
 	def invoke(self, ctx, event):
 		hyd = next((x for x in ctx.object.modifiers if x.name.startswith("HYD_")), None)
@@ -94,10 +97,53 @@ class MergeShapeOp(ops_common.HydraOperator):
 		name = f"HYD_{ctx.object.name}_Guide"
 		if name in bpy.data.objects:
 			bpy.data.objects.remove(bpy.data.objects[name])
-		heightmap.set_result_as_source(ctx.object)
+		history.commit_result(ctx.object)
 		nav.goto_shape()
 		return {'FINISHED'}
 
+class MergeDirectOp(ops_common.HydraOperator):
+	"""Direct mesh displacement operator."""
+	bl_idname = "hydra.hm_merge_direct"
+	bl_label = "Apply directly"
+	bl_description = "Displaces mesh vertices by the Result directly, without images or modifiers. Requires a mesh without other modifiers"
+	bl_options = {'REGISTER'}
+
+	as_shape: BoolProperty(default=False)
+	"""Applies as a shape key if `True`."""
+
+	@classmethod
+	def description(cls, ctx, properties):
+		if properties.as_shape:
+			return "Applies the Result as a shape key directly, without images or modifiers. Requires a mesh without other modifiers"
+		return cls.bl_description
+
+	@classmethod
+	def poll(cls, ctx):
+		return super().poll(ctx) and ctx.object is not None and ctx.object.type == "MESH"
+
+	def invoke(self, ctx, event):
+		target = ctx.object
+		hyd = target.hydra_erosion
+		if not common.data.has_map(hyd.map_result) or not common.data.has_map(hyd.map_base):
+			self.report({'ERROR'}, "No result to apply")
+			return {'CANCELLED'}
+		if not self.as_shape and target.data.shape_keys and len(target.data.shape_keys.key_blocks) > 0:
+			self.report({'ERROR'}, "Mesh has shape keys, apply as shape instead")
+			return {'CANCELLED'}
+
+		if (mods := apply.get_foreign_modifiers(target)):
+			self.report({'ERROR'}, f"Direct apply needs an unmodified mesh. Apply or remove these modifiers first: {', '.join(mods)}")
+			return {'CANCELLED'}
+
+		apply.remove_preview()
+		apply.displace_mesh(target, as_shape=self.as_shape)
+		history.commit_result(target, as_base=not self.as_shape)
+
+		if self.as_shape:
+			nav.goto_shape()
+		self.report({'INFO'}, f"Successfuly applied result to {target.name}")
+		return {'FINISHED'}
+
 #-------------------------------------------- Move
 
 class MoveOp(ops_common.HydraOperator):
@@ -106,7 +152,7 @@ class MoveOp(ops_common.HydraOperator):
 	bl_description = "Sets the Result heightmap as the new Source map"; bl_options = {'REGISTER'}
 
 	def invoke(self, ctx, event):
-		heightmap.set_result_as_source(self.get_target(ctx))
+		history.commit_result(self.get_target(ctx))
 		return {'FINISHED'}
 
 class MoveBackOp(ops_common.HydraOperator):
@@ -168,6 +214,8 @@ class ClearOp(ops_common.HydraOperator):
 		common.data.try_release_map(hyd.map_source)
 		common.data.try_release_map(hyd.map_result)
 
+		history.discard(target)
+
 		hyd.map_base = ""
 		hyd.map_source = ""
 		hyd.map_result = ""
@@ -266,6 +314,36 @@ class ImageOp(ops_common.HydraOperator):
 		self.report({'INFO'}, f"Created texture: {self.name}")
 		return {'FINISHED'}
 
+#-------------------------------------------- Statistics
+
+def format_statistics(stats: dict)->str:
+	"""Formats a statistics dictionary into a single line."""
+	return ", ".join(f"{k}: {v:.6g}" if isinstance(v, float) else f"{k}: {v}" for k, v in stats.items())
+
+class StatisticsOp(ops_common.HydraOperator):
+	"""Result statistics operator."""
+	bl_idname = "hydra.hm_stats"
+	bl_label = "Statistics"
+	bl_description = "Reports a checksum and statistics of the Result map. Compares it against the golden map, if set"
+
+	def invoke(self, ctx, event):
+		target = self.get_target(ctx)
+
+		if not common.data.has_map(target.hydra_erosion.map_result):
+			self.report({'ERROR'}, "No result to evaluate")
+			return {'CANCELLED'}
+
+		try:
+			stats = heightmap.get_statistics(target)
+		except ValueError as e:
+			self.report({'ERROR'}, str(e))
+			return {'CANCELLED'}
+
+		text = format_statistics(stats)
+		print(f"Result statistics of {target.name}: {text}")
+		self.report({'INFO'}, text)
+		return {'FINISHED'}
+
 #-------------------------------------------- Reload
 
 class ReloadOp(ops_common.HydraOperator):
@@ -279,15 +357,48 @@ class ReloadOp(ops_common.HydraOperator):
 		hyd = target.hydra_erosion
 		data = common.data
 
-		data.try_release_map(hyd.map_source)
-
 		base = data.get_map(hyd.map_base)
 		txt = texture.clone(base.texture)
+		hmid = data.create_map(base.name, txt)
 
-		hyd.map_source = data.create_map(base.name, txt)
+		history.record(target, hyd.map_source, hmid)
+		if hyd.map_result == hyd.map_source:
+			hyd.map_result = ""
+		data.try_release_map(hyd.map_source)
+		hyd.map_source = hmid
 
 		self.report({'INFO'}, "Reloaded base map.")
 		return {'FINISHED'}
+
+#-------------------------------------------- History
+
+class UndoOp(ops_common.HydraOperator):
+	"""Restore previous Source map operator."""
+	bl_idname = "hydra.hm_undo"
+	bl_label = "Undo"
+	bl_description = "Restores the previous Source map from history"
+
+	def invoke(self, ctx, event):
+		if not history.step(self.get_target(ctx), -1):
+			self.report({'ERROR'}, "Nothing to undo.")
+			return {'CANCELLED'}
+
+		self.report({'INFO'}, "Restored previous Source map.")
+		return {'FINISHED'}
+
+class RedoOp(ops_common.HydraOperator):
+	"""Restore next Source map operator."""
+	bl_idname = "hydra.hm_redo"
+	bl_label = "Redo"
+	bl_description = "Restores the next Source map from history"
+
+	def invoke(self, ctx, event):
+		if not history.step(self.get_target(ctx), 1):
+			self.report({'ERROR'}, "Nothing to redo.")
+			return {'CANCELLED'}
+
+		self.report({'INFO'}, "Restored next Source map.")
+		return {'FINISHED'}
 	
 class ForceReloadOp(ops_common.HydraOperator):
 	"""Recalculate base and source maps operator."""
@@ -351,6 +462,7 @@ def get_exports()->list:
 		ClearOp,
 		MergeOp,
 		MergeShapeOp,
+		MergeDirectOp,
 		PreviewOp,
 		RemovePreviewOp,
 		MoveOp,
@@ -359,9 +471,12 @@ def get_exports()->list:
 		ModifierOp,
 		GeometryOp,
 		ImageOp,
+		StatisticsOp,
 		DisplaceOp,
 		BumpOp,
 		ReloadOp,
+		UndoOp,
+		RedoOp,
 		ForceReloadOp,
 		NavToImgOp,
 		NavToObjOp
@@ -1,9 +1,12 @@
 """Module responsible for image operators."""
 
+from bpy_extras.io_utils import ExportHelper
+from bpy.props import StringProperty
+
 from Hydra import common
-from Hydra.utils import apply, texture
+from Hydra.utils import apply, texture, model
 from Hydra.addon import ops_common
-from Hydra.sim import heightmap
+from Hydra.sim import heightmap, history
 
 #-------------------------------------------- Generate
 
@@ -17,6 +20,21 @@ class LandscapeOperator(ops_common.ImageOperator):
 		apply.add_landscape(self.get_target(ctx))
 		return {'FINISHED'}
 
+class LandscapeExportOperator(ops_common.ImageOperator, ExportHelper):
+	"""Landscape export operator."""
+	bl_idname = "hydra.landscape_export"
+	bl_label = "Export Landscape"
+	bl_description = "Export a landscape generated from this heightmap as an OBJ file"
+
+	filename_ext = ".obj"
+	filter_glob: StringProperty(default="*.obj", options={'HIDDEN'})
+
+	def execute(self, ctx):
+		vertices, faces, uvs = apply.get_landscape_geometry(self.get_target(ctx))
+		model.write_obj(self.filepath, vertices, faces, uvs)
+		self.report({'INFO'}, f"Exported {len(faces)} faces into {self.filepath}")
+		return {'FINISHED'}
+
 class OverrideImageOperator(ops_common.ImageOperator):
 	"""Apply result back to original."""
 	bl_idname = "hydra.override_original"
@@ -30,8 +48,10 @@ class OverrideImageOperator(ops_common.ImageOperator):
 			return {'CANCELLED'}
 
 		apply.remove_preview()
-		texture.write_image(target.name, common.data.get_map(target.hydra_erosion.map_result).texture)
-		heightmap.set_result_as_source(target, as_base=True)
+		result = heightmap.expand(common.data.get_map(target.hydra_erosion.map_result).texture)
+		texture.write_image(target.name, result)
+		result.release()
+		history.commit_result(target, as_base=True)
 		target.hydra_erosion.is_generated = False
 		return {'FINISHED'}
 
@@ -40,5 +60,6 @@ class OverrideImageOperator(ops_common.ImageOperator):
 def get_exports()->list:
 	return [
 		LandscapeOperator,
+		LandscapeExportOperator,
 		OverrideImageOperator
 	]
\ No newline at end of file
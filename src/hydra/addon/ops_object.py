@@ -1,6 +1,9 @@
 """Module responsible for object operators."""
 
 import bpy, bpy.types
+from bpy_extras.io_utils import ExportHelper
+from bpy.props import StringProperty
+from pathlib import Path
 
 from Hydra import common
 from Hydra.sim import heightmap
@@ -23,8 +26,13 @@ class HeightmapOperator(ops_common.ObjectOperator):
 
 		normalized = act.hydra_erosion.heightmap_gen_type == "normalized"
 		world_scale = act.hydra_erosion.heightmap_gen_type == "world"
-		local_scale = act.hydra_erosion.heightmap_gen_type == "object"
-		txt = heightmap.generate_heightmap(act, normalized=normalized, world_scale=world_scale, local_scale=local_scale)
+		local_scale = act.hydra_erosion.heightmap_gen_type == "local"
+		try:
+			txt = heightmap.generate_heightmap(act, normalized=normalized, world_scale=world_scale, local_scale=local_scale)
+		except ValueError as e:
+			act.hydra_erosion.img_size = size
+			self.report({'ERROR'}, str(e))
+			return {'CANCELLED'}
 
 		img, _ = texture.write_image(f"HYD_{act.name}_Heightmap", txt)
 		txt.release()
@@ -33,9 +41,26 @@ class HeightmapOperator(ops_common.ObjectOperator):
 		self.report({'INFO'}, f"Successfuly created heightmap: {img.name}")
 		return {'FINISHED'}
 
+class HeightmapExportOperator(ops_common.ObjectOperator, ExportHelper):
+	"""Standalone heightmap file export operator."""
+	bl_idname = "hydra.genheight_export"
+	bl_label = "Export Heightmap"
+	bl_description = "Render heightmap directly into a NumPy file. Renders in tiles, so sizes aren't limited by the GPU"
+
+	filename_ext = ".npy"
+	filter_glob: StringProperty(default="*.npy", options={'HIDDEN'})
+
+	def execute(self, ctx):
+		act = self.get_target(ctx)
+		size = tuple(act.hydra_erosion.heightmap_gen_size)
+		heightmap.export_heightmap(act, Path(self.filepath), size)
+		self.report({'INFO'}, f"Successfuly exported heightmap: {self.filepath}")
+		return {'FINISHED'}
+
 #-------------------------------------------- Exports
 
 def get_exports()->list:
 	return [
-		HeightmapOperator
+		HeightmapOperator,
+		HeightmapExportOperator,
 	]
\ No newline at end of file
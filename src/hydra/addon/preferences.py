@@ -4,9 +4,16 @@ import bpy
 from Hydra import startup
 
 from bpy.props import (
-	BoolProperty, StringProperty, EnumProperty
+	BoolProperty, StringProperty, EnumProperty, IntProperty, FloatProperty
 )
 
+def _update_budget(self, ctx):
+	"""Applies a changed VRAM budget to already cached maps."""
+	if not startup.invalid:
+		from Hydra import common
+		if common.data:
+			common.data.enforce_budget()
+
 class AddonPanel(bpy.types.AddonPreferences):
 	"""Addon preferences panel."""
 	bl_idname = "Hydra"
@@ -28,10 +35,61 @@ class AddonPanel(bpy.types.AddonPreferences):
 	)
 	"""Split direction preference."""
 
+	progressive: BoolProperty(name="Progressive preview", default=False,
+		description="Runs erosion in the background and previews intermediate results. Press Esc to stop a run and keep its current state"
+	)
+	"""Progressive erosion toggle."""
+
+	preview_iterations: IntProperty(name="Every iterations", default=10, min=0,
+		description="Updates the preview after this many iterations. 0 disables"
+	)
+	"""Progressive preview iteration interval."""
+
+	preview_seconds: FloatProperty(name="Every seconds", default=2.0, min=0.0, subtype="TIME_ABSOLUTE", unit="TIME_ABSOLUTE",
+		description="Updates the preview after this much time. 0 disables"
+	)
+	"""Progressive preview time interval."""
+
+	preview_size: IntProperty(name="Preview resolution", default=512, min=16, max=16384,
+		description="Maximum resolution of intermediate object previews"
+	)
+	"""Progressive preview downsampled size."""
+
 	debug_mode: BoolProperty(name="Debug mode", default=False,
 		description="Enables debug mode, giving access to additional operators"
 	)
 
+	vram_budget: IntProperty(name="VRAM budget (MB)", default=0, min=0,
+		update=_update_budget,
+		description="Maximum video memory used by cached heightmaps. Least recently used maps of other objects and images are moved into system memory and restored when needed. 0 means no limit"
+	)
+	"""Cached heightmap VRAM budget in MB."""
+
+	result_cache_size: IntProperty(name="Result cache (MB)", default=256, min=0,
+		description="System memory used to remember erosion results. Eroding again with settings used before on the same Source restores the remembered Result. 0 disables the cache"
+	)
+	"""Memoized solver result limit in MB."""
+
+	spill_to_disk: BoolProperty(name="Spill to disk", default=False,
+		description="Evicted heightmaps are written into memory-mapped files in the cache directory instead of system memory"
+	)
+	"""Evicted heightmap storage toggle."""
+
+	cache_dir: StringProperty(name="Cache directory", default="", subtype="DIR_PATH",
+		description="Directory for Hydra cache files. Uses the system temporary directory if empty"
+	)
+	"""Hydra cache directory."""
+
+	persistent_cache: BoolProperty(name="Persistent heightmap cache", default=False,
+		description="Stores generated object heightmaps in the cache directory. Unchanged objects are loaded instead of generated again, even after restarting Blender"
+	)
+	"""Persistent heightmap cache toggle."""
+
+	cache_limit: IntProperty(name="Cache size limit (MB)", default=1024, min=1,
+		description="Maximum disk space used by the persistent heightmap cache. Least recently used heightmaps are deleted first"
+	)
+	"""Persistent heightmap cache size limit in MB."""
+
 	def draw(self, context):
 		layout = self.layout
 
@@ -43,6 +101,23 @@ class AddonPanel(bpy.types.AddonPreferences):
 		if startup.invalid and not startup.promptRestart:
 			box.enabled = False
 			
+		box.prop(self, "progressive")
+		col = box.column(align=True)
+		col.enabled = self.progressive
+		col.prop(self, "preview_iterations")
+		col.prop(self, "preview_seconds")
+		col.prop(self, "preview_size")
+
+		box.prop(self, "vram_budget")
+		box.prop(self, "result_cache_size")
+		box.prop(self, "spill_to_disk")
+		box.prop(self, "cache_dir")
+		box.prop(self, "persistent_cache")
+		row = box.row()
+		row.prop(self, "cache_limit")
+		if not startup.invalid:
+			row.operator('hydra.clear_disk_cache', text="", icon="TRASH")
+		row.enabled = self.persistent_cache
 		box.prop(self, "debug_mode")
 
 		box = layout.box()
@@ -39,7 +39,8 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		default=(1024,1024),
 		name="Heightmap size",
 		min=32,
-		max=4096,
+		max=16384,
+		soft_max=4096,
 		description="To erode objects, they are first converted into heightmaps. This property defines the heightmap resolution. Once erosion occurs this resolution is set and can only be reset by clearing cached heightmaps",
 		size=2
 	)
@@ -71,6 +72,16 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		description="Percentage of heightmap resolution to simulate at. Lower resolution creates larger features and speeds up simulation time. Simulating at 512x512 is a good starting point for erosion"
 	)
 
+	erosion_subres_filter: EnumProperty(
+		default="bilinear",
+		items=(
+			("bilinear", "Bilinear", "Fast linear interpolation. May show grid artifacts at low simulation resolutions", 0),
+			("bicubic", "Bicubic", "Smoother cubic interpolation. Slightly sharpens the eroded features", 1),
+		),
+		name="Upsampling filter",
+		description="Filter used to resize the simulated difference back to the heightmap resolution"
+	)
+
 	erosion_hardness_src: StringProperty(
 		name="Hardness",
 		description="Terrain hardness texture. Pure white won't be eroded at all, pure black will erode the most"
@@ -81,6 +92,19 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		name="Invert hardness",
 		description="Inverts the hardness map. Black will be eroded the least, white the most"
 	)
+
+	erosion_seed: IntProperty(
+		default=1,
+		min=0,
+		name="Seed",
+		description="Random seed for particle spawning and rainfall"
+	)
+
+	erosion_deterministic: BoolProperty(
+		default=False,
+		name="Deterministic",
+		description="Accumulates particle changes in a fixed order, so that results are identical between runs and GPUs. Slower, used to validate results"
+	)
 	
 	#------------------------- Particle
 
@@ -212,6 +236,25 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		description="Maximum depth of at which erosion can occur. Can help with very deep bodies of water"
 	)
 
+	mei_checkpoint_interval: IntProperty(
+		default=0,
+		min=0, soft_max=100,
+		name="Checkpoint every",
+		description="Saves the full simulation state to the cache directory after this many iterations, so that interrupted runs can be resumed. 0 disables checkpoints"
+	)
+
+	mei_continue_water: BoolProperty(
+		default=False,
+		name="Keep water",
+		description="Set & Continue starts with the water, flow and sediment of the previous run instead of dry terrain"
+	)
+
+	mei_checkpoint: StringProperty(
+		name="Checkpoint",
+		subtype="FILE_PATH",
+		description="Last saved simulation state"
+	)
+
 	#------------------------- Thermal
 	
 	thermal_iter_num: IntProperty(
@@ -416,6 +459,11 @@ class ErosionGroup(bpy.types.PropertyGroup):
 	map_source: StringProperty(name="Source map", description="Source heightmap")
 	map_base: StringProperty(name="Base map", description="Base heightmap")
 
+	stats_golden_src: StringProperty(
+		name="Golden map",
+		description="Reference image to compare Result statistics against"
+	)
+
 	heightmap_gen_type: EnumProperty(
 		default="proportional",
 		items=(
@@ -433,8 +481,9 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		default=(1024,1024),
 		name="Heightmap size",
 		min=16,
-		max=4096,
-		description="Image size for direct heightmap generation",
+		max=65536,
+		soft_max=16384,
+		description="Image size for direct heightmap generation. Sizes over the GPU limit can only be exported into files",
 		size=2
 	)
 	"""Image size for direct heightmap generation."""
@@ -446,6 +495,22 @@ class ErosionGroup(bpy.types.PropertyGroup):
 		description="Resolution divisor for landscape generation"
 	)
 	"""Resolution divisor for landscape generation"""
+
+	gen_adaptive: BoolProperty(
+		default=False,
+		name="Adaptive",
+		description="Generates fewer, larger triangles in flat areas. Triangles are split while the heightmap deviates from their edge midpoints by more than the maximum error. Other points can deviate more"
+	)
+	"""Use adaptive triangulation for landscape generation."""
+
+	gen_max_error: FloatProperty(
+		default=0.001,
+		name="Max error",
+		min=0, soft_max=0.05,
+		precision=4, step=0.01,
+		description="Height deviation at which triangles of adaptive landscapes are split, measured at their edge midpoints. Not a strict bound. Uses heightmap units, the landscape is 2 units wide"
+	)
+	"""Midpoint error threshold of adaptive landscapes."""
 	
 	#------------------------- Funcs
 	
@@ -22,6 +22,37 @@ class HydraPanel(bpy.types.Panel):
 		else:
 			return ctx.object
 		
+	def draw_memory_fragment(self, container):
+		gpu, host, disk = common.data.get_memory_usage()
+		split = container.split(factor=0.5)
+		split.label(text="Cached:")
+		split.label(text=common.format_bytes(gpu))
+		if host > 0:
+			split = container.split(factor=0.5)
+			split.label(text="Evicted:")
+			split.label(text=common.format_bytes(host))
+		if disk > 0:
+			split = container.split(factor=0.5)
+			split.label(text="Spilled:")
+			split.label(text=common.format_bytes(disk))
+		if common.data.results.nbytes > 0:
+			split = container.split(factor=0.5)
+			split.label(text="Results:")
+			split.label(text=common.format_bytes(common.data.results.nbytes))
+		history = sum(i.nbytes for i in common.data.histories.values())
+		if history > 0:
+			split = container.split(factor=0.5)
+			split.label(text="History:")
+			split.label(text=common.format_bytes(history))
+		if common.data.buffers.nbytes > 0:
+			split = container.split(factor=0.5)
+			split.label(text="Buffers:")
+			split.label(text=common.format_bytes(common.data.buffers.nbytes))
+		if common.data.render.nbytes > 0:
+			split = container.split(factor=0.5)
+			split.label(text="Framebuffers:")
+			split.label(text=common.format_bytes(common.data.render.nbytes))
+
 	def draw_nav_fragment(self, container, name, label):
 		if name in bpy.data.images:
 			split = container.split()
@@ -103,6 +134,8 @@ class ErosionPanel():
 		grid.operator("hydra.erode", text="Erode", icon="RNDCURVE").apply = False
 		if common.data.has_map(hyd.map_result):
 			grid.operator("hydra.erode", text="Set & Continue", icon="ANIM").apply = True
+		if hyd.erosion_solver != "particle" and hyd.mei_checkpoint:
+			grid.operator("hydra.erode_resume", text="Resume", icon="RECOVER_LAST")
 
 		self.draw_size_fragment(col.box(), ctx, hyd)
 
@@ -195,6 +228,11 @@ class ExtrasPanel():
 			g.prop(hyd, "flow_iter_num")
 			g.prop(hyd, "part_lifetime")
 			g.prop(hyd, "part_drag", slider=True)
+
+			if hyd.erosion_advanced:
+				g = p.grid_flow(columns=1, align=True)
+				g.prop(hyd, "erosion_seed")
+				g.prop(hyd, "erosion_deterministic")
 		elif hyd.extras_type == "color":
 			p.prop(hyd, "color_solver")
 
@@ -245,7 +283,7 @@ class HeightmapSystemPanel():
 
 		if common.data.has_map(hyd.map_result):
 			has_any = True
-			name = common.data.get_map(hyd.map_result).name
+			name = common.data.peek_map(hyd.map_result).name
 
 			if isinstance(target, bpy.types.Image):
 				box = col.box()
@@ -269,7 +307,7 @@ class HeightmapSystemPanel():
 				split.label(text=name)
 				cols = box.column_flow(columns=3, align=True)
 				if common.data.lastPreview == target.name:
-					cols.operator('hydra.hm_remove_preview', text="", icon="HIDE_ON")
+					cols.operator('hydra.hm_remove_preview', text="", icon="HIDE_ON").keep = True
 				else:
 					cols.operator('hydra.hm_preview', text="", icon="HIDE_OFF")
 				cols.operator('hydra.hm_move', text="", icon="TRIA_DOWN_BAR")
@@ -288,6 +326,10 @@ class HeightmapSystemPanel():
 				cols.operator('hydra.hm_apply_mod', text="", icon="MOD_DISPLACE")
 				cols.operator('hydra.hm_apply_disp', text="", icon="RNDCURVE")
 				cols.operator('hydra.hm_apply_bump', text="", icon="MOD_NOISE")
+
+				cols = grid.column_flow(columns=2, align=True)
+				cols.operator('hydra.hm_merge_direct', text="", icon="VERTEXSEL").as_shape = False
+				cols.operator('hydra.hm_merge_direct', text="", icon="SHAPEKEY_DATA").as_shape = True
 				
 				m = next((m for m in target.modifiers if m.name.startswith("HYD_")), None)
 				if m:
@@ -298,9 +340,13 @@ class HeightmapSystemPanel():
 					else:
 						box.operator('hydra.hm_merge', text="", icon="MESH_DATA")
 
+			if common.get_preferences().debug_mode:
+				box.operator('hydra.hm_stats', icon="INFO")
+				box.prop_search(hyd, "stats_golden_src", bpy.data, "images")
+
 		if common.data.has_map(hyd.map_source):
 			has_any = True
-			name = common.data.get_map(hyd.map_source).name
+			name = common.data.peek_map(hyd.map_source).name
 			box = col.box()
 			split = box.split(factor=0.5)
 			split.label(text="Source:")
@@ -310,6 +356,16 @@ class HeightmapSystemPanel():
 			cols.operator('hydra.hm_move_back', text="", icon="TRIA_UP_BAR")
 			cols.operator('hydra.hm_reload', text="", icon="FILE_REFRESH")
 
+			if target.session_uid in common.data.histories:
+				history = common.data.histories[target.session_uid]
+				cols = box.column_flow(columns=2, align=True)
+				sub = cols.row(align=True)
+				sub.enabled = history.can_undo()
+				sub.operator('hydra.hm_undo', text="", icon="LOOP_BACK")
+				sub = cols.row(align=True)
+				sub.enabled = history.can_redo()
+				sub.operator('hydra.hm_redo', text="", icon="LOOP_FORWARDS")
+
 		if not has_any:
 			col.label(text="No maps have been cached yet.")
 
@@ -326,6 +382,8 @@ class ErosionSettingsPanel(bpy.types.Panel):
 		
 		p.label(text="Simulation resolution:")
 		p.prop(hyd, "erosion_subres", text="", slider=True)
+		if hyd.erosion_advanced and hyd.erosion_subres != 100.0:
+			p.prop(hyd, "erosion_subres_filter", text="")
 		p.separator()
 
 		if hyd.erosion_solver == "particle":
@@ -350,6 +408,10 @@ class ErosionSettingsPanel(bpy.types.Panel):
 				box = p.box()
 				box.prop_search(hyd, "erosion_hardness_src", bpy.data, "images")
 				box.prop(hyd, "erosion_invert_hardness")
+
+				g = p.grid_flow(columns=1, align=True)
+				g.prop(hyd, "erosion_seed")
+				g.prop(hyd, "erosion_deterministic")
 		else:
 			p.prop(hyd, "mei_iter_num")
 
@@ -372,6 +434,12 @@ class ErosionSettingsPanel(bpy.types.Panel):
 				box.prop_search(hyd, "mei_water_src", bpy.data, "images")
 				# box.prop(hyd, "mei_invert_water")
 
+				p.prop(hyd, "erosion_seed")
+
+				g = p.grid_flow(columns=1, align=True)
+				g.prop(hyd, "mei_checkpoint_interval")
+				g.prop(hyd, "mei_continue_water")
+
 
 class ThermalSettingsPanel():
 	bl_label = "Settings"
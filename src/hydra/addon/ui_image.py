@@ -2,6 +2,7 @@
 
 import bpy
 from Hydra.addon import ui_common
+from Hydra.utils import apply, rtin
 
 class LandscapePanel(ui_common.ImagePanel):
 	"""Panel for landscape generation."""
@@ -15,6 +16,17 @@ class LandscapePanel(ui_common.ImagePanel):
 		col = self.layout.column()
 		col.operator('hydra.landscape', text="Generate", icon="RNDCURVE")
 		col.prop(hyd, "gen_subscale")
+		col.prop(hyd, "gen_adaptive")
+		row = col.row()
+		row.prop(hyd, "gen_max_error")
+		row.enabled = hyd.gen_adaptive
+		if hyd.gen_adaptive:
+			grid = apply.get_landscape_grid(act)
+			if max(act.size) / hyd.gen_subscale > rtin.MAX_GRID_SIZE - 1:
+				col.label(text=f"Grid: {grid[0]}x{grid[1]} (limited)", icon="ERROR")
+			else:
+				col.label(text=f"Grid: {grid[0]}x{grid[1]}")
+		col.operator('hydra.landscape_export', text="Export", icon="EXPORT")
 
 #-------------------------------------------- Erosion
 
@@ -83,6 +95,8 @@ class CleanupPanel(ui_common.ImagePanel):
 	def draw(self, ctx):
 		col = self.layout.column()
 		col.operator('hydra.release_cache', text="Clear data", icon="SHADING_BBOX")
+		col.operator('hydra.evict_cache', text="Free VRAM", icon="EXPORT")
+		self.draw_memory_fragment(col.box())
 
 #-------------------------------------------- Exports
 
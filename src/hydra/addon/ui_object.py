@@ -23,12 +23,13 @@ class HeightmapPanel(ui_common.ObjectPanel):
 		col.prop(hyd, "heightmap_gen_type", text="")
 
 		col.prop(hyd, "heightmap_gen_size")
+		col.operator('hydra.genheight_export', text="Export", icon="EXPORT")
 
 		col.separator()
 
 		if data.has_map(hyd.map_base):
 			col.separator()
-			size = data.get_map(hyd.map_base).size
+			size = data.peek_map(hyd.map_base).size
 			split = col.split()
 			split.label(text="Cached:")
 			split.label(text=str(size))
@@ -40,14 +41,14 @@ class HeightmapPanel(ui_common.ObjectPanel):
 		if data.has_map(hyd.map_source):
 			col.separator()
 			split = box.split()
-			name = data.get_map(hyd.map_source).name
+			name = data.peek_map(hyd.map_source).name
 			split.label(text=name)
 			split.operator('hydra.hm_apply_img', text="", icon="IMAGE_DATA").save_target = hyd.map_source
 		
 		if data.has_map(hyd.map_result):
 			col.separator()
 			split = box.split()
-			name = data.get_map(hyd.map_result).name
+			name = data.peek_map(hyd.map_result).name
 			split.label(text=name)
 			split.operator('hydra.hm_apply_img', text="", icon="IMAGE_DATA").save_target = hyd.map_result
 
@@ -117,7 +118,9 @@ class CleanupPanel(ui_common.ObjectPanel):
 	def draw(self, ctx):
 		col = self.layout.column()
 		col.operator('hydra.release_cache', text="Clear data", icon="SHADING_BBOX")
+		col.operator('hydra.evict_cache', text="Free VRAM", icon="EXPORT")
 		col.operator('hydra.hm_remove_preview', text="Remove previews", icon="HIDE_ON")
+		self.draw_memory_fragment(col.box())
 	
 #-------------------------------------------- Debug
 
@@ -2,12 +2,16 @@
 
 import moderngl as mgl
 import bpy, bpy.types
+import numpy as np
 from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Iterator
 
-import uuid, re
+import uuid, re, tempfile, mmap, functools
 
 class Heightmap:
-	"""A wrapper around ModernGL textures."""
+	"""A wrapper around ModernGL textures. The texture can be evicted into host memory or spilled into a memory-mapped file
+	and is restored on access."""
 	def __init__(self, name: str, txt: mgl.Texture):
 		"""Constructor method.
 
@@ -16,33 +20,363 @@ class Heightmap:
 		:param txt: Texture to wrap.
 		:type txt: :class:`moderngl.Texture:`"""
 		self.name = name
-		self.texture = txt
+		self._texture: mgl.Texture | None = txt
+		self._host: np.ndarray | None = None
+		self._spill: Path | None = None
+		self._size: tuple[int,int] = tuple(txt.size)
+		self._components: int = txt.components
+		self._dtype: str = txt.dtype
 	
 	def release(self)->None:
-		"""Releases the stored texture."""
-		self.texture.release()
+		"""Releases the stored texture and evicted data, including spill files."""
+		if self._texture is not None:
+			self._texture.release()
+			self._texture = None
+		self._drop_host()
 	
-	def read(self)->bytes:
-		"""Reads the ModernGL texture.
+	def _drop_host(self)->None:
+		"""Clears evicted data and deletes its spill file."""
+		self._host = None	# closes the memory map
+		if self._spill is not None:
+			self._spill.unlink(missing_ok=True)
+			self._spill = None
+	
+	def read(self)->np.ndarray:
+		"""Reads the ModernGL texture into a new page-aligned array. Doesn't restore evicted maps.
+
+		:return: Pixel data of shape `(height, width, components)`.
+		:rtype: :class:`numpy.ndarray`"""
+		ret = aligned_empty((self._size[1], self._size[0], self._components), self._dtype)
+		if self._texture is None:
+			ret[...] = self._host.reshape(ret.shape)
+		else:
+			self._texture.read_into(ret)
+		return ret
+
+	def evict(self, path: Path | None = None)->None:
+		"""Moves the texture data into host memory and releases the texture.
+
+		:param path: Optional `.npy` file path. If specified, data is written into this file and only memory-mapped.
+		:type path: :class:`pathlib.Path` or :class:`None`"""
+		if self._texture is None:
+			return
+		shape = (self._size[1], self._size[0], self._components)
+		if path is not None:	# staged in a reused buffer, only the file keeps the data
+			ar = data.buffers.get("spill", shape, self._dtype)
+			self._texture.read_into(ar)
+			np.save(path, ar)
+			self._spill = path
+			self._host = np.load(path, mmap_mode="r")
+		else:
+			self._host = aligned_empty(shape, self._dtype)
+			self._texture.read_into(self._host)
+		self._texture.release()
+		self._texture = None
+
+	def restore(self)->None:
+		"""Uploads evicted data back into a texture. Does nothing if the map isn't evicted."""
+		if self._texture is not None:
+			return
+		self._texture = data.context.texture(self._size, self._components, dtype=self._dtype, data=self._host)
+		self._drop_host()
 
-		:return: Pixel data :class:`bytes`.
-		:rtype: :class:`bytes`"""
-		return self.texture.read()
+	def get_texture(self)->mgl.Texture:
+		"""Stored texture property getter. Restores evicted maps.
+
+		:return: Stored texture.
+		:rtype: :class:`moderngl.Texture`"""
+		self.restore()
+		return self._texture
+
+	texture = property(get_texture)
+	"""Stored :class:`moderngl.Texture` property."""
 
 	def get_size(self)->tuple[int,int]:
 		"""Stored texture size property getter.
 
 		:return: Texture size :class:`tuple`.
 		:rtype: :class:`tuple`"""
-		return tuple(self.texture.size)
+		return self._size
 	
 	size = property(get_size)
 	"""Texture size :class:`tuple` property."""
 
+	def get_nbytes(self)->int:
+		"""Stored data size property getter.
+
+		:return: Size of the texture data in bytes.
+		:rtype: :class:`int`"""
+		return self._size[0] * self._size[1] * self._components * 4
+
+	nbytes = property(get_nbytes)
+	"""Texture data size in bytes."""
+
+	def is_evicted(self)->bool:
+		"""Checks if the map is stored in host memory.
+
+		:return: `True` if the texture was released and its data is kept elsewhere.
+		:rtype: :class:`bool`"""
+		return self._texture is None
+
+	def is_spilled(self)->bool:
+		"""Checks if the map is stored in a spill file.
+
+		:return: `True` if the texture data is memory-mapped from disk.
+		:rtype: :class:`bool`"""
+		return self._spill is not None
+
+class ResultCache:
+	"""Least recently used cache of solver results in host memory. Keys start with the ID of the Source map they were computed from."""
+	def __init__(self):
+		"""Constructor method."""
+		self._entries_: dict[tuple, tuple[str, tuple[int,int], bytes | np.ndarray]] = {}
+		"""Cached results as `(name, size, pixel data)` tuples."""
+		self.nbytes: int = 0
+		"""Total size of cached pixel data."""
+
+	def get(self, key: tuple)->tuple[str, tuple[int,int], bytes | np.ndarray] | None:
+		"""Returns a cached result and marks it as recently used.
+
+		:param key: Result key.
+		:type key: :class:`tuple`
+		:return: Map name, size and pixel data, or `None` if not cached.
+		:rtype: :class:`tuple` or :class:`None`"""
+		if key in self._entries_:
+			entry = self._entries_.pop(key)
+			self._entries_[key] = entry
+			return entry
+
+	def put(self, key: tuple, name: str, size: tuple[int,int], raw: bytes | np.ndarray, limit: int)->None:
+		"""Stores a result and evicts least recently used ones over the limit.
+
+		:param key: Result key.
+		:type key: :class:`tuple`
+		:param name: Map name.
+		:type name: :class:`str`
+		:param size: Map size.
+		:type size: :class:`tuple[int,int]`
+		:param raw: Pixel data.
+		:type raw: :class:`bytes` or :class:`numpy.ndarray`
+		:param limit: Cache size limit in bytes.
+		:type limit: :class:`int`"""
+		self.discard(key)
+		nbytes = memoryview(raw).nbytes
+		if nbytes > limit:
+			return
+		self._entries_[key] = (name, size, raw)
+		self.nbytes += nbytes
+
+		while self.nbytes > limit:
+			self.discard(next(iter(self._entries_)))
+
+	def discard(self, key: tuple)->None:
+		"""Removes a result. Does nothing on invalid `key`."""
+		if key in self._entries_:
+			self.nbytes -= memoryview(self._entries_.pop(key)[2]).nbytes
+
+	def discard_source(self, id: str)->None:
+		"""Removes all results computed from the specified Source map."""
+		for key in [k for k in self._entries_ if k[0] == id]:
+			self.discard(key)
+
+	def clear(self)->None:
+		"""Removes all results."""
+		self._entries_ = {}
+		self.nbytes = 0
+
+def aligned_empty(shape: tuple[int, ...], dtype: str | np.dtype = "f4")->np.ndarray:
+	"""Allocates an uninitialized C-contiguous array starting on a memory page boundary.
+	Aligned buffers let drivers copy texture data without an intermediate staging copy.
+
+	:param shape: Array shape.
+	:type shape: :class:`tuple[int, ...]`
+	:param dtype: Element type.
+	:type dtype: :class:`str` or :class:`numpy.dtype`
+	:return: Created array.
+	:rtype: :class:`numpy.ndarray`"""
+	dtype = np.dtype(dtype)
+	nbytes = int(np.prod(shape)) * dtype.itemsize
+	raw = np.empty(nbytes + mmap.PAGESIZE, dtype=np.uint8)
+	offset = -raw.ctypes.data % mmap.PAGESIZE
+	return raw[offset:offset + nbytes].view(dtype).reshape(shape)
+
+class BufferPool:
+	"""Named, reusable page-aligned host buffers for texture readback. Buffers only grow, so reading maps
+	of the same size repeatedly doesn't allocate."""
+	def __init__(self):
+		"""Constructor method."""
+		self._buffers_: dict[str, np.ndarray] = {}
+		"""Raw byte buffers by name."""
+
+	def get(self, name: str, shape: tuple[int, ...], dtype: str | np.dtype = "f4")->np.ndarray:
+		"""Returns a buffer view of the requested shape. Its content is undefined.
+		The view is only valid until the next request of the same name.
+
+		:param name: Buffer name. Callers reading several textures at once have to use different names.
+		:type name: :class:`str`
+		:param shape: View shape.
+		:type shape: :class:`tuple[int, ...]`
+		:param dtype: Element type.
+		:type dtype: :class:`str` or :class:`numpy.dtype`
+		:return: Buffer view.
+		:rtype: :class:`numpy.ndarray`"""
+		dtype = np.dtype(dtype)
+		nbytes = int(np.prod(shape)) * dtype.itemsize
+		buffer = self._buffers_.get(name)
+		if buffer is None or buffer.nbytes < nbytes:
+			buffer = aligned_empty((nbytes,), np.uint8)
+			self._buffers_[name] = buffer
+		return buffer[:nbytes].view(dtype).reshape(shape)
+
+	def clear(self)->None:
+		"""Frees all buffers."""
+		self._buffers_ = {}
+
+	def get_nbytes(self)->int:
+		"""Allocated size property getter."""
+		return sum(i.nbytes for i in self._buffers_.values())
+
+	nbytes = property(get_nbytes)
+	"""Total size of all buffers in bytes."""
+
+class RenderCache:
+	"""Reusable ModernGL render objects. Fullscreen draws and samplers are requested here instead of creating
+	and releasing driver objects on every call."""
+	QUAD: tuple[tuple[float, float, float], ...] = ((1,1,0), (1,-1,0), (-1,-1,0), (1,1,0), (-1,-1,0), (-1,1,0))
+	"""Fullscreen quad vertices."""
+
+	def __init__(self):
+		"""Constructor method."""
+		self._quad_: mgl.Buffer | None = None
+		"""Shared fullscreen quad vertex buffer."""
+		self._vaos_: dict[int, mgl.VertexArray] = {}
+		"""Fullscreen quad VAOs by program."""
+		self._samplers_: dict[tuple, mgl.Sampler] = {}
+		"""Samplers by texture and sampling state."""
+		self._framebuffers_: dict[tuple, mgl.Framebuffer] = {}
+		"""Framebuffers with their own color attachment by size, channel count and data type."""
+
+	def get_quad(self, program: mgl.Program)->mgl.VertexArray:
+		"""Returns a VAO drawing a fullscreen quad with the specified program.
+
+		:param program: Program with a `position` input.
+		:type program: :class:`moderngl.Program`
+		:return: Shared VAO. Must not be released.
+		:rtype: :class:`moderngl.VertexArray`"""
+		vao = self._vaos_.get(program.glo)
+		if vao is None:
+			if self._quad_ is None:
+				self._quad_ = data.context.buffer(data=np.array(self.QUAD, dtype="f4"))
+			vao = data.context.vertex_array(program=program, content=[(self._quad_, "3f", "position")])
+			self._vaos_[program.glo] = vao
+		return vao
+
+	def get_sampler(self, txt: mgl.Texture, repeat: bool = False, filter: tuple[int, int] = (mgl.LINEAR, mgl.LINEAR))->mgl.Sampler:
+		"""Returns a sampler for a texture.
+
+		:param txt: Sampled texture. Bound together with the sampler by :meth:`moderngl.Sampler.use`.
+		:type txt: :class:`moderngl.Texture`
+		:param repeat: Repeats the texture instead of clamping to its edges.
+		:type repeat: :class:`bool`
+		:param filter: Minification and magnification filter.
+		:type filter: :class:`tuple[int, int]`
+		:return: Shared sampler. Must not be released.
+		:rtype: :class:`moderngl.Sampler`"""
+		key = (txt.glo, repeat, filter)
+		sampler = self._samplers_.get(key)
+		if sampler is None:
+			sampler = data.context.sampler(repeat_x=repeat, repeat_y=repeat, filter=filter)
+			self._samplers_[key] = sampler
+		sampler.texture = txt	# texture names are reused after release
+		return sampler
+
+	def get_framebuffer(self, size: tuple[int, int], components: int = 1, dtype: str = "f4")->mgl.Framebuffer:
+		"""Returns a framebuffer with its own color attachment. Results are copied out of it
+		with :meth:`moderngl.Context.copy_framebuffer`.
+
+		:param size: Attachment size.
+		:type size: :class:`tuple[int, int]`
+		:param components: Attachment channel count.
+		:type components: :class:`int`
+		:param dtype: Attachment data type.
+		:type dtype: :class:`str`
+		:return: Shared framebuffer. Must not be released.
+		:rtype: :class:`moderngl.Framebuffer`"""
+		key = (tuple(size), components, dtype)
+		fbo = self._framebuffers_.get(key)
+		if fbo is None:
+			fbo = data.context.framebuffer(color_attachments=(data.context.texture(key[0], components, dtype=dtype),))
+			self._framebuffers_[key] = fbo
+		return fbo
+
+	def release_framebuffers(self)->None:
+		"""Releases all framebuffers and their attachments."""
+		for fbo in self._framebuffers_.values():
+			for i in fbo.color_attachments:
+				i.release()
+			fbo.release()
+		self._framebuffers_ = {}
+
+	def clear(self)->None:
+		"""Releases all render objects."""
+		self.release_framebuffers()
+		for i in self._vaos_.values():
+			i.release()
+		self._vaos_ = {}
+		for i in self._samplers_.values():
+			i.release()
+		self._samplers_ = {}
+		if self._quad_ is not None:
+			self._quad_.release()
+			self._quad_ = None
+
+	def get_nbytes(self)->int:
+		"""Framebuffer attachment size property getter."""
+		return sum(i.width * i.height * i.components * np.dtype(i.dtype).itemsize
+			for fbo in self._framebuffers_.values() for i in fbo.color_attachments)
+
+	nbytes = property(get_nbytes)
+	"""Total size of framebuffer attachments in bytes."""
+
+class DispatchStats:
+	"""Accumulated dispatch counts of a single compute shader."""
+	def __init__(self):
+		"""Constructor method."""
+		self.dispatches: int = 0
+		"""Number of dispatches."""
+		self.groups: int = 0
+		"""Total number of launched workgroups."""
+		self.invocations: int = 0
+		"""Total number of launched invocations."""
+		self.items: int = 0
+		"""Total number of requested invocations, usually pixels. Excess invocations return at bounds guards."""
+
+	def get_occupancy(self)->float:
+		"""Occupancy property getter."""
+		return self.items / self.invocations if self.invocations > 0 else 1.0
+
+	occupancy = property(get_occupancy)
+	"""Fraction of launched invocations doing useful work."""
+
+	def to_dict(self)->dict[str, int | float]:
+		"""Converts the stats into a JSON-compatible dictionary.
+
+		:return: All counters and the occupancy.
+		:rtype: :class:`dict`"""
+		return {"dispatches": self.dispatches, "groups": self.groups, "invocations": self.invocations,
+			"items": self.items, "occupancy": self.occupancy}
+
 class ShaderBank:
+	LOCAL_SIZE: re.Pattern = re.compile(r"local_size_([xyz])\s*=\s*(\d+)")
+	"""Pattern of workgroup size declarations."""
+
 	def __init__(self):
 		"""Sets the GLSL files path."""
 		self.source_path = Path(__file__).resolve().parent.joinpath("GLSL")
+		self.local_sizes: dict[str, tuple[int, int, int]] = {}
+		"""Workgroup sizes of loaded shaders, parsed from their sources."""
+		self.stats: dict[str, DispatchStats] = {}
+		"""Dispatch stats by shader name since the last :meth:`reset_stats`."""
 
 	def __getitem__(self, key: str)->mgl.ComputeShader:
 		"""Lazy-loads and returns the specified compute shader.
@@ -52,11 +386,43 @@ class ShaderBank:
 			if path.exists():
 				comp = path.read_text("utf-8")
 				data._shaders_[key] = data.context.compute_shader(comp)
+				local = dict(self.LOCAL_SIZE.findall(comp))
+				self.local_sizes[key] = tuple(int(local.get(i, 1)) for i in "xyz")
 			else:
 				raise KeyError(f"Shader '{key}' not found.")
 		
 		return data._shaders_[key]
 
+	def dispatch(self, key: str, size: tuple[int, int] | None = None)->mgl.ComputeShader:
+		"""Runs a compute shader with enough workgroups to cover the requested size. Uniforms have to be set beforehand.
+
+		:param key: Shader name.
+		:type key: :class:`str`
+		:param size: Number of invocations along each axis, usually the map size. Shaders have to guard
+			against invocations outside this size, since workgroup counts are rounded up.
+			`None` runs a single workgroup, e.g. for particle solvers looping over their own work.
+		:type size: :class:`tuple[int, int]` or :class:`None`
+		:return: Dispatched shader.
+		:rtype: :class:`moderngl.ComputeShader`"""
+		prog = self[key]
+		lx, ly, lz = self.local_sizes[key]
+		if size is None:
+			size = (lx, ly)
+		gx = -(-size[0] // lx)
+		gy = -(-size[1] // ly)
+		prog.run(group_x=gx, group_y=gy)
+
+		stats = self.stats.setdefault(key, DispatchStats())
+		stats.dispatches += 1
+		stats.groups += gx * gy
+		stats.invocations += gx * gy * lx * ly * lz
+		stats.items += size[0] * size[1]
+		return prog
+
+	def reset_stats(self)->None:
+		"""Clears all dispatch stats."""
+		self.stats = {}
+
 class HydraData(object):
 	"""Global data object. Stores all ModernGL resources, including the context."""
 
@@ -69,6 +435,27 @@ class HydraData(object):
 		self._maps_: dict[str, Heightmap] = {}
 		"""Heightmap dictionary. Uses UUID strings as keys."""
 
+		self.results: ResultCache = ResultCache()
+		"""Memoized solver results."""
+
+		self.buffers: BufferPool = BufferPool()
+		"""Reusable readback buffers. See :func:`Hydra.utils.texture.read_into`."""
+
+		self.render: RenderCache = RenderCache()
+		"""Reusable VAOs, samplers and framebuffers."""
+
+		self.inputs: dict[tuple, tuple[tuple, mgl.Texture]] = {}
+		"""Cached input image textures with their image versions. See :func:`Hydra.utils.texture.get_input_texture`."""
+
+		self.meshes: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+		"""Cached vertex and triangle arrays of evaluated objects by `session_uid`. See :func:`Hydra.utils.model.get_mesh_arrays`."""
+
+		self._running_: list[bpy.types.Object | bpy.types.Image] = []
+		"""Entities with a running solver. See :meth:`running`."""
+
+		self.histories: dict[int, object] = {}
+		"""Source map histories. Uses `session_uid` of objects and images as keys, see :mod:`Hydra.sim.history`."""
+
 		self.programs: dict[str, mgl.Program] = {}
 		"""Compiled ModernGL program list."""
 
@@ -86,9 +473,18 @@ class HydraData(object):
 		self._error_: list[str] = []
 		"""Error message list."""
 	
-	def init_context(self):
-		"""Creates and saves the attached ModernGL :attr:`context`."""
-		self.context = mgl.get_context()	#standalone crashes blender; create_context doesn't work with wayland
+	def init_context(self, standalone: bool=False, backend: str|None=None):
+		"""Creates and saves the attached ModernGL :attr:`context`.
+
+		:param standalone: Creates a standalone context instead of attaching to Blender's. Only usable in background mode.
+		:type standalone: :class:`bool`
+		:param backend: Optional standalone context backend, e.g. `egl` for headless machines.
+		:type backend: :class:`str` or :class:`None`"""
+		if standalone:
+			kwargs = {"backend": backend} if backend else {}
+			self.context = mgl.create_standalone_context(require=430, **kwargs)
+		else:
+			self.context = mgl.get_context()	#standalone crashes blender; create_context doesn't work with wayland
 
 	def has_map(self, id: str | None)->bool:
 		"""Checks if map exists.
@@ -98,9 +494,20 @@ class HydraData(object):
 		return id in self._maps_
 
 	def get_map(self, id: str | None)->Heightmap | None:
-		"""Returns map by ID. Returns `None` if not found."""
+		"""Returns map by ID and marks it as recently used. Evicted maps are restored.
+		Returns `None` if not found."""
 		if id in self._maps_:
-			return self._maps_[id]
+			hm = self._maps_.pop(id)
+			self._maps_[id] = hm	# move to the end -> most recently used
+			hm.restore()
+			if not self._running_:	# solvers keep textures across steps
+				self.enforce_budget()
+			return hm
+
+	def peek_map(self, id: str | None)->Heightmap | None:
+		"""Returns map by ID without restoring it or changing its use order. Meant for UI.
+		Returns `None` if not found."""
+		return self._maps_.get(id)
 
 	def try_release_map(self, id: str | None):
 		"""Release specified map. Does nothing on invalid `id`.
@@ -110,6 +517,7 @@ class HydraData(object):
 		if id in self._maps_:
 			self._maps_[id].release()
 			del self._maps_[id]
+			self.results.discard_source(id)
 	
 	def create_map(self, name: str, txt: mgl.Texture)->str:
 		"""Creates and adds a heightmap into maps. Returns map ID.
@@ -122,7 +530,111 @@ class HydraData(object):
 		:rtype: :class:`str`"""
 		id = str(uuid.uuid4())
 		self._maps_[id] = Heightmap(name, txt)
+		self.enforce_budget()
 		return id
+
+	def get_budget(self)->int:
+		"""Returns the VRAM budget for cached maps.
+
+		:return: Budget in bytes. `0` if unlimited.
+		:rtype: :class:`int`"""
+		try:
+			return get_preferences().vram_budget * 2**20
+		except KeyError:	# not registered as an addon, e.g. in benchmarks
+			return 0
+
+	@contextmanager
+	def running(self, obj: bpy.types.Object | bpy.types.Image)->Iterator[None]:
+		"""Marks a solver run on an entity. Its Base, Source and Result maps are pinned in VRAM
+		and reading maps doesn't evict anything until the run ends.
+
+		:param obj: Processed object or image.
+		:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
+		self._running_.append(obj)
+		try:
+			yield
+		finally:
+			self._running_.remove(obj)
+
+	def get_pinned(self)->set[str]:
+		"""Returns IDs of maps, which can't be evicted.
+
+		:return: Maps of entities with a running solver.
+		:rtype: :class:`set[str]`"""
+		ret = set()
+		for obj in self._running_:
+			try:
+				hyd = obj.hydra_erosion
+			except ReferenceError:	# removed during the run
+				continue
+			ret.update((hyd.map_base, hyd.map_source, hyd.map_result))
+		return ret
+
+	def enforce_budget(self)->None:
+		"""Evicts least recently used maps into host memory or spill files until cached textures fit into the VRAM budget.
+		The last :data:`ACTIVE_MAPS` used maps and pinned maps are never evicted, see :meth:`running`."""
+		budget = self.get_budget()
+		if budget <= 0:
+			return
+
+		used = sum(i.nbytes for i in self._maps_.values() if not i.is_evicted())
+		candidates = list(self._maps_.items())[:-ACTIVE_MAPS]
+		pinned = self.get_pinned()
+		for id, hm in candidates:
+			if used <= budget:
+				break
+			if id not in pinned and not hm.is_evicted():
+				self.evict_map(id)
+				used -= hm.nbytes
+
+	def get_spill_dir(self)->Path | None:
+		"""Returns the directory for spilled maps. Creates it if needed.
+
+		:return: Spill directory, or `None` if spilling to disk is disabled.
+		:rtype: :class:`pathlib.Path` or :class:`None`"""
+		try:
+			if not get_preferences().spill_to_disk:
+				return None
+		except KeyError:
+			return None
+		return get_cache_dir("spill")
+
+	def evict_map(self, id: str)->None:
+		"""Evicts the specified map. Writes it into the spill directory if enabled, otherwise keeps it in host memory.
+
+		:param id: Map ID.
+		:type id: :class:`str`"""
+		hm = self._maps_[id]
+		if hm.is_evicted():
+			return
+		spill = self.get_spill_dir()
+		hm.evict(spill.joinpath(f"{id}.npy") if spill else None)
+
+	def evict_inactive(self, keep: set[str])->int:
+		"""Evicts all maps except the specified ones.
+
+		:param keep: IDs of maps to keep in VRAM.
+		:type keep: :class:`set[str]`
+		:return: Number of evicted maps.
+		:rtype: :class:`int`"""
+		count = 0
+		keep = keep | self.get_pinned()
+		for id, hm in self._maps_.items():
+			if id not in keep and not hm.is_evicted():
+				self.evict_map(id)
+				count += 1
+		return count
+
+	def get_memory_usage(self)->tuple[int, int, int]:
+		"""Returns memory used by cached maps.
+
+		:return: Bytes used in VRAM, in host memory and in spill files.
+		:rtype: :class:`tuple[int,int,int]`"""
+		gpu = sum(i.nbytes for i in self._maps_.values() if not i.is_evicted())
+		gpu += sum(txt.width * txt.height * txt.components * 4 for _, txt in self.inputs.values())
+		host = sum(i.nbytes for i in self._maps_.values() if i.is_evicted() and not i.is_spilled())
+		disk = sum(i.nbytes for i in self._maps_.values() if i.is_spilled())
+		return gpu, host, disk
 	
 	def report(self, caller, callerName:str="Hydra")->None:
 		"""Shows either stored error or info messages and clears them.
@@ -144,6 +656,18 @@ class HydraData(object):
 		for i in self._maps_.values():
 			i.release()
 		self._maps_ = {}
+		self.results.clear()
+		self.histories = {}
+		self.release_inputs()
+		self.buffers.clear()
+		self.render.release_framebuffers()
+		self.meshes = {}
+
+	def release_inputs(self)->None:
+		"""Releases cached input image textures."""
+		for _, txt in self.inputs.values():
+			txt.release()
+		self.inputs = {}
 
 	def add_message(self, message: str, error: bool=False)->None:
 		"""Adds an info message.
@@ -165,6 +689,15 @@ class HydraData(object):
 
 #-------------------------------------------- Extra
 
+def solver_steps(fn: Callable[..., Iterator])->Callable[..., Iterator]:
+	"""Decorates solver step generators taking the processed entity as their first argument.
+	Maps of the entity stay pinned until the generator finishes or is closed, see :meth:`HydraData.running`."""
+	@functools.wraps(fn)
+	def wrapper(obj, *args, **kwargs):
+		with data.running(obj):
+			return (yield from fn(obj, *args, **kwargs))
+	return wrapper
+
 def show_message(message: str, title:str="Hydra", icon:str='INFO')->None:
 	"""Displays a message as popup.
 
@@ -199,6 +732,34 @@ def increment_layer(name: str, default: str)->str:
 	else:
 		return default
 
+def get_cache_dir(name: str)->Path:
+	"""Returns a subdirectory of the cache directory set in preferences. Creates it if needed.
+
+	:param name: Subdirectory name.
+	:type name: :class:`str`
+	:returns: Cache subdirectory path. Uses the system temporary directory if no cache directory is set."""
+	try:
+		root = get_preferences().cache_dir
+	except KeyError:	# not registered as an addon
+		root = ""
+	path = Path(bpy.path.abspath(root)) if root else Path(tempfile.gettempdir(), "hydra_cache")
+	path = path.joinpath(name)
+	path.mkdir(parents=True, exist_ok=True)
+	return path
+
+def format_bytes(size: int)->str:
+	"""Formats a byte count for display.
+
+	:param size: Number of bytes.
+	:type size: :class:`int`
+	:returns: Size in MB or GB."""
+	if size >= 2**30:
+		return f"{size / 2**30:.2f} GB"
+	return f"{size / 2**20:.1f} MB"
+
+ACTIVE_MAPS: int = 3
+"""Number of most recently used maps, which are never evicted. Covers the Base, Source and Result maps of the processed entity."""
+
 _SPACE_OBJECT = "VIEW_3D"
 _SPACE_IMAGE = "IMAGE_EDITOR"
 
@@ -12,6 +12,7 @@ def init_context():
 	dr = Path(__file__).resolve().parent
 	base = Path(dr, "GLSL")
 
+	data.render.clear()	# VAOs are bound to the released programs
 	for prog in data.programs.values():
 		prog.release()
 	
@@ -6,15 +6,37 @@ from Hydra import common
 from moderngl import Texture
 
 import bpy, bpy.types, math
+import numpy as np
+import os, tempfile, uuid
+from pathlib import Path
 from datetime import datetime
 
+CHECKPOINT_VERSION: int = 1
+"""Version of the checkpoint file layout."""
+
 # --------------------------------------------------------- Erosion
 
-def erode(obj: bpy.types.Object | bpy.types.Image)->None:
+def erode(obj: bpy.types.Object | bpy.types.Image, resume: bool = False)->None:
 	"""Erodes the specified entity.
 	
 	:param obj: Object or image to erode.
-	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param resume: Continues the run saved in the last checkpoint instead of starting from the Source map.
+	:type resume: :class:`bool`"""
+	for _ in erode_steps(obj, resume):
+		pass
+
+@common.solver_steps
+def erode_steps(obj: bpy.types.Object | bpy.types.Image, resume: bool = False):
+	"""Erodes the specified entity step by step. See :func:`erode`.
+
+	Yields `(done, total, height)` after every iteration, where `height` is the current heightmap texture,
+	possibly in simulation resolution. Sending `True` stops the run early, the Result is then created from the current state.
+
+	:param obj: Object or image to erode.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param resume: Continues the run saved in the last checkpoint instead of starting from the Source map.
+	:type resume: :class:`bool`"""
 	print("Preparing for water erosion")
 	data = common.data
 	ctx = data.context
@@ -25,6 +47,16 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 
 	size = hyd.get_size()
 
+	checkpoint = None
+	if resume:
+		checkpoint = load_checkpoint(hyd.mei_checkpoint)
+		if checkpoint is None:
+			raise ValueError("No checkpoint to resume from.")
+	elif hyd.mei_continue_water:
+		checkpoint = load_checkpoint(hyd.mei_checkpoint)
+		if checkpoint is not None and str(checkpoint["result"]) != hyd.map_source:	# previous Result wasn't set as Source
+			checkpoint = None
+
 	BIND_HEIGHT = 1 # don't use 0 -> default value -> cross-contamination
 	BIND_PIPE = 2
 	BIND_VELOCITY = 3
@@ -38,45 +70,63 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 
 	if hyd.erosion_subres != 100.0:
 		size = (math.ceil(size[0] * hyd.erosion_subres / 100.0), math.ceil(size[1] * hyd.erosion_subres / 100.0))
-		height = heightmap.resize_texture(data.get_map(hyd.map_source).texture, size)
+
+	if checkpoint is not None and checkpoint["water"].shape[:2] != (size[1], size[0]):
+		if resume:
+			raise ValueError("Checkpoint was saved with a different resolution.")
+		checkpoint = None
+
+	source = data.get_map(hyd.map_source).texture
+	restored_source = resume and "source" in checkpoint
+	if resume:
+		height = texture.create_texture(size, pixels=checkpoint["height"].tobytes())
+		height_base = texture.create_texture(size, pixels=checkpoint["height_base"].tobytes()) if "height_base" in checkpoint else None
+		if restored_source:
+			source = texture.create_texture(hyd.get_size(), pixels=checkpoint["source"].tobytes())
+	elif hyd.erosion_subres != 100.0:
+		height = heightmap.resize_texture(source, size)
 		height_base = texture.clone(height)
 	else:
-		height = texture.clone(data.get_map(hyd.map_source).texture)
+		height = texture.clone(source)
 		height_base = None
 
-	pipe = texture.create_texture(size, channels=4)
-	velocity = texture.create_texture(size, channels=2)
-	water = texture.create_texture(size)
-	sediment = texture.create_texture(size)
+	def restore(name: str, channels: int)->Texture:
+		pixels = checkpoint[name].tobytes() if checkpoint is not None else None
+		return texture.create_texture(size, channels=channels, pixels=pixels)
+
+	pipe = restore("pipe", 4)
+	velocity = restore("velocity", 2)
+	water = restore("water", 1)
+	sediment = restore("sediment", 1)
 	temp = texture.create_texture(size)	# capacity, water and sediment at different stages
 
 	if hyd.erosion_hardness_src in bpy.data.images:
-		hardness = texture.create_texture(size, channels=1, image=bpy.data.images[hyd.erosion_hardness_src])
+		hardness = texture.get_input_texture(bpy.data.images[hyd.erosion_hardness_src], size)
 	else:
 		hardness = None
 
 	if hyd.mei_water_src in bpy.data.images:
-		water_src = texture.create_texture(size, channels=1, image=bpy.data.images[hyd.mei_water_src])
+		water_src = texture.get_input_texture(bpy.data.images[hyd.mei_water_src], size)
 	else:
 		water_src = None
 
-	height.bind_to_image(BIND_HEIGHT, read=True, write=True)
-	pipe.bind_to_image(BIND_PIPE, read=True, write=True)
-	velocity.bind_to_image(BIND_VELOCITY, read=True, write=True)
-	water.bind_to_image(BIND_WATER, read=True, write=True)
-	sediment.bind_to_image(BIND_SEDIMENT, read=True, write=True)
-	temp.bind_to_image(BIND_TEMP, read=True, write=True)
+	sedimentSampler = data.render.get_sampler(temp) # sediment will be in temp at stage 6
+	velocity_sampler = data.render.get_sampler(velocity)
 
-	sedimentSampler = ctx.sampler(texture=temp, repeat_x=False, repeat_y=False) # sediment will be in temp at stage 6
-	temp.use(LOC_SEDIMENT)
-	sedimentSampler.use(LOC_SEDIMENT)
+	def bind():	# also called after yielding, previews use the same units
+		height.bind_to_image(BIND_HEIGHT, read=True, write=True)
+		pipe.bind_to_image(BIND_PIPE, read=True, write=True)
+		velocity.bind_to_image(BIND_VELOCITY, read=True, write=True)
+		water.bind_to_image(BIND_WATER, read=True, write=True)
+		sediment.bind_to_image(BIND_SEDIMENT, read=True, write=True)
+		temp.bind_to_image(BIND_TEMP, read=True, write=True)
 
-	velocity_sampler = ctx.sampler(texture=velocity, repeat_x=False, repeat_y=False)
-	velocity_sampler.use(LOC_VELOCITY)
-	velocity.use(LOC_VELOCITY)
+		temp.use(LOC_SEDIMENT)
+		sedimentSampler.use(LOC_SEDIMENT)
+		velocity_sampler.use(LOC_VELOCITY)
+		velocity.use(LOC_VELOCITY)
 
-	group_x = math.ceil(size[0] / 32)
-	group_y = math.ceil(size[1] / 32)
+	bind()
 
 	progs = [
 		data.shaders["mei1"],
@@ -143,45 +193,65 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 	progs[5]["dt"] = dt
 	progs[5]["tile_mult"] = (1 / size[0], 1 / size[1])
 
+	# settings read after yielding are copied, they stay editable during progressive runs
+	seed = hyd.erosion_seed
+	continue_water = hyd.mei_continue_water
+	subres_filter = hyd.erosion_subres_filter
+
+	total = int(checkpoint["total"]) if resume else hyd.mei_iter_num * 10
+	start = int(checkpoint["iteration"]) if resume else 0
+	interval = hyd.mei_checkpoint_interval * 10
+	state = {"height": height, "height_base": height_base, "pipe": pipe, "velocity": velocity, "water": water, "sediment": sediment}
+	if height_base is not None:	# needed to resize back after a restart
+		state["source"] = source
+
+	done = start
 	time = datetime.now()
-	for i in range(hyd.mei_iter_num * 10):
+	for i in range(start, total):
 		if water_src is not None:
 			water_src.bind_to_image(BIND_EXTRA, read=True, write=False)
 		
-		progs[0]["seed"] = i
-		progs[0].run(group_x=group_x, group_y=group_y)
+		progs[0]["seed"] = seed + i
+		data.shaders.dispatch("mei1", size)
 		
-		progs[1].run(group_x=group_x, group_y=group_y)
-		progs[2].run(group_x=group_x, group_y=group_y)
-		progs[3].run(group_x=group_x, group_y=group_y)
+		data.shaders.dispatch("mei2", size)
+		data.shaders.dispatch("mei3", size)
+		data.shaders.dispatch("mei4", size)
 
 		if hardness is not None:
 			hardness.bind_to_image(BIND_EXTRA, read=True, write=False)
-		progs[4].run(group_x=group_x, group_y=group_y)
+		data.shaders.dispatch("mei5", size)
+
+		data.shaders.dispatch("mei6", size)
+		done = i + 1
 
-		progs[5].run(group_x=group_x, group_y=group_y)
+		if interval > 0 and done % interval == 0 and done < total:
+			save_checkpoint(obj, read_state(state), done, total)
+
+		if done % 10 == 0 or done == total:
+			if (yield (done // 10, total // 10, height)):
+				print(f"Stopped at step {done}/{total}")
+				break
+			bind()
 
 	ctx.finish()
 	print((datetime.now() - time).total_seconds())
 
+	final = read_state(state) if interval > 0 or continue_water else None
+
 	pipe.release()
 	velocity.release()
-	velocity_sampler.release()
 	water.release()
 	sediment.release()
-	sedimentSampler.release()
 	temp.release()
-
-	if hardness is not None:
-		hardness.release()
-	
-	if water_src is not None:
-		water_src.release()
 		
 	size = hyd.get_size()
 
 	if height_base is not None: # resize back to original size
-		height = heightmap.add_subres(height, height_base, data.get_map(hyd.map_source).texture)
+		height = heightmap.add_subres(height, height_base, source, filter=subres_filter)
+
+	if restored_source:
+		source.release()
 
 	hyd = obj.hydra_erosion
 	data.try_release_map(hyd.map_result)
@@ -190,8 +260,82 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 	hmid = data.create_map(name, height)
 	hyd.map_result = hmid
 
+	if final is not None:	# lets Set & Continue keep the water, stopped runs can be resumed
+		save_checkpoint(obj, final, done, total, result=hmid)
+
 	print("Erosion finished")
 
+# --------------------------------------------------------- Checkpoints
+
+def read_state(textures: dict[str, Texture | None])->dict[str, np.ndarray]:
+	"""Reads simulation textures into arrays.
+
+	:param textures: Textures by name. `None` values are skipped.
+	:type textures: :class:`dict[str, moderngl.Texture]`
+	:return: Arrays of shape `(height, width, channels)`.
+	:rtype: :class:`dict[str, numpy.ndarray]`"""
+	common.data.context.memory_barrier()
+	return {k: texture.read_into(v) for k, v in textures.items() if v is not None}
+
+def save_checkpoint(obj: bpy.types.Object | bpy.types.Image, state: dict[str, np.ndarray], iteration: int, total: int, result: str = "")->None:
+	"""Writes a compressed simulation state and stores its path in the entity settings.
+
+	:param obj: Simulated object or image.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param state: Simulation arrays, see :func:`read_state`.
+	:type state: :class:`dict[str, numpy.ndarray]`
+	:param iteration: Number of finished steps.
+	:type iteration: :class:`int`
+	:param total: Number of steps of the whole run.
+	:type total: :class:`int`
+	:param result: ID of the Result map created from this state. Empty for unfinished runs.
+	:type result: :class:`str`"""
+	hyd = obj.hydra_erosion
+	if hyd.mei_checkpoint:
+		path = Path(bpy.path.abspath(hyd.mei_checkpoint))
+	else:
+		path = common.get_cache_dir("checkpoints").joinpath(f"{uuid.uuid4()}.npz")
+
+	fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+	with os.fdopen(fd, "wb") as f:
+		np.savez_compressed(f, version=CHECKPOINT_VERSION, iteration=iteration, total=total, result=result, **state)
+	os.replace(tmp, path)	# an interrupted write keeps the previous checkpoint
+
+	hyd.mei_checkpoint = str(path)
+	print(f"Saved checkpoint at step {iteration}/{total}.")
+
+def load_checkpoint(path: str)->dict[str, np.ndarray] | None:
+	"""Loads a simulation state.
+
+	:param path: Checkpoint file path.
+	:type path: :class:`str`
+	:return: Simulation arrays and run information, or `None` if the file is missing or incompatible.
+	:rtype: :class:`dict[str, numpy.ndarray]` or :class:`None`"""
+	if not path:
+		return None
+	try:
+		with np.load(bpy.path.abspath(path)) as f:
+			ret = dict(f)
+	except (OSError, ValueError):
+		return None
+	return ret if int(ret.get("version", 0)) == CHECKPOINT_VERSION else None
+
+def can_resume(obj: bpy.types.Object | bpy.types.Image)->bool:
+	"""Checks if the last checkpoint of an entity is an unfinished run.
+
+	:param obj: Object or image.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:return: `True` if erosion can be resumed.
+	:rtype: :class:`bool`"""
+	path = obj.hydra_erosion.mei_checkpoint
+	if not path:
+		return False
+	try:
+		with np.load(bpy.path.abspath(path)) as f:	# lazy, reads only the run information
+			return int(f["version"]) == CHECKPOINT_VERSION and int(f["iteration"]) < int(f["total"])
+	except (OSError, ValueError, KeyError):
+		return False
+
 def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	"""Simulates color transport on the specified entity.
 	
@@ -234,10 +378,10 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	velocity = texture.create_texture(size, channels=2)
 	water = texture.create_texture(size)
 	temp = texture.create_texture(size)	# capacity, water and sediment at different stages
-	colorA = texture.create_texture(size, channels=4, image=bpy.data.images[hyd.color_src])
+	colorA = texture.clone(texture.get_input_texture(bpy.data.images[hyd.color_src], size, channels=4))
 	colorB = texture.create_texture(size, channels=4)
-	colorSamplerA = ctx.sampler(texture=colorA)
-	colorSamplerB = ctx.sampler(texture=colorB)
+	colorSamplerA = data.render.get_sampler(colorA, repeat=True)
+	colorSamplerB = data.render.get_sampler(colorB, repeat=True)
 
 	height.bind_to_image(BIND_HEIGHT, read=True, write=False)
 	pipe.bind_to_image(BIND_PIPE, read=True, write=True)
@@ -245,13 +389,10 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	water.bind_to_image(BIND_WATER, read=True, write=True)
 	temp.bind_to_image(BIND_TEMP, read=True, write=True)
 
-	velocity_sampler = ctx.sampler(texture=velocity, repeat_x=False, repeat_y=False)
+	velocity_sampler = data.render.get_sampler(velocity)
 	velocity_sampler.use(LOC_VELOCITY)
 	velocity.use(LOC_VELOCITY)
 
-	group_x = math.ceil(size[0] / 32)
-	group_y = math.ceil(size[1] / 32)
-
 	progs = [
 		data.shaders["mei1"],
 		data.shaders["mei2"],
@@ -306,10 +447,10 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 
 	time = datetime.now()
 	for _ in range(hyd.color_iter_num):
-		progs[0].run(group_x=group_x, group_y=group_y)
-		progs[1].run(group_x=group_x, group_y=group_y)
-		progs[2].run(group_x=group_x, group_y=group_y)
-		progs[3].run(group_x=group_x, group_y=group_y)
+		data.shaders.dispatch("mei1", size)
+		data.shaders.dispatch("mei2", size)
+		data.shaders.dispatch("mei3", size)
+		data.shaders.dispatch("mei4", size)
 	
 		colorA.use(LOC_COLOR)
 		colorSamplerA.use(LOC_COLOR)
@@ -317,7 +458,7 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 		colorA.bind_to_image(BIND_TEMP, read=True, write=False)
 		colorB.bind_to_image(BIND_COLOR, write=True)
 
-		progs[4].run(group_x=group_x, group_y=group_y)
+		data.shaders.dispatch("mei_color", size)
 
 		temp.bind_to_image(BIND_TEMP, read=True, write=True)
 
@@ -336,11 +477,8 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	ret, _ = texture.write_image(f"HYD_{obj.name}_Color", colorA)
 
 	colorA.release()
-	colorB.release()
-	colorSamplerA.release()
-	colorSamplerB.release()
+	colorB.release()
 
-	velocity_sampler.release()
 
 	print("Simulation finished")
 	return ret
\ No newline at end of file
@@ -12,9 +12,25 @@ import bpy, bpy.types
 
 PARTICLE_MULTIPLIER = 20
 
+BIND_DELTA = 3
+"""Image unit of the fixed-point change map in deterministic mode."""
+
 def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 	"""Erodes the specified entity.
 	
+	:param obj: Object or image to erode.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
+	for _ in erode_steps(obj):
+		pass
+
+@common.solver_steps
+def erode_steps(obj: bpy.types.Object | bpy.types.Image):
+	"""Erodes the specified entity step by step. See :func:`erode`.
+
+	Yields `(done, total, height)` after every iteration of :data:`PARTICLE_MULTIPLIER` particle steps,
+	where `height` is the current heightmap texture, possibly in simulation resolution.
+	Sending `True` stops the run early, the Result is then created from the current state.
+	
 	:param obj: Object or image to erode.
 	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
 
@@ -38,20 +54,24 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 
 	if hyd.erosion_hardness_src in bpy.data.images:
 		img = bpy.data.images[hyd.erosion_hardness_src]
-		hardness = texture.create_texture(tuple(img.size), channels=1, image=img)
-		hardness_sampler = ctx.sampler(texture=hardness, repeat_x=False, repeat_y=False)
-		hardness.use(2)
-		hardness_sampler.use(2)
+		hardness = texture.get_input_texture(img, tuple(img.size))
+		hardness_sampler = data.render.get_sampler(hardness)
 	else:
 		hardness = None
 
 	prog = data.shaders["particle"]
 	
-	height_sampler = ctx.sampler(texture=height, repeat_x=False, repeat_y=False)
+	height_sampler = data.render.get_sampler(height)
 
-	height.bind_to_image(1, read=True, write=True)
-	height.use(1)
-	height_sampler.use(1)
+	def bind():	# also called after yielding, previews use the same units
+		if hardness is not None:
+			hardness.use(2)
+			hardness_sampler.use(2)
+		height.bind_to_image(1, read=True, write=True)
+		height.use(1)
+		height_sampler.use(1)
+
+	bind()
 	prog["height_sampler"] = 1
 	prog["height_map"].value = 1
 
@@ -70,22 +90,39 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 	prog["acceleration"] = hyd.part_acceleration / 100
 	prog["lateral_acceleration"] = hyd.part_lateral_acceleration / 100
 	prog["lifetime"] = hyd.part_lifetime
-	prog["iterations"] = hyd.part_iter_num * PARTICLE_MULTIPLIER
+	prog["iterations"] = PARTICLE_MULTIPLIER
 	prog["max_change"] = hyd.part_max_change / (100 * 100) # from percent to 0-0.01
 	prog["drag"] = 1 - (hyd.part_drag / 100)
 
+	prog["seed"] = hyd.erosion_seed
+	prog["deterministic"] = hyd.erosion_deterministic
+
+	# settings read after yielding are copied, they stay editable during progressive runs
+	iterations = hyd.part_iter_num
+	first_seed = hyd.erosion_seed
+	deterministic = hyd.erosion_deterministic
+	subres_filter = hyd.erosion_subres_filter
+
 	time = datetime.now()
-	prog.run(group_x=1, group_y=1)
+	for i in range(iterations):	# each thread runs its particles in sequence, splitting the run doesn't change seeds
+		seed = first_seed + i * PARTICLE_MULTIPLIER
+		if deterministic:
+			run_deterministic(prog, size, seed, PARTICLE_MULTIPLIER)
+		else:
+			prog["seed"] = seed
+			data.shaders.dispatch("particle")
+			ctx.memory_barrier()	# the next dispatch and previews read the stored heights
+
+		if (yield (i + 1, iterations, height)):
+			print(f"Stopped at iteration {i + 1}")
+			break
+		bind()
 	ctx.finish()
 
 	print((datetime.now() - time).total_seconds())
 
-	if hardness is not None:
-		hardness.release()
-		hardness_sampler.release()
-
 	if height_base is not None: # resize back to original size
-		height = heightmap.add_subres(height, height_base, data.get_map(hyd.map_source).texture)
+		height = heightmap.add_subres(height, height_base, data.get_map(hyd.map_source).texture, filter=subres_filter)
 
 	data.try_release_map(hyd.map_result)
 	
@@ -95,6 +132,42 @@ def erode(obj: bpy.types.Object | bpy.types.Image)->None:
 
 	print("Erosion finished")
 
+def run_deterministic(prog, size: tuple[int,int], seed: int, iterations: int)->None:
+	"""Runs a prepared particle erosion program with one iteration per dispatch.
+
+	Particles of a single dispatch all read the same heightmap and sum their changes atomically
+	as fixed-point integers, which are added to the heightmap between dispatches.
+	The result is then independent of thread scheduling.
+
+	:param prog: Particle program with uniforms and the heightmap (image unit 1) already bound.
+	:type prog: :class:`moderngl.ComputeShader`
+	:param size: Heightmap size.
+	:type size: :class:`tuple[int,int]`
+	:param seed: First iteration seed.
+	:type seed: :class:`int`
+	:param iterations: Number of iterations.
+	:type iterations: :class:`int`"""
+	data = common.data
+	ctx = data.context
+
+	delta = texture.create_texture(size, dtype="i4")
+	delta.bind_to_image(BIND_DELTA, read=True, write=True)
+	prog["delta_map"].value = BIND_DELTA
+	prog["iterations"] = 1
+
+	resolve = data.shaders["add_fixed"]
+	resolve["height_map"].value = 1
+	resolve["delta_map"].value = BIND_DELTA
+
+	for j in range(iterations):
+		prog["seed"] = seed + j
+		data.shaders.dispatch("particle")
+		ctx.memory_barrier()
+		data.shaders.dispatch("add_fixed", size)
+		ctx.memory_barrier()
+
+	delta.release()
+
 def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	"""Simulates color transport on the specified entity.
 	
@@ -121,10 +194,10 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	height = texture.clone(height)
 	height.bind_to_image(1, read=True, write=True)
 	height.use(1)
-	height_sampler = ctx.sampler(texture=height, repeat_x=False, repeat_y=False)
+	height_sampler = data.render.get_sampler(height)
 	height_sampler.use(1)
 
-	color = texture.create_texture(size, channels=4, image=bpy.data.images[hyd.color_src])
+	color = texture.clone(texture.get_input_texture(bpy.data.images[hyd.color_src], size, channels=4))
 	color.bind_to_image(2, read=True, write=True)
 
 	prog = data.shaders["particle_color"]
@@ -148,9 +221,10 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	prog["drag"] = max(1 - (hyd.color_detail / 100), 0.01)
 
 	prog["color_strength"] = hyd.color_mixing / 100
+	prog["seed"] = hyd.erosion_seed
 
 	time = datetime.now()
-	prog.run(group_x=1,group_y=1)
+	data.shaders.dispatch("particle_color")
 	ctx.finish()
 
 	print((datetime.now() - time).total_seconds())
@@ -158,7 +232,6 @@ def color(obj: bpy.types.Object | bpy.types.Image)->bpy.types.Image:
 	ret, _ = texture.write_image(f"HYD_{obj.name}_Color", color)
 
 	color.release()
-	height_sampler.release()
 	if hyd.color_solver == "particle":
 		height.release()
 
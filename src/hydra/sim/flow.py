@@ -32,7 +32,7 @@ def generate_flow(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image:
 	
 	amount = texture.create_texture(size)
 
-	height_sampler = ctx.sampler(texture=height, repeat_x=False, repeat_y=False)
+	height_sampler = data.render.get_sampler(height)
 	height.use(1)
 	height_sampler.use(1)
 
@@ -52,8 +52,25 @@ def generate_flow(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image:
 	prog["lifetime"] = hyd.part_lifetime
 	prog["drag"] = 1-(hyd.part_drag / 100)	# multiplicative factor
 
+	prog["seed"] = hyd.erosion_seed
+	prog["deterministic"] = hyd.erosion_deterministic
+
+	if hyd.erosion_deterministic:	# accumulate order-independent integer sums, then convert
+		flow_log = texture.create_texture(size, dtype="u4")
+		flow_log.bind_to_image(4, read=True, write=True)
+		prog["flow_log"].value = 4
+
 	time = datetime.now()
-	prog.run(group_x=1, group_y=1)
+	data.shaders.dispatch("flow")
+
+	if hyd.erosion_deterministic:
+		ctx.memory_barrier()
+		resolve = data.shaders["flow_fixed"]
+		resolve["flow_log"].value = 4
+		resolve["flow"].value = 2
+		data.shaders.dispatch("flow_fixed", size)
+		flow_log.release()
+
 	ctx.finish()
 
 	final_amount = texture.create_texture(amount.size)
@@ -62,7 +79,7 @@ def generate_flow(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image:
 	prog["inMap"].value = 2
 	prog["outMap"].value = 3
 
-	prog.run(group_x=size[0], group_y=size[1])
+	data.shaders.dispatch("plug", size)
 
 	print((datetime.now() - time).total_seconds())
 
@@ -1,11 +1,18 @@
 """Module responsible for heightmap generation."""
 
 import moderngl as mgl
-from Hydra.utils import texture, model
+from Hydra.utils import texture, model, cache
 from Hydra import common
 import bpy
 import bpy.types
 import numpy as np
+import math
+from pathlib import Path
+from typing import Iterator
+
+TILE_SIZE: int = 4096
+"""Maximum tile width and height for heightmap rasterization. Larger heightmaps are rendered in tiles,
+so depth buffers never exceed this size."""
 
 def generate_heightmap(obj: bpy.types.Object, normalized: bool=False, world_scale: bool=False, local_scale: bool=False)->mgl.Texture:
 	"""Creates a heightmap for the specified object and returns it.
@@ -20,36 +27,10 @@ def generate_heightmap(obj: bpy.types.Object, normalized: bool=False, world_scal
 	:type local_scale: :class:`bool`
 	:return: Generated heightmap.
 	:rtype: :class:`moderngl.Texture`"""
-	print("Preparing heightmap generation.")
-	
 	data = common.data
 	ctx = data.context
-	mesh = model.evaluate_mesh(obj)
-
-	if common.get_preferences().skip_indexing:
-		print("Skipping vertex indexing.")
-		verts = np.empty((len(mesh.vertices), 3), 'f')
-		
-		mesh.vertices.foreach_get(
-			"co", np.reshape(verts, len(mesh.vertices) * 3))
-
-		verts = [verts[i] for face in mesh.loop_triangles for i in face.vertices]
-		vao = model.create_vao(ctx, data.programs["heightmap"], vertices=verts)
-	else:
-		verts = np.empty((len(mesh.vertices), 3), 'f')
-		inds = np.empty((len(mesh.loop_triangles), 3), 'i')
-
-		mesh.vertices.foreach_get(
-			"co", np.reshape(verts, len(mesh.vertices) * 3))
-		mesh.loop_triangles.foreach_get(
-			"vertices", np.reshape(inds, len(mesh.loop_triangles) * 3))
-
-		vao = model.create_vao(ctx, data.programs["heightmap"], vertices=verts, indices=inds)
 
 	size = obj.hydra_erosion.get_size()
-	txt = ctx.texture(size, 1, dtype="f4")
-	depth = ctx.depth_texture(size)
-
 	model.recalculate_scales(obj)
 	resize_matrix = model.get_resize_matrix(obj)
 
@@ -62,22 +43,122 @@ def generate_heightmap(obj: bpy.types.Object, normalized: bool=False, world_scal
 	else:
 		scale = obj.hydra_erosion.height_scale
 
-	fbo = ctx.framebuffer(color_attachments=(txt), depth_attachment=depth)
+	key = None
+	if cache.is_enabled():
+		key = cache.get_heightmap_key(obj, tuple(size), resize_matrix, scale)
+		if (txt := cache.load_heightmap(key, tuple(size))) is not None:
+			print("Loaded cached heightmap.")
+			return txt
 
-	with ctx.scope(fbo, mgl.DEPTH_TEST):
-		fbo.clear(depth=2.0)
-		vao.program["resize_matrix"].value = resize_matrix
-		vao.program["scale"] = scale
-		vao.render()
-		ctx.finish()
+	limit = ctx.info["GL_MAX_TEXTURE_SIZE"]
+	if max(size) > limit:
+		raise ValueError(f"Heightmap size exceeds the GPU limit of {limit}. Export it into a file instead.")
+
+	print("Preparing heightmap generation.")
+	tile_size = (min(size[0], TILE_SIZE), min(size[1], TILE_SIZE))
+	txt = ctx.texture(size, 1, dtype="f4")
+
+	if tile_size == tuple(size):
+		for _ in render_tiles(obj, size, resize_matrix, scale, txt):
+			pass
+	else:
+		tile = ctx.texture(tile_size, 1, dtype="f4")
+		for viewport in render_tiles(obj, size, resize_matrix, scale, tile):
+			txt.write(texture.read_into(tile, viewport=(0, 0, *viewport[2:]), pool="tile"), viewport=viewport)
+		tile.release()
 
-	depth.release()
-	fbo.release()
-	vao.release()
+	if key is not None:
+		cache.store_heightmap(key, txt)
 
 	print("Generation finished.")
 	return txt
 
+def get_generation_scale(obj: bpy.types.Object)->float:
+	"""Returns the height scale of standalone heightmaps, see :data:`hydra_erosion.heightmap_gen_type`.
+
+	:param obj: Object to generate from. Its scales have to be recalculated first.
+	:type obj: :class:`bpy.types.Object`
+	:return: Height scale.
+	:rtype: :class:`float`"""
+	hyd = obj.hydra_erosion
+	if hyd.heightmap_gen_type == "normalized":
+		return 1
+	elif hyd.heightmap_gen_type == "world":
+		return hyd.org_scale * obj.scale.z
+	elif hyd.heightmap_gen_type == "local":
+		return hyd.org_scale
+	else:
+		return hyd.height_scale
+
+def render_tiles(obj: bpy.types.Object, size: tuple[int,int], resize_matrix: tuple[float], scale: float, tile: mgl.Texture)->Iterator[tuple[int,int,int,int]]:
+	"""Rasterizes an object into a heightmap tile by tile.
+
+	:param obj: Object to render.
+	:type obj: :class:`bpy.types.Object`
+	:param size: Size of the whole heightmap.
+	:type size: :class:`tuple[int,int]`
+	:param resize_matrix: Matrix fitting the object into the whole heightmap, see :func:`model.get_resize_matrix`.
+	:type resize_matrix: :class:`tuple[float]`
+	:param scale: Height scale.
+	:type scale: :class:`float`
+	:param tile: Single channel texture to render into. Its size sets the tile size.
+	:type tile: :class:`moderngl.Texture`
+	:return: Viewports `(x, y, width, height)` of rendered tiles within the whole heightmap.
+		Each tile is stored in the lower left corner of `tile` until the next iteration.
+	:rtype: :class:`Iterator[tuple[int,int,int,int]]`"""
+	data = common.data
+	ctx = data.context
+	verts, inds = model.get_mesh_arrays(obj)
+
+	if common.get_preferences().skip_indexing:
+		print("Skipping vertex indexing.")
+		vao = model.create_unindexed_vao(ctx, data.programs["heightmap"], verts, inds)
+	else:
+		vao = model.create_vao(ctx, data.programs["heightmap"], vertices=verts, indices=inds)
+
+	depth = ctx.depth_texture(tile.size)
+	fbo = ctx.framebuffer(color_attachments=(tile), depth_attachment=depth)
+	vao.program["scale"] = scale
+
+	try:
+		for y in range(0, size[1], tile.height):
+			for x in range(0, size[0], tile.width):
+				with ctx.scope(fbo, mgl.DEPTH_TEST):
+					fbo.clear(depth=2.0)
+					vao.program["resize_matrix"].value = model.get_tile_matrix(resize_matrix, size, (x, y, tile.width, tile.height))
+					vao.render()
+					ctx.finish()
+				yield (x, y, min(tile.width, size[0] - x), min(tile.height, size[1] - y))
+	finally:
+		depth.release()
+		fbo.release()
+		vao.release()
+
+def export_heightmap(obj: bpy.types.Object, path: Path, size: tuple[int,int])->None:
+	"""Renders a standalone heightmap directly into a memory-mapped `.npy` file.
+	The heightmap is never fully stored in video or host memory, so its size isn't limited by the GPU.
+
+	:param obj: Object to generate from.
+	:type obj: :class:`bpy.types.Object`
+	:param path: Output file path.
+	:type path: :class:`pathlib.Path`
+	:param size: Heightmap size.
+	:type size: :class:`tuple[int,int]`"""
+	ctx = common.data.context
+	model.recalculate_scales(obj)
+	resize_matrix = model.get_resize_matrix(obj)
+	scale = get_generation_scale(obj)
+
+	out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(size[1], size[0]))
+	tile = ctx.texture((min(size[0], TILE_SIZE), min(size[1], TILE_SIZE)), 1, dtype="f4")
+	try:
+		for x, y, w, h in render_tiles(obj, size, resize_matrix, scale, tile):
+			out[y:y + h, x:x + w] = texture.read_into(tile, viewport=(0, 0, w, h), pool="tile")[..., 0]
+		out.flush()
+	finally:
+		tile.release()
+		del out
+
 def generate_heightmap_from_image(img:bpy.types.Image)->mgl.Texture:
 	"""Creates a heightmap for the specified image and returns it.
 	
@@ -85,13 +166,13 @@ def generate_heightmap_from_image(img:bpy.types.Image)->mgl.Texture:
 	:type img: :class:`bpy.types.Image`
 	:return: Generated heightmap.
 	:rtype: :class:`moderngl.Texture`"""
-	pixels = np.array(img.pixels).astype('f4')[::4].copy()#has to be contiguous in memory
+	pixels = texture.read_pixels(img, channel=0)
 	txt = common.data.context.texture(tuple(img.size), 1, dtype='f4', data=pixels)
 	if img.colorspace_settings.name == "sRGB":
 		prog: mgl.ComputeShader = common.data.shaders["linear"]
 		txt.bind_to_image(1, read=True, write=True)
 		prog["map"].value = 1
-		prog.run(txt.width, txt.height)	# txt = linearize(txt)
+		common.data.shaders.dispatch("linear", txt.size)	# txt = linearize(txt)
 	return txt
 
 def prepare_heightmap(obj: bpy.types.Image | bpy.types.Object)->None:
@@ -160,37 +241,167 @@ def add(A: mgl.Texture, B: mgl.Texture, factor: float = 1.0, scale: float = 1.0,
 	prog["factor"] = factor
 	prog["scale"] = scale
 	# A = scale * (A + factor * B)
-	prog.run(A.width, A.height)
+	common.data.shaders.dispatch("scaled_add", A.size)
 	
 	common.data.context.finish()
 	return txt
 
-def get_displacement(obj: bpy.types.Object, name:str)->bpy.types.Image:
+def expand(A: mgl.Texture, B: mgl.Texture | None = None, factor: float = 1.0, scale: float = 1.0)->mgl.Texture:
+	"""Computes `scale * (A + factor * B)` in a single pass, written straight into a new RGBA texture,
+	which is read back by :func:`texture.write_image` without further conversion.
+
+	Uses image units 5 to 7. Running solvers rebind their units after each yield.
+	
+	:param A: First texture.
+	:type A: :class:`moderngl.Texture`
+	:param B: Optional second texture of the same size.
+	:type B: :class:`moderngl.Texture` or :class:`None`
+	:param factor: Multiplication factor for the second texture.
+	:type factor: :class:`float`
+	:param scale: Scale factor for the result.
+	:type scale: :class:`float`
+	:return: Grayscale RGBA texture with alpha set to 1.
+	:rtype: :class:`moderngl.Texture`"""
+	ctx: mgl.Context = common.data.context
+	ret = ctx.texture(A.size, 4, dtype="f4")
+
+	prog: mgl.ComputeShader = common.data.shaders["expand"]
+	A.bind_to_image(5, read=True, write=False)
+	prog["A"].value = 5
+	(A if B is None else B).bind_to_image(6, read=True, write=False)
+	prog["B"].value = 6
+	ret.bind_to_image(7, read=False, write=True)
+	prog["O"].value = 7
+	prog["factor"] = 0.0 if B is None else factor
+	prog["scale"] = scale
+	prog["size"] = A.size
+	common.data.shaders.dispatch("expand", A.size)
+
+	ctx.memory_barrier()
+	return ret
+
+def get_displacement_scale(obj: bpy.types.Object)->float:
+	"""Returns the factor converting heightmap values of an object into object space units.
+
+	:param obj: Object to evaluate.
+	:type obj: :class:`bpy.types.Object`
+	:return: Height scale.
+	:rtype: :class:`float`"""
+	hyd = obj.hydra_erosion
+	if hyd.height_scale != 0:
+		return hyd.org_scale / hyd.height_scale
+	else:
+		return 1.0
+
+def get_displacement(obj: bpy.types.Object, name:str, level: int = 0, pack: bool = True)->bpy.types.Image:
 	"""Creates a heightmap difference as a Blender Image.
 
 	:param obj: Object to apply to.
 	:type obj: :class:`bpy.types.Object`
 	:param name: Name of the created image.
 	:type name: :class:`str`
+	:param level: Mipmap level of the image. Levels above `0` are averaged on the GPU and only the reduced level is read back.
+	:type level: :class:`int`
+	:param pack: Packs the image, see :func:`texture.write_image`.
+	:type pack: :class:`bool`
 	:return: Created image.
 	:rtype: :class:`bpy.types.Image`"""
 	data = common.data
 	hyd = obj.hydra_erosion
+	target = expand(data.get_map(hyd.map_result).texture, data.get_map(hyd.map_base).texture,
+		factor=-1.0, scale=get_displacement_scale(obj))
+	if level > 0:
+		target.build_mipmaps(0, level)
+	ret, _ = texture.write_image(name, target, level=level, pack=pack)
+	target.release()
 
-	if obj.hydra_erosion.height_scale != 0:
-		scale = obj.hydra_erosion.org_scale / obj.hydra_erosion.height_scale
-	else:
-		scale = 1.0
+	return ret
 
-	target = subtract(data.get_map(hyd.map_result).texture,
+def get_preview_level(obj: bpy.types.Object, size: tuple[int,int])->int:
+	"""Picks the coarsest mipmap level of a map, which still has two samples per vertex of the evaluated object
+	along each axis. Finer details can't be shown by the mesh.
+
+	:param obj: Previewed object.
+	:type obj: :class:`bpy.types.Object`
+	:param size: Full map size.
+	:type size: :class:`tuple[int,int]`
+	:return: Mipmap level.
+	:rtype: :class:`int`"""
+	verts, _ = model.get_mesh_arrays(obj)
+	ratio = max(obj.hydra_erosion.scale_ratio, 1e-3)
+	columns = math.sqrt(len(verts) / ratio)	# vertices per row of an equally dense grid
+
+	level = 0
+	while min(texture.get_level_size(size, level + 1)) > 1 and size[0] >> (level + 1) >= 2 * columns:
+		level += 1
+	return level
+
+def get_displacement_texture(obj: bpy.types.Object)->mgl.Texture:
+	"""Computes the heightmap difference of the Result and Base maps in object space units.
+
+	:param obj: Object to evaluate.
+	:type obj: :class:`bpy.types.Object`
+	:return: Created texture.
+	:rtype: :class:`moderngl.Texture`"""
+	data = common.data
+	hyd = obj.hydra_erosion
+
+	return subtract(data.get_map(hyd.map_result).texture,
 		data.get_map(hyd.map_base).texture,
-		scale=scale)
+		scale=get_displacement_scale(obj))
+
+def get_preview_displacement(obj: bpy.types.Object, height: mgl.Texture, name: str, max_size: int)->bpy.types.Image:
+	"""Creates a downsampled heightmap difference of an intermediate solver state as a Blender Image.
+	Resizing and subtraction run on the GPU, only the small result is read back.
+
+	:param obj: Object being eroded.
+	:type obj: :class:`bpy.types.Object`
+	:param height: Current heightmap, in any resolution.
+	:type height: :class:`moderngl.Texture`
+	:param name: Name of the created image.
+	:type name: :class:`str`
+	:param max_size: Maximum width or height of the image.
+	:type max_size: :class:`int`
+	:return: Created image.
+	:rtype: :class:`bpy.types.Image`"""
+	data = common.data
+	hyd = obj.hydra_erosion
+
+	base = data.get_map(hyd.map_base).texture
+	factor = min(1.0, max_size / max(base.size))
+	size = (max(1, round(base.width * factor)), max(1, round(base.height * factor)))
+
+	data.context.memory_barrier()	# height was written by image stores
+	current = resize_texture(height, size)
+	prior = resize_texture(base, size)
+	target = expand(current, prior, factor=-1.0, scale=get_displacement_scale(obj))
+	current.release()
+	prior.release()
 
-	ret, _ = texture.write_image(name, target)
+	ret, _ = texture.write_image(name, target, pack=False)
 	target.release()
 
 	return ret
 
+def get_statistics(obj: bpy.types.Object | bpy.types.Image)->dict[str, float|str]:
+	"""Computes a checksum and statistics of the Result map. Also compares it against the golden map image, if one is set.
+
+	:param obj: Object or image to evaluate.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:return: Statistics dictionary, see :func:`texture.get_statistics`.
+	:rtype: :class:`dict`"""
+	hyd = obj.hydra_erosion
+	txt = common.data.get_map(hyd.map_result).texture
+
+	golden = None
+	if hyd.stats_golden_src in bpy.data.images:
+		img = bpy.data.images[hyd.stats_golden_src]
+		if tuple(img.size) != tuple(txt.size):
+			raise ValueError(f"Golden map {img.name} has a different size than the Result.")
+		golden = texture.read_pixels(img, channel=0)
+
+	return texture.get_statistics(txt, golden)
+
 def set_result_as_source(obj: bpy.types.Object | bpy.types.Image, as_base: bool = False)->None:
 	"""Applies the Result map as a Source map.
 
@@ -221,51 +432,58 @@ def resize_texture(texture: mgl.Texture, target_size: tuple[int, int])->mgl.Text
 	:type target_size: :class:`tuple`
 	:return: Resized texture.
 	:rtype: :class:`moderngl.Texture`"""
-	prog: mgl.Program = common.data.programs["resize"]
 	ctx: mgl.Context = common.data.context
+	render = common.data.render
 
-	ret = ctx.texture(target_size, 1, dtype='f4')
-	sampler = ctx.sampler(texture=texture, repeat_x=False, repeat_y=False)
-	fbo = ctx.framebuffer(color_attachments=(ret))
-
-	vao = model.create_vao(ctx, prog)
+	fbo = render.get_framebuffer(target_size)
+	vao = render.get_quad(common.data.programs["resize"])
 
 	with ctx.scope(fbo):
-		fbo.clear()
-		texture.use(1)
-		sampler.use(1)
+		render.get_sampler(texture).use(1)
 		vao.program["in_texture"] = 1
 		vao.render()
-		ctx.finish()
-
-	sampler.release()
-	vao.release()
-	fbo.release()
 
+	ret = ctx.texture(target_size, 1, dtype='f4')
+	ctx.copy_framebuffer(ret, fbo)
 	return ret
 
-def add_subres(height: mgl.Texture, height_prior: mgl.Texture, height_prior_fullres: mgl.Texture)->mgl.Texture:
-	"""Adds a resized difference to the original heightmap.
+def add_subres(height: mgl.Texture, height_prior: mgl.Texture, height_prior_fullres: mgl.Texture, filter: str = "bilinear")->mgl.Texture:
+	"""Adds a resized difference to the original heightmap. The difference is sampled and added in a single pass,
+	without intermediate textures.
 
-	Releases height_prior and height.
+	Releases height_prior and height. Uses texture and image units 5 and 6.
 
 	:param height: Resulting heightmap to add.
 	:type height: :class:`moderngl.Texture`
 	:param height_prior: Previous heightmap for difference calculation.
 	:type height_prior: :class:`moderngl.Texture`
-	:param height_prior_fullres: Full resolution previous heightmap to add to.
+	:param height_prior_fullres: Full resolution previous heightmap to add to. Stays unchanged.
 	:type height_prior_fullres: :class:`moderngl.Texture`
+	:param filter: Upsampling filter of the difference, either `bilinear` or `bicubic`.
+	:type filter: :class:`str`
 	:return: New heightmap.
 	:rtype: :class:`moderngl.Texture`"""
-	
-	dif = subtract(height, height_prior) # get difference
-	height_prior.release()
-	height.release()
-
-	height = resize_texture(dif, height_prior_fullres.size) # resize difference
-	dif.release()
+	ctx: mgl.Context = common.data.context
+	ret = ctx.texture(height_prior_fullres.size, 1, dtype="f4")
+
+	prog: mgl.ComputeShader = common.data.shaders["subres"]
+	for unit, (name, txt) in enumerate((("height", height), ("prior", height_prior)), start=5):
+		txt.repeat_x = False
+		txt.repeat_y = False
+		txt.filter = (mgl.LINEAR, mgl.LINEAR)
+		txt.use(unit)
+		prog[name].value = unit
+	height_prior_fullres.bind_to_image(5, read=True, write=False)
+	prog["base"].value = 5
+	ret.bind_to_image(6, read=False, write=True)
+	prog["O"].value = 6
+	prog["size"] = ret.size
+	prog["bicubic"] = filter == "bicubic"
+
+	ctx.memory_barrier()	# solvers write the low resolution maps as images
+	common.data.shaders.dispatch("subres", ret.size)
+	ctx.memory_barrier()
 
-	nh = add(height, height_prior_fullres) # add difference to original
+	height_prior.release()
 	height.release()
-
-	return nh
+	return ret
@@ -0,0 +1,247 @@
+"""Module responsible for the Source map history. Committed maps are stored as compressed differences against their parent,
+so previous Source maps can be restored without running the solvers again."""
+
+from Hydra.sim import heightmap
+from Hydra.utils import texture
+from Hydra import common
+import bpy.types
+import moderngl as mgl
+import numpy as np
+import zlib
+
+QUANT_MAX: int = 32767
+"""Largest quantized difference value. Differences are stored as 16-bit integers."""
+
+MAX_LAYERS: int = 32
+"""Maximum number of stored maps per entity. The oldest maps are dropped first."""
+
+class Layer:
+	"""A single stored map. Either a keyframe with full data or a quantized difference against the previous layer."""
+	def __init__(self, name: str, size: tuple[int,int], raw: bytes, scale: float | None):
+		"""Constructor method.
+
+		:param name: Map name.
+		:type name: :class:`str`
+		:param size: Map size.
+		:type size: :class:`tuple[int,int]`
+		:param raw: Compressed data.
+		:type raw: :class:`bytes`
+		:param scale: Quantization step of a difference. `None` for keyframes.
+		:type scale: :class:`float` or :class:`None`"""
+		self.name = name
+		self.size = size
+		self.raw = raw
+		self.scale = scale
+
+	@classmethod
+	def keyframe(cls, name: str, txt: mgl.Texture)->"Layer":
+		"""Stores a full map.
+
+		:param name: Map name.
+		:type name: :class:`str`
+		:param txt: Map to store.
+		:type txt: :class:`moderngl.Texture`
+		:return: Created layer.
+		:rtype: :class:`Layer`"""
+		return cls(name, tuple(txt.size), zlib.compress(texture.read_into(txt, pool="readback"), 1), None)
+
+	@classmethod
+	def difference(cls, name: str, txt: mgl.Texture, parent: mgl.Texture)->"Layer":
+		"""Stores a map as a quantized difference against its parent. The difference is computed on the GPU.
+
+		:param name: Map name.
+		:type name: :class:`str`
+		:param txt: Map to store.
+		:type txt: :class:`moderngl.Texture`
+		:param parent: Previous map of the same size.
+		:type parent: :class:`moderngl.Texture`
+		:return: Created layer.
+		:rtype: :class:`Layer`"""
+		dif = heightmap.subtract(txt, parent)
+		ar = texture.read_into(dif, pool="readback").ravel()
+		dif.release()
+
+		peak = float(np.abs(ar).max())
+		scale = peak / QUANT_MAX if peak > 0 else 1.0
+		quantized = np.rint(ar / scale).astype(np.int16)
+		return cls(name, tuple(txt.size), zlib.compress(quantized.tobytes(), 1), scale)
+
+	def is_keyframe(self)->bool:
+		"""Checks if the layer stores full data.
+
+		:return: `True` for keyframes.
+		:rtype: :class:`bool`"""
+		return self.scale is None
+
+	def apply(self, txt: mgl.Texture | None)->mgl.Texture:
+		"""Reconstructs this layer's map.
+
+		Releases `txt`.
+
+		:param txt: Reconstructed map of the previous layer. Ignored for keyframes.
+		:type txt: :class:`moderngl.Texture` or :class:`None`
+		:return: Reconstructed map.
+		:rtype: :class:`moderngl.Texture`"""
+		if self.is_keyframe():
+			if txt is not None:
+				txt.release()
+			return texture.create_texture(self.size, pixels=zlib.decompress(self.raw))
+
+		quantized = np.frombuffer(zlib.decompress(self.raw), dtype=np.int16)
+		dif = texture.create_texture(self.size, pixels=quantized.astype(np.float32).tobytes())
+		ret = heightmap.add(txt, dif, factor=self.scale)	# txt + scale * quantized
+		dif.release()
+		txt.release()
+		return ret
+
+	def get_nbytes(self)->int:
+		"""Compressed data size property getter."""
+		return len(self.raw)
+
+	nbytes = property(get_nbytes)
+	"""Compressed data size in bytes."""
+
+class LayerHistory:
+	"""Linear history of Source maps of a single entity."""
+	def __init__(self):
+		"""Constructor method."""
+		self.layers: list[Layer] = []
+		"""Stored maps, oldest first. The first layer is always a keyframe."""
+		self.position: int = -1
+		"""Index of the layer matching the current Source map."""
+		self.tip: str = ""
+		"""ID of the Source map matching :attr:`position`."""
+
+	def record(self, parent: str, child: str)->None:
+		"""Adds a map replacing its parent. Drops all undone layers.
+
+		:param parent: ID of the replaced map.
+		:type parent: :class:`str`
+		:param child: ID of the new map.
+		:type child: :class:`str`"""
+		data = common.data
+		src = data.get_map(parent)
+		dst = data.get_map(child)
+
+		del self.layers[self.position + 1:]
+		if self.tip != parent:	# history doesn't end with parent, e.g. after regenerating the Base map
+			self.layers.append(Layer.keyframe(src.name, src.texture))
+
+		if src.size == dst.size:
+			self.layers.append(Layer.difference(dst.name, dst.texture, src.texture))
+		else:
+			self.layers.append(Layer.keyframe(dst.name, dst.texture))
+
+		if len(self.layers) > MAX_LAYERS:	# merge the oldest difference into the keyframe
+			txt = self.reconstruct(1)
+			self.layers[1] = Layer.keyframe(self.layers[1].name, txt)
+			txt.release()
+			del self.layers[0]
+
+		self.position = len(self.layers) - 1
+		self.tip = child
+
+	def reconstruct(self, index: int)->mgl.Texture:
+		"""Reconstructs the map of a layer.
+
+		:param index: Layer index.
+		:type index: :class:`int`
+		:return: Reconstructed map. Differs from the recorded one by at most one quantization step per layer.
+		:rtype: :class:`moderngl.Texture`"""
+		start = max(i for i in range(index + 1) if self.layers[i].is_keyframe())
+		txt = None
+		for layer in self.layers[start:index + 1]:
+			txt = layer.apply(txt)
+		return txt
+
+	def can_undo(self)->bool:
+		"""Checks if there is an earlier layer to step back to.
+
+		:return: `True` if undo is possible.
+		:rtype: :class:`bool`"""
+		return self.position > 0
+
+	def can_redo(self)->bool:
+		"""Checks if there is a later layer to step forward to.
+
+		:return: `True` if redo is possible.
+		:rtype: :class:`bool`"""
+		return 0 <= self.position < len(self.layers) - 1
+
+	def get_nbytes(self)->int:
+		"""Stored data size property getter."""
+		return sum(i.nbytes for i in self.layers)
+
+	nbytes = property(get_nbytes)
+	"""Stored data size in bytes."""
+
+# --------------------------------------------------------- Entities
+
+def get_history(obj: bpy.types.Object | bpy.types.Image, create: bool = False)->LayerHistory | None:
+	"""Returns the history of an entity.
+
+	:param obj: Object or image.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param create: Creates an empty history if none exists.
+	:type create: :class:`bool`
+	:return: Entity history or `None`.
+	:rtype: :class:`LayerHistory` or :class:`None`"""
+	histories = common.data.histories
+	if create and obj.session_uid not in histories:
+		histories[obj.session_uid] = LayerHistory()
+	return histories.get(obj.session_uid)
+
+def record(obj: bpy.types.Object | bpy.types.Image, parent: str, child: str)->None:
+	"""Records a Source map change. Does nothing if either map is missing.
+
+	:param obj: Object or image.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param parent: ID of the replaced Source map.
+	:type parent: :class:`str`
+	:param child: ID of the new Source map.
+	:type child: :class:`str`"""
+	if parent == child or not common.data.has_map(parent) or not common.data.has_map(child):
+		return
+	get_history(obj, create=True).record(parent, child)
+
+def commit_result(obj: bpy.types.Object | bpy.types.Image, as_base: bool = False)->None:
+	"""Records the Result map and applies it as a Source map, see :func:`heightmap.set_result_as_source`.
+
+	:param obj: Object or image to modify.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param as_base: Applies as base as well if `True`.
+	:type as_base: :class:`bool`"""
+	hyd = obj.hydra_erosion
+	record(obj, hyd.map_source, hyd.map_result)
+	heightmap.set_result_as_source(obj, as_base=as_base)
+
+def step(obj: bpy.types.Object | bpy.types.Image, offset: int)->bool:
+	"""Replaces the Source map with an older or newer map from the history.
+
+	:param obj: Object or image to modify.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param offset: `-1` to undo, `1` to redo.
+	:type offset: :class:`int`
+	:return: `True` if the Source map was replaced.
+	:rtype: :class:`bool`"""
+	history = get_history(obj)
+	if history is None or not (history.can_undo() if offset < 0 else history.can_redo()):
+		return False
+
+	data = common.data
+	hyd = obj.hydra_erosion
+	index = history.position + offset
+	txt = history.reconstruct(index)
+
+	if hyd.map_result == hyd.map_source:
+		hyd.map_result = ""
+	data.try_release_map(hyd.map_source)
+	hyd.map_source = data.create_map(history.layers[index].name, txt)
+
+	history.position = index
+	history.tip = hyd.map_source
+	return True
+
+def discard(obj: bpy.types.Object | bpy.types.Image)->None:
+	"""Deletes the history of an entity."""
+	common.data.histories.pop(obj.session_uid, None)
@@ -0,0 +1,103 @@
+"""Module responsible for memoizing solver results. Rerunning a solver with settings used before on the same Source map
+restores the stored Result instead."""
+
+from Hydra.utils import texture
+from Hydra import common
+import bpy, bpy.types
+
+SOLVER_FIELDS: dict[str, tuple[str, ...]] = {
+	"particle": ("erosion_", "part_"),
+	"pipe": ("erosion_", "mei_"),
+	"thermal": ("thermal_", "scale_ratio"),
+}
+"""Prefixes of settings affecting results of each solver."""
+
+IGNORED_FIELDS: set[str] = {"erosion_solver", "erosion_advanced", "thermal_advanced", "mei_checkpoint", "mei_checkpoint_interval"}
+"""UI-only and bookkeeping settings, which never affect results."""
+
+def get_limit()->int:
+	"""Returns the result cache size limit.
+
+	:return: Limit in bytes. `0` if disabled.
+	:rtype: :class:`int`"""
+	try:
+		return common.get_preferences().result_cache_size * 2**20
+	except KeyError:	# not registered as an addon
+		return 0
+
+def get_key(obj: bpy.types.Object | bpy.types.Image, solver: str)->tuple:
+	"""Creates the result key for the current settings of an entity.
+
+	:param obj: Object or image to evaluate.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param solver: Solver name, see :data:`SOLVER_FIELDS`.
+	:type solver: :class:`str`
+	:return: Key starting with the Source map ID.
+	:rtype: :class:`tuple`"""
+	hyd = obj.hydra_erosion
+	prefixes = SOLVER_FIELDS[solver]
+	values = []
+	for name in hyd.bl_rna.properties.keys():
+		if not name.startswith(prefixes) or name in IGNORED_FIELDS:
+			continue
+		value = getattr(hyd, name)
+		if name.endswith("_src"):	# image inputs are identified by content
+			value = texture.get_image_version(bpy.data.images[value]) if value in bpy.data.images else ""
+		values.append((name, value))
+	return (hyd.map_source, solver, tuple(hyd.get_size()), tuple(values))
+
+def is_enabled(obj: bpy.types.Object | bpy.types.Image, solver: str)->bool:
+	"""Checks if results of a solver can be memoized for an entity.
+
+	:param obj: Object or image to evaluate.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param solver: Solver name, see :data:`SOLVER_FIELDS`.
+	:type solver: :class:`str`
+	:return: `False` if disabled in preferences or if the run continues a previous simulation state.
+	:rtype: :class:`bool`"""
+	if solver == "pipe" and obj.hydra_erosion.mei_continue_water:
+		return False
+	return get_limit() > 0
+
+def restore(obj: bpy.types.Object | bpy.types.Image, solver: str)->bool:
+	"""Sets a cached result as the Result map, if the current settings were used before.
+
+	:param obj: Object or image to modify.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param solver: Solver name, see :data:`SOLVER_FIELDS`.
+	:type solver: :class:`str`
+	:return: `True` if a result was restored.
+	:rtype: :class:`bool`"""
+	data = common.data
+	hyd = obj.hydra_erosion
+	if not is_enabled(obj, solver) or not data.has_map(hyd.map_base) or not data.has_map(hyd.map_source):
+		return False
+
+	entry = data.results.get(get_key(obj, solver))
+	if entry is None:
+		return False
+
+	name, size, raw = entry
+	data.try_release_map(hyd.map_result)
+	hyd.map_result = data.create_map(name, texture.create_texture(size, pixels=raw))
+	print("Restored cached result.")
+	return True
+
+def store(obj: bpy.types.Object | bpy.types.Image, solver: str, key: tuple | None = None)->None:
+	"""Stores the current Result map for the settings it was created with.
+
+	:param obj: Object or image to read.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param solver: Solver name, see :data:`SOLVER_FIELDS`.
+	:type solver: :class:`str`
+	:param key: Key created by :func:`get_key` when the run started. Settings can change during progressive runs. Uses the current settings if `None`.
+	:type key: :class:`tuple`"""
+	data = common.data
+	hyd = obj.hydra_erosion
+	if not is_enabled(obj, solver) or not data.has_map(hyd.map_result):
+		return
+
+	hm = data.get_map(hyd.map_result)
+	if key is None:
+		key = get_key(obj, solver)
+	data.results.put(key, hm.name, hm.size, hm.read(), get_limit())
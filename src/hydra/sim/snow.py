@@ -66,11 +66,8 @@ def simulate(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image|None:
 
 	snowProg["snow_add"] = (hyd.snow_add / 100) * SNOW_SCALE
 
-	group_x = math.ceil(size[0] / 32)
-	group_y = math.ceil(size[1] / 32)
-
 	snowProg["mapH"].value = mapI
-	snowProg.run(group_x = group_x, group_y = group_y)
+	data.shaders.dispatch("snow", size)
 
 	time = datetime.now()
 	for i in range(hyd.snow_iter_num):
@@ -78,12 +75,12 @@ def simulate(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image|None:
 
 		progA["diagonal"] = diagonal
 		progA["mapH"].value = mapI
-		progA.run(group_x = group_x, group_y = group_y)
+		data.shaders.dispatch("thermalA", size)
 
 		progB["diagonal"] = diagonal
 		progB["mapH"].value = mapI
 		progB["outH"].value = mapO
-		progB.run(group_x = group_x, group_y = group_y)
+		data.shaders.dispatch("thermalB", size)
 
 		temp = mapI
 		mapI = mapO
@@ -96,16 +93,13 @@ def simulate(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image|None:
 	ret = None
 
 	if hyd.snow_output != "displacement":
-		snow_img = snow if texture_only else texture.clone(snow)
-		snow_img.bind_to_image(5, read=True, write=True)
-		prog = data.shaders["scaling"]
-		prog["A"].value = 5	# snow
-		prog["scale"] = 1 / (SNOW_SCALE * hyd.snow_add / 100)
-		prog.run(group_x = size[0], group_y = size[1])
+		snow_img = heightmap.expand(snow, scale=1 / (SNOW_SCALE * hyd.snow_add / 100))
 
 		img_name = f"HYD_{obj.name}_Snow"
 		ret, ret_updated = texture.write_image(img_name, snow_img)
 		snow_img.release()
+		if texture_only:
+			snow.release()
 
 	if hyd.snow_output != "texture":
 		prog = data.shaders["scaled_add"]
@@ -113,7 +107,7 @@ def simulate(obj: bpy.types.Image | bpy.types.Object)->bpy.types.Image|None:
 		prog["B"].value = 4	# offset - source map
 		prog["factor"] = 1.0
 		prog["scale"] = 1.0
-		prog.run(group_x = size[0], group_y = size[1])
+		data.shaders.dispatch("scaled_add", size)
 
 		data.try_release_map(hyd.map_result)
 		name = common.increment_layer(data.get_map(hyd.map_source).name, "Snow 1")
@@ -12,6 +12,18 @@ from datetime import datetime
 def erode(obj: bpy.types.Image | bpy.types.Object)->None:
 	"""Erodes the specified entity. Can be run multiple times.
 	
+	:param obj: Object or image to erode.
+	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
+	for _ in erode_steps(obj):
+		pass
+
+@common.solver_steps
+def erode_steps(obj: bpy.types.Image | bpy.types.Object):
+	"""Erodes the specified entity step by step. See :func:`erode`.
+
+	Yields `(done, total, height)` after every iteration, where `height` is the current heightmap texture.
+	Sending `True` stops the run early, the Result is then created from the current state.
+	
 	:param obj: Object or image to erode.
 	:type obj: :class:`bpy.types.Object` or :class:`bpy.types.Image`"""
 	data = common.data
@@ -36,13 +48,20 @@ def erode(obj: bpy.types.Image | bpy.types.Object)->None:
 	mapO = 3
 	temp = 3
 
-	height.bind_to_image(1, read=True, write=True)
-	request.bind_to_image(2, read=True, write=True)
-	free.bind_to_image(3, read=True, write=True)
+	def bind():	# also called after yielding, previews use the same units
+		height.bind_to_image(1, read=True, write=True)
+		request.bind_to_image(2, read=True, write=True)
+		free.bind_to_image(3, read=True, write=True)
+
+	bind()
+
+	# settings read after yielding are copied, they stay editable during progressive runs
+	iterations = hyd.thermal_iter_num
+	stride_grad = hyd.thermal_stride_grad
 
 	stride = hyd.thermal_stride
-	if hyd.thermal_stride_grad:
-		next_pass = hyd.thermal_iter_num // 2
+	if stride_grad:
+		next_pass = iterations // 2
 
 	progA["requests"].value = 2
 	progA["Ks"] = (hyd.thermal_strength / 100) * 0.5	#0-1 -> 0-0.5, higher is unstable
@@ -56,35 +75,40 @@ def erode(obj: bpy.types.Image | bpy.types.Object)->None:
 	diagonal = hyd.thermal_solver == "diagonal"
 	alternate = hyd.thermal_solver == "both"
 
-	group_x = math.ceil(size[0] / 32)
-	group_y = math.ceil(size[1] / 32)
-
 	time = datetime.now()
-	for i in range(hyd.thermal_iter_num):
+	for i in range(iterations):
 		if alternate:
 			diagonal = (i&1) == 1
 
 		progA["diagonal"] = diagonal
 		progA["mapH"].value = mapI
 		progA["ds"] = stride
-		progA.run(group_x = group_x, group_y = group_y)
+		data.shaders.dispatch("thermalA", size)
 
 		progB["diagonal"] = diagonal
 		progB["mapH"].value = mapI
 		progB["outH"].value = mapO
 		progB["ds"] = stride
-		progB.run(group_x = group_x, group_y = group_y)
+		data.shaders.dispatch("thermalB", size)
 		
 		temp = mapI
 		mapI = mapO
 		mapO = temp
 
-		if hyd.thermal_stride_grad and i >= next_pass:
+		if stride_grad and i >= next_pass:
 			stride = math.ceil(stride / 2)
-			next_pass += (hyd.thermal_iter_num - i) // 2
+			next_pass += (iterations - i) // 2
+
+		if (yield (i + 1, iterations, height if mapI == 1 else free)):
+			print(f"Stopped at iteration {i + 1}")
+			break
+		bind()
 
 	ctx.finish()
 	print((datetime.now() - time).total_seconds())
+
+	if mapI != 1:	# the latest state is in the second texture after an odd number of iterations
+		height, free = free, height
 	
 	data.try_release_map(hyd.map_result)
 	
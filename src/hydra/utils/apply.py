@@ -2,9 +2,10 @@
 
 import bpy
 import numpy as np
+import moderngl as mgl
 from Hydra import common
 from Hydra.sim import heightmap
-from Hydra.utils import texture, nav, nodes
+from Hydra.utils import texture, nav, nodes, model, rtin
 import math
 
 # -------------------------------------------------- Previews
@@ -12,11 +13,21 @@ import math
 PREVIEW_MOD_NAME = "HYD_Preview_Modifier"
 """Preview modifier name."""
 PREVIEW_DISP_NAME = "HYDP_Preview_Displacement"
-"""Preview temporary image name."""
+"""Preview image name prefix. Every previewed object keeps its own image, see :func:`get_preview_names`."""
 PREVIEW_IMG_NAME = "HYDP_Image_Preview"	#different from object preview heightmap
 """Image preview name."""
 PREVIEW_GEO_NAME = "HYDP_Preview"
-"""Geometry Nodes group name."""
+"""Geometry Nodes group name prefix."""
+
+def get_preview_names(obj: bpy.types.Object)->tuple[str, str]:
+	"""Returns names of the preview image and node group of an object. Both persist between previews
+	and are only deleted by :func:`remove_preview`, so repeated previews update them in place.
+
+	:param obj: Previewed object.
+	:type obj: :class:`bpy.types.Object`
+	:return: Image and node group names.
+	:rtype: :class:`tuple[str, str]`"""
+	return f"{PREVIEW_DISP_NAME}_{obj.name}", f"{PREVIEW_GEO_NAME}_{obj.name}"
 
 def show_gen_modifier(obj: bpy.types.Object, visible: bool)->None:
 	"""Internal. Shows or hides the first modifier created by Hydra belonging to the specified object.
@@ -41,36 +52,73 @@ def add_preview(target: bpy.types.Object|bpy.types.Image)->None:
 		return
 
 	if isinstance(target, bpy.types.Image):
-		img, _ = texture.write_image(PREVIEW_IMG_NAME, data.get_map(hyd.map_result).texture)
+		img, _ = texture.write_image(PREVIEW_IMG_NAME, data.get_map(hyd.map_result).texture, pack=False)
 		nav.goto_image(img)
 	else:
-		if data.lastPreview and data.lastPreview in bpy.data.objects:
-			last = bpy.data.objects[data.lastPreview]
-			if last != target and PREVIEW_MOD_NAME in last.modifiers:
-				last.modifiers.remove(last.modifiers[PREVIEW_MOD_NAME])
-
-		if data.lastPreview != target.name and PREVIEW_GEO_NAME in bpy.data.node_groups:
-			g = bpy.data.node_groups[PREVIEW_GEO_NAME]
-			bpy.data.node_groups.remove(g)
-
-		show_gen_modifier(target, False)
-
 		if PREVIEW_MOD_NAME in target.modifiers:
-			mod = target.modifiers[PREVIEW_MOD_NAME]
 			common.data.add_message("Updated existing preview.")
 		else:
-			mod = target.modifiers.new(PREVIEW_MOD_NAME, "NODES")
 			common.data.add_message("Created preview modifier.")
 		
-		img = heightmap.get_displacement(target, PREVIEW_DISP_NAME)
-		mod.node_group = nodes.get_or_make_displace_group(PREVIEW_GEO_NAME, img)
-
-		common.data.lastPreview = target.name
+		size = data.get_map(hyd.map_result).size
+		name, _ = get_preview_names(target)
+		img = heightmap.get_displacement(target, name, level=heightmap.get_preview_level(target, size), pack=False)
+		set_preview_displacement(target, img)
 
 		nav.goto_modifier()
 
-def remove_preview()->None:
-	"""Removes the preview modifier from the last previewed object and deletes last preview image."""
+def set_preview_displacement(obj: bpy.types.Object, img: bpy.types.Image)->None:
+	"""Internal. Creates or updates the preview modifier of an object. Removes the preview of the last previewed object.
+
+	:param obj: Object to add to.
+	:type obj: :class:`bpy.types.Object`
+	:param img: Displacement image.
+	:type img: :class:`bpy.types.Image`"""
+	data = common.data
+	if data.lastPreview and data.lastPreview in bpy.data.objects:
+		last = bpy.data.objects[data.lastPreview]
+		if last != obj and PREVIEW_MOD_NAME in last.modifiers:
+			last.modifiers.remove(last.modifiers[PREVIEW_MOD_NAME])
+			show_gen_modifier(last, True)
+
+	show_gen_modifier(obj, False)
+
+	if PREVIEW_MOD_NAME in obj.modifiers:
+		mod = obj.modifiers[PREVIEW_MOD_NAME]
+	else:
+		mod = obj.modifiers.new(PREVIEW_MOD_NAME, "NODES")
+
+	_, group = get_preview_names(obj)
+	if mod.node_group is None or mod.node_group.name != group:
+		mod.node_group = nodes.get_or_make_displace_group(group, img)
+
+	node = mod.node_group.nodes.get("HYD_Displacement")
+	if node is not None and node.inputs[0].default_value != img:
+		node.inputs[0].default_value = img
+	data.lastPreview = obj.name
+
+def update_preview(target: bpy.types.Object|bpy.types.Image, height: mgl.Texture)->None:
+	"""Previews an intermediate solver state. Objects get a downsampled displacement, images are updated directly.
+
+	:param target: Object or image being eroded.
+	:type target: :class:`bpy.types.Object` or :class:`bpy.types.Image`
+	:param height: Current heightmap, in any resolution.
+	:type height: :class:`moderngl.Texture`"""
+	if isinstance(target, bpy.types.Image):
+		common.data.context.memory_barrier()	# height was written by image stores
+		img, updated = texture.write_image(PREVIEW_IMG_NAME, height, pack=False)
+		if not updated:
+			nav.goto_image(img)
+	else:
+		name, _ = get_preview_names(target)
+		img = heightmap.get_preview_displacement(target, height, name, common.get_preferences().preview_size)
+		set_preview_displacement(target, img)
+
+def remove_preview(keep: bool = False)->None:
+	"""Removes the preview modifier from the last previewed object and deletes all preview images and node groups.
+
+	:param keep: Only removes the modifier. Preview images and node groups are kept for following previews.
+	:type keep: :class:`bool`"""
 	data = common.data
 	if str(data.lastPreview) in bpy.data.objects:
 		last = bpy.data.objects[data.lastPreview]
@@ -83,24 +131,20 @@ def remove_preview()->None:
 			i.modifiers.remove(i.modifiers[PREVIEW_MOD_NAME])
 			show_gen_modifier(i, True)
 
+	data.lastPreview = ""
+	if keep:
+		return
+
 	if PREVIEW_MOD_NAME in bpy.data.textures:
 		txt = bpy.data.textures[PREVIEW_MOD_NAME]
 		bpy.data.textures.remove(txt)
 	
-	if PREVIEW_DISP_NAME in bpy.data.images:
-		img = bpy.data.images[PREVIEW_DISP_NAME]
-		bpy.data.images.remove(img)
-
-	if PREVIEW_IMG_NAME in bpy.data.images:
-		img = bpy.data.images[PREVIEW_IMG_NAME]
+	for img in [i for i in bpy.data.images if i.name.startswith(PREVIEW_DISP_NAME) or i.name == PREVIEW_IMG_NAME]:
 		bpy.data.images.remove(img)
 
-	if PREVIEW_GEO_NAME in bpy.data.node_groups:
-		g = bpy.data.node_groups[PREVIEW_GEO_NAME]
+	for g in [i for i in bpy.data.node_groups if i.name.startswith(PREVIEW_GEO_NAME)]:
 		bpy.data.node_groups.remove(g)
 
-	data.lastPreview = ""
-
 # -------------------------------------------------- Shaders
 
 H_NAME_BUMP = "Hydra Bump"
@@ -285,6 +329,64 @@ def add_modifier(obj: bpy.types.Object, img: bpy.types.Image)->None:
 	empty.scale = (sx,sy,1)
 	mod.texture_coords_object = empty
 
+# -------------------------------------------------- Direct
+
+SHAPE_NAME = "HYD_Shape"
+"""Shape key name for applied results."""
+
+def get_foreign_modifiers(obj: bpy.types.Object)->list[str]:
+	"""Returns enabled modifiers not created by Hydra.
+
+	:param obj: Object to check.
+	:type obj: :class:`bpy.types.Object`
+	:return: Modifier names.
+	:rtype: :class:`list[str]`"""
+	return [m.name for m in obj.modifiers if m.show_viewport and not m.name.startswith("HYD_")]
+
+def displace_mesh(obj: bpy.types.Object, as_shape: bool = False)->None:
+	"""Displaces mesh vertices by the difference of the Result and Base maps, without images or modifiers.
+	Every vertex samples the difference at its position normalized the same way as during heightmap generation.
+
+	Heightmaps are generated from the evaluated mesh, so this only matches when no other modifiers are enabled.
+	Raises `ValueError` otherwise, see :func:`get_foreign_modifiers`.
+
+	:param obj: Object to modify. Its Result and Base maps have to exist.
+	:type obj: :class:`bpy.types.Object`
+	:param as_shape: Writes the displaced positions into a shape key instead of the mesh.
+	:type as_shape: :class:`bool`"""
+	if (mods := get_foreign_modifiers(obj)):
+		raise ValueError(f"Direct apply needs an unmodified mesh. Apply or remove these modifiers first: {', '.join(mods)}")
+
+	dif = heightmap.get_displacement_texture(obj)
+	offsets = texture.read_into(dif)[..., 0]
+	dif.release()
+
+	mesh = obj.data
+	co = np.empty((len(mesh.vertices), 3), 'f')
+	mesh.vertices.foreach_get("co", co.ravel())
+
+	matrix = np.array(model.get_resize_matrix(obj)).reshape((4, 4))
+	uv = (co @ matrix[:2, :3].T + matrix[:2, 3] + 1) * 0.5	# normalized device coordinates to [0,1]
+	co[:, 2] += texture.sample_bilinear(offsets, uv)
+
+	if as_shape:
+		if mesh.shape_keys is None:
+			obj.shape_key_add(name="Basis", from_mix=False)
+		elif SHAPE_NAME in mesh.shape_keys.key_blocks:
+			obj.shape_key_remove(mesh.shape_keys.key_blocks[SHAPE_NAME])
+		shape = obj.shape_key_add(name=SHAPE_NAME, from_mix=False)
+		shape.data.foreach_set("co", co.ravel())
+		shape.value = 1
+	else:
+		mesh.vertices.foreach_set("co", co.ravel())
+	mesh.update()
+
+	for mod in [m for m in obj.modifiers if m.name.startswith("HYD_")]:	# would displace the mesh again
+		obj.modifiers.remove(mod)
+	guide = f"HYD_{obj.name}_Guide"
+	if guide in bpy.data.objects:
+		bpy.data.objects.remove(bpy.data.objects[guide])
+
 # -------------------------------------------------- Landscape
 
 def add_landscape(img: bpy.types.Image)->None:
@@ -294,47 +396,86 @@ def add_landscape(img: bpy.types.Image)->None:
 	:type img: :class:`bpy.types.Image`"""
 	hyd = img.hydra_erosion
 
-	if common.data.has_map(hyd.map_result):
-		displacement, _ = texture.write_image("HYD_Temp", common.data.get_map(hyd.map_result).texture)
-		free_img = True
-	else:
-		displacement = img
-		free_img = False
-
-	resX = math.ceil(img.size[0] / hyd.gen_subscale)
-	resY = math.ceil(img.size[1] / hyd.gen_subscale)
-
-	bpy.ops.mesh.primitive_grid_add(x_subdivisions=resX, y_subdivisions=resY, location=bpy.context.scene.cursor.location)
-	act = bpy.context.active_object
-
 	if "." in img.name:
 		name = img.name[:img.name.rfind(".")]
 	else:
 		name = img.name
 
-	act.name = f"HYD_Gen_{name}"
+	mesh = model.create_mesh(f"HYD_Gen_{name}", *get_landscape_geometry(img))
+
+	if bpy.context.object is not None and bpy.context.object.mode != "OBJECT":
+		bpy.ops.object.mode_set(mode="OBJECT")
+
+	act = bpy.data.objects.new(f"HYD_Gen_{name}", mesh)
+	act.location = bpy.context.scene.cursor.location
+	bpy.context.collection.objects.link(act)
+
 	for k in hyd.keys():
 		act.hydra_erosion[k] = hyd[k]
 	act.hydra_erosion.is_generated = True
-	act.scale[1] = img.size[1] / img.size[0]
 
-	for polygon in act.data.polygons:
-		polygon.use_smooth = True
+	for obj in bpy.context.selected_objects:
+		obj.select_set(False)
+	act.select_set(True)
+	bpy.context.view_layer.objects.active = act
 
-	mod = act.modifiers.new(PREVIEW_MOD_NAME, "NODES")
-	
-	mod.node_group = nodes.get_or_make_displace_group(PREVIEW_MOD_NAME, image=displacement)
+	nav.goto_object(act)
 
-	bpy.ops.object.mode_set(mode="OBJECT")	# modifiers can't be applied in EDIT mode
+def get_landscape_grid(img: bpy.types.Image)->tuple[int, int]:
+	"""Returns the vertex grid size of a generated landscape. Adaptive landscapes use square grids
+	of size `2^n + 1`, limited by :data:`Hydra.utils.rtin.MAX_GRID_SIZE`.
 
-	bpy.ops.object.transform_apply(scale=True, location=False, rotation=False, properties=False, isolate_users=False)
-	bpy.ops.object.modifier_apply(modifier=PREVIEW_MOD_NAME)
+	:param img: Image to generate from.
+	:type img: :class:`bpy.types.Image`
+	:return: Number of vertices along each axis.
+	:rtype: :class:`tuple[int, int]`"""
+	hyd = img.hydra_erosion
+	resX = math.ceil(img.size[0] / hyd.gen_subscale)
+	resY = math.ceil(img.size[1] / hyd.gen_subscale)
+
+	if hyd.gen_adaptive:
+		n = rtin.get_grid_size((resX, resY))
+		return (n, n)
+	else:
+		return (resX + 1, resY + 1)
+
+def get_landscape_geometry(img: bpy.types.Image)->tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Computes a landscape mesh from the Result map of an image, or from the image itself if there is no result.
+	The landscape is 2 units wide and centered at the origin. Adaptive landscapes are triangulated with :mod:`Hydra.utils.rtin`,
+	others are regular quad grids.
 	
-	bpy.data.node_groups.remove(bpy.data.node_groups[PREVIEW_MOD_NAME])
-	if free_img:
-		bpy.data.images.remove(displacement)
+	:param img: Image to generate from.
+	:type img: :class:`bpy.types.Image`
+	:return: Vertex positions of shape `(n, 3)`, faces of shape `(m, 3)` or `(m, 4)` and vertex UVs of shape `(n, 2)`.
+	:rtype: :class:`tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]`"""
+	hyd = img.hydra_erosion
+	data = common.data
 
-	nav.goto_object(act)
+	if data.has_map(hyd.map_result):
+		source = data.get_map(hyd.map_result).texture
+		free_source = False
+	else:
+		source = heightmap.generate_heightmap_from_image(img)
+		free_source = True
+
+	grid = get_landscape_grid(img)
+
+	# one height sample per grid vertex, resampled on the GPU
+	resized = heightmap.resize_texture(source, grid)
+	heights = texture.read_into(resized)[..., 0]
+	resized.release()
+	if free_source:
+		source.release()
+
+	if hyd.gen_adaptive:
+		used, faces = rtin.build_mesh(heights, hyd.gen_max_error)
+	else:
+		used = np.arange(grid[0] * grid[1], dtype=np.int32)
+		faces = model.get_grid_faces(grid)
+
+	uvs = np.stack(((used % grid[0]) / (grid[0] - 1), (used // grid[0]) / (grid[1] - 1)), axis=1).astype(np.float32)
+	vertices = np.stack(((uvs[:, 0] - 0.5) * 2, (uvs[:, 1] - 0.5) * 2 * img.size[1] / img.size[0], heights.ravel()[used]), axis=1)
+	return vertices, faces, uvs
 
 # -------------------------------------------------- Geometry Nodes
 
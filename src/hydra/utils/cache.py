@@ -0,0 +1,95 @@
+"""Module responsible for the persistent heightmap cache. Generated heightmaps are stored as `.npy` files
+keyed by the content of the evaluated mesh, so unchanged objects aren't rasterized again after a restart."""
+
+import bpy, bpy.types
+import numpy as np
+import moderngl as mgl
+import hashlib, os, tempfile
+from Hydra.utils import texture, model
+from Hydra import common
+
+CACHE_VERSION: int = 1
+"""Version of the cached data layout. Increase when heightmap generation changes its output."""
+
+def is_enabled()->bool:
+	"""Checks if the persistent cache is enabled in preferences.
+
+	:return: `True` if enabled.
+	:rtype: :class:`bool`"""
+	try:
+		return common.get_preferences().persistent_cache
+	except KeyError:	# not registered as an addon
+		return False
+
+def get_heightmap_key(obj: bpy.types.Object, *params)->str:
+	"""Hashes the evaluated mesh of an object together with its bounds and generation parameters.
+
+	:param obj: Object to hash.
+	:type obj: :class:`bpy.types.Object`
+	:param params: Additional values affecting the generated heightmap, e.g. size and scale.
+	:return: Hexadecimal key.
+	:rtype: :class:`str`"""
+	verts, inds = model.get_mesh_arrays(obj)
+
+	h = hashlib.blake2b(digest_size=16)
+	h.update(repr((CACHE_VERSION, tuple(tuple(v) for v in obj.bound_box), params)).encode())
+	h.update(verts)
+	h.update(inds)
+	return h.hexdigest()
+
+def load_heightmap(key: str, size: tuple[int,int])->mgl.Texture|None:
+	"""Loads a cached heightmap.
+
+	:param key: Cache key, see :func:`get_heightmap_key`.
+	:type key: :class:`str`
+	:param size: Expected heightmap size.
+	:type size: :class:`tuple[int,int]`
+	:return: Loaded texture or `None` if not cached.
+	:rtype: :class:`moderngl.Texture` or :class:`None`"""
+	path = common.get_cache_dir("heightmaps").joinpath(f"{key}.npy")
+	try:
+		ar = np.load(path)
+	except (OSError, ValueError):
+		return None
+
+	if ar.dtype != np.float32 or ar.shape != (size[1], size[0]):
+		path.unlink(missing_ok=True)
+		return None
+
+	os.utime(path)	# marks as recently used for pruning
+	return common.data.context.texture(size, 1, dtype="f4", data=ar)
+
+def store_heightmap(key: str, txt: mgl.Texture)->None:
+	"""Writes a heightmap into the cache and prunes old entries over the size limit.
+
+	:param key: Cache key, see :func:`get_heightmap_key`.
+	:type key: :class:`str`
+	:param txt: Heightmap to store.
+	:type txt: :class:`moderngl.Texture`"""
+	folder = common.get_cache_dir("heightmaps")
+	ar = texture.read_into(txt, pool="readback").reshape((txt.height, txt.width))
+
+	fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=folder)
+	with os.fdopen(fd, "wb") as f:
+		np.save(f, ar)
+	os.replace(tmp, folder.joinpath(f"{key}.npy"))	# atomic, concurrent readers never see partial files
+
+	prune(common.get_preferences().cache_limit * 2**20)
+
+def prune(limit: int)->None:
+	"""Deletes least recently used cached heightmaps until the cache fits into the limit.
+
+	:param limit: Cache size limit in bytes.
+	:type limit: :class:`int`"""
+	files = [(p, p.stat()) for p in common.get_cache_dir("heightmaps").glob("*.npy")]
+	total = sum(s.st_size for _, s in files)
+	for p, s in sorted(files, key=lambda i: i[1].st_mtime):
+		if total <= limit:
+			break
+		p.unlink(missing_ok=True)
+		total -= s.st_size
+
+def clear()->None:
+	"""Deletes all cached heightmaps."""
+	for p in common.get_cache_dir("heightmaps").glob("*.npy"):
+		p.unlink(missing_ok=True)
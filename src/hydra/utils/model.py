@@ -4,6 +4,12 @@ import numpy as np
 import bpy, bmesh
 import bpy.types
 import moderngl as mgl
+from contextlib import contextmanager
+from typing import Iterator
+from Hydra import common
+
+CHUNK_TRIANGLES: int = 2**20
+"""Number of triangles gathered and uploaded at once by :func:`create_unindexed_vao`."""
 
 # --------------------------------------------------------- Models
 
@@ -14,31 +20,118 @@ def create_vao(ctx: mgl.Context, program: mgl.Program, vertices:list[tuple[float
 	:type ctx: :class:`moderngl.Context`
 	:param program: Program to bind to the VAO.
 	:type program: :class:`moderngl.Program`
-	:param vertices: Optional list of 3D vertex position.
+	:param vertices: Optional list of 3D vertex position. Fullscreen quad if not specified, prefer :meth:`common.RenderCache.get_quad` for those.
 	:type vertices: :class:`list[tuple[float, float, float]]`
 	:param indices: Optional list of vertex indices.
 	:type indices: :class:`list[int]`
 	:return: Created VAO object.
 	:rtype: :class:`moderngl.VertexArray`"""
 	if vertices is None:
-		vertices = [(1,1,0), (1,-1,0), (-1,-1,0), (1,1,0), (-1,-1,0),  (-1,1,0)]
+		vertices = common.RenderCache.QUAD
 		indices = None
 		
-	vbo = ctx.buffer(data=np.array(vertices).astype('f4').tobytes())
+	vbo = ctx.buffer(data=np.ascontiguousarray(vertices, dtype='f4'))
 	if indices is None:
 		return ctx.vertex_array(
 			program=program,
 			content=[(vbo, "3f", "position")]
 		)
 	else:
-		ind = ctx.buffer(data=np.array(indices).tobytes())
+		ind = ctx.buffer(data=np.ascontiguousarray(indices, dtype='i4'))
 		return ctx.vertex_array(
 			program=program,
 			content=[(vbo, "3f", "position")], index_buffer=ind
 		)
 
-def evaluate_mesh(obj: bpy.types.Object)->bpy.types.Mesh:
-	"""Evaluates an object as a mesh.
+def create_unindexed_vao(ctx: mgl.Context, program: mgl.Program, vertices: np.ndarray, indices: np.ndarray)->mgl.VertexArray:
+	"""Creates a :class:`moderngl.VertexArray` object with vertices duplicated for every triangle.
+	Triangles are gathered and uploaded in chunks of :data:`CHUNK_TRIANGLES`, so the expanded vertex array is never fully stored in host memory.
+	
+	:param ctx: ModernGL context.
+	:type ctx: :class:`moderngl.Context`
+	:param program: Program to bind to the VAO.
+	:type program: :class:`moderngl.Program`
+	:param vertices: Vertex positions of shape `(n, 3)`.
+	:type vertices: :class:`numpy.ndarray`
+	:param indices: Triangle vertex indices of shape `(m, 3)`.
+	:type indices: :class:`numpy.ndarray`
+	:return: Created VAO object.
+	:rtype: :class:`moderngl.VertexArray`"""
+	vertices = np.asarray(vertices, dtype='f4').reshape((-1, 3))
+	triangles = np.asarray(indices).reshape((-1, 3))
+	stride = 3 * vertices.itemsize * 3	# bytes per triangle
+
+	vbo = ctx.buffer(reserve=len(triangles) * stride)
+	for start in range(0, len(triangles), CHUNK_TRIANGLES):
+		chunk = vertices[triangles[start:start + CHUNK_TRIANGLES].ravel()]
+		vbo.write(chunk, offset=start * stride)
+
+	return ctx.vertex_array(
+		program=program,
+		content=[(vbo, "3f", "position")]
+	)
+
+def create_mesh(name: str, vertices: np.ndarray, faces: np.ndarray, uvs: np.ndarray)->bpy.types.Mesh:
+	"""Creates a smooth shaded mesh with faces of equal vertex count.
+	Vertices, faces and UVs are set in bulk, without operators or per-element Python loops.
+	
+	:param name: Mesh name.
+	:type name: :class:`str`
+	:param vertices: Vertex positions of shape `(n, 3)`.
+	:type vertices: :class:`numpy.ndarray`
+	:param faces: Counterclockwise vertex indices of shape `(m, k)`.
+	:type faces: :class:`numpy.ndarray`
+	:param uvs: Texture coordinates of every vertex of shape `(n, 2)`.
+	:type uvs: :class:`numpy.ndarray`
+	:return: Created mesh.
+	:rtype: :class:`bpy.types.Mesh`"""
+	loops = np.ascontiguousarray(faces, dtype='i').ravel()
+	count, corners = faces.shape
+
+	mesh = bpy.data.meshes.new(name)
+	mesh.vertices.add(len(vertices))
+	mesh.vertices.foreach_set("co", np.ascontiguousarray(vertices, dtype='f').ravel())
+	mesh.loops.add(len(loops))
+	mesh.loops.foreach_set("vertex_index", loops)
+	mesh.polygons.add(count)
+	mesh.polygons.foreach_set("loop_start", np.arange(0, len(loops), corners, dtype='i'))
+	mesh.polygons.foreach_set("use_smooth", np.ones(count, dtype=bool))
+	mesh.uv_layers.new(name="UVMap").data.foreach_set("uv", np.ascontiguousarray(uvs[loops], dtype='f').ravel())
+
+	mesh.update(calc_edges=True)
+	return mesh
+
+def get_grid_faces(size: tuple[int,int])->np.ndarray:
+	"""Creates counterclockwise quads of a regular vertex grid stored row by row.
+	
+	:param size: Grid size in vertices.
+	:type size: :class:`tuple[int,int]`
+	:return: Vertex indices of shape `((size[0] - 1) * (size[1] - 1), 4)`.
+	:rtype: :class:`numpy.ndarray`"""
+	index = np.arange(size[0] * size[1], dtype='i').reshape((size[1], size[0]))
+	return np.stack((index[:-1, :-1], index[:-1, 1:], index[1:, 1:], index[1:, :-1]), axis=-1).reshape((-1, 4))
+
+def write_obj(path: str, vertices: np.ndarray, faces: np.ndarray, uvs: np.ndarray)->None:
+	"""Writes a mesh into a Wavefront OBJ file. Coordinates are converted to the Y-up convention of game engines.
+	
+	:param path: Output file path.
+	:type path: :class:`str`
+	:param vertices: Vertex positions of shape `(n, 3)`.
+	:type vertices: :class:`numpy.ndarray`
+	:param faces: Counterclockwise vertex indices of shape `(m, k)`.
+	:type faces: :class:`numpy.ndarray`
+	:param uvs: Texture coordinates of every vertex of shape `(n, 2)`.
+	:type uvs: :class:`numpy.ndarray`"""
+	with open(path, "w", encoding="utf-8") as f:
+		f.write("# Hydra landscape\n")
+		np.savetxt(f, np.stack((vertices[:, 0], vertices[:, 2], -vertices[:, 1]), axis=1), fmt="v %.6f %.6f %.6f")
+		np.savetxt(f, uvs, fmt="vt %.6f %.6f")
+		np.savetxt(f, np.repeat(faces + 1, 2, axis=1), fmt="f" + " %d/%d" * faces.shape[1])
+
+@contextmanager
+def evaluate_mesh(obj: bpy.types.Object)->Iterator[bpy.types.Mesh]:
+	"""Evaluates an object as a temporary mesh. The mesh is freed when the context exits
+	and never becomes a datablock in `bpy.data.meshes`.
 	
 	:param obj: Object to be evaluated.
 	:type obj: :class:`bpy.types.Object`
@@ -46,9 +139,72 @@ def evaluate_mesh(obj: bpy.types.Object)->bpy.types.Mesh:
 	:rtype: :class:`bpy.types.Mesh`"""
 	depsgraph = bpy.context.evaluated_depsgraph_get()
 	eval = obj.evaluated_get(depsgraph)
-	mesh = bpy.data.meshes.new_from_object(eval)
-	mesh.calc_loop_triangles()
-	return mesh
+	mesh = eval.to_mesh()
+	try:
+		mesh.calc_loop_triangles()
+		yield mesh
+	finally:
+		eval.to_mesh_clear()
+
+def get_mesh_arrays(obj: bpy.types.Object)->tuple[np.ndarray, np.ndarray]:
+	"""Returns vertex positions and triangle indices of an evaluated object.
+	Arrays are cached until the depsgraph reports a geometry change of the object, see :func:`on_depsgraph_update`.
+	
+	:param obj: Object to be evaluated.
+	:type obj: :class:`bpy.types.Object`
+	:return: Read-only vertex array of shape `(n, 3)` and triangle index array of shape `(m, 3)`.
+	:rtype: :class:`tuple[numpy.ndarray, numpy.ndarray]`"""
+	meshes = common.data.meshes
+	if obj.session_uid in meshes:
+		return meshes[obj.session_uid]
+
+	with evaluate_mesh(obj) as mesh:
+		verts = np.empty((len(mesh.vertices), 3), 'f')
+		inds = np.empty((len(mesh.loop_triangles), 3), 'i')
+
+		mesh.vertices.foreach_get(
+			"co", np.reshape(verts, len(mesh.vertices) * 3))
+		mesh.loop_triangles.foreach_get(
+			"vertices", np.reshape(inds, len(mesh.loop_triangles) * 3))
+
+	verts.flags.writeable = False
+	inds.flags.writeable = False
+	meshes[obj.session_uid] = (verts, inds)
+	return verts, inds
+
+@bpy.app.handlers.persistent
+def on_depsgraph_update(scene: bpy.types.Scene, depsgraph: bpy.types.Depsgraph)->None:
+	"""Drops cached mesh arrays of objects with changed geometry."""
+	meshes = common.data.meshes
+	if not meshes:
+		return
+	for update in depsgraph.updates:
+		if update.is_updated_geometry and isinstance(update.id, bpy.types.Object):
+			meshes.pop(update.id.original.session_uid, None)
+
+@bpy.app.handlers.persistent
+def on_reset(*args)->None:
+	"""Drops all cached mesh arrays. Undo and file loading can change meshes without geometry updates."""
+	common.data.meshes.clear()
+
+_handlers = (
+	(bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+	(bpy.app.handlers.undo_post, on_reset),
+	(bpy.app.handlers.redo_post, on_reset),
+	(bpy.app.handlers.load_post, on_reset),
+)
+
+def add_handlers()->None:
+	"""Registers mesh cache invalidation handlers."""
+	for handlers, fn in _handlers:
+		if fn not in handlers:
+			handlers.append(fn)
+
+def remove_handlers()->None:
+	"""Unregisters mesh cache invalidation handlers."""
+	for handlers, fn in _handlers:
+		if fn in handlers:
+			handlers.remove(fn)
 
 def get_resize_matrix(obj: bpy.types.Object)->tuple[float]:
 	"""
@@ -69,6 +225,28 @@ def get_resize_matrix(obj: bpy.types.Object)->tuple[float]:
 
 	return (dx,0,0,-cx*dx, 0,dy,0,-cy*dy, 0,0,-dz,0.5+cz*dz, 0,0,0,1)
 
+def get_tile_matrix(resize_matrix: tuple[float], size: tuple[int,int], viewport: tuple[int,int,int,int])->tuple[float]:
+	"""
+	Restricts a resizing matrix to a part of the heightmap, so that the part fills normalized device coordinates.
+
+	:param resize_matrix: Matrix fitting the object into the whole heightmap, see :func:`get_resize_matrix`.
+	:type resize_matrix: :class:`tuple[float]`
+	:param size: Size of the whole heightmap.
+	:type size: :class:`tuple[int,int]`
+	:param viewport: Part of the heightmap as `(x, y, width, height)` in pixels. May exceed the heightmap.
+	:type viewport: :class:`tuple[int,int,int,int]`
+	:return: Created tile matrix.
+	:rtype: :class:`tuple[float]`
+	"""
+	ret = list(resize_matrix)
+	for axis in range(2):
+		start = -1 + 2 * viewport[axis] / size[axis]
+		end = -1 + 2 * (viewport[axis] + viewport[axis + 2]) / size[axis]
+		s = 2 / (end - start)
+		row = ret[axis * 4:axis * 4 + 4]
+		ret[axis * 4:axis * 4 + 4] = [s * row[0], s * row[1], s * row[2], s * row[3] - s * (start + end) / 2]
+	return tuple(ret)
+
 def recalculate_scales(obj: bpy.types.Object)->None:
 	"""
 	Sets :data:`hydra_erosion.scale_ratio`, :data:`hydra_erosion.org_scale`, :data:`hydra_erosion.org_width` and :data:`hydra_erosion.height_scale` for the object.
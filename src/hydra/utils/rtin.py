@@ -0,0 +1,125 @@
+"""Module responsible for adaptive terrain triangulation. Implements a right-triangulated irregular network (RTIN),
+which splits triangles only where the heightmap deviates from their hypotenuse midpoints by more than a given error.
+
+The hierarchy is processed level by level with NumPy instead of one triangle at a time."""
+
+import numpy as np
+import math
+
+MAX_GRID_SIZE: int = 2**12 + 1
+"""Largest grid size. Computing errors keeps every level of the triangle hierarchy in memory. Together with temporary
+arrays of the finest level this peaks at roughly 1 GB for this size, and grows four times with every further doubling."""
+
+def get_grid_size(size: tuple[int,int])->int:
+	"""Returns the smallest RTIN grid size covering the specified resolution, limited by :data:`MAX_GRID_SIZE`.
+
+	:param size: Requested resolution.
+	:type size: :class:`tuple[int,int]`
+	:return: Grid size in vertices, in the form of `2^n + 1`.
+	:rtype: :class:`int`"""
+	return min(2 ** max(1, math.ceil(math.log2(max(size[0], size[1], 2)))) + 1, MAX_GRID_SIZE)
+
+def get_roots(tile: int)->tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Returns the two root triangles of a grid.
+
+	:param tile: Grid size minus one.
+	:type tile: :class:`int`
+	:return: Hypotenuse endpoints `a`, `b` and right angle vertices `c` as arrays of shape `(2, 2)`.
+	:rtype: :class:`tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]`"""
+	a = np.array(((0, 0), (tile, tile)), dtype=np.int32)
+	b = np.array(((tile, tile), (0, 0)), dtype=np.int32)
+	c = np.array(((tile, 0), (0, tile)), dtype=np.int32)
+	return a, b, c
+
+def split(a: np.ndarray, b: np.ndarray, c: np.ndarray)->tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Splits triangles at the midpoints of their hypotenuses.
+
+	:param a: First hypotenuse endpoints of shape `(n, 2)`.
+	:type a: :class:`numpy.ndarray`
+	:param b: Second hypotenuse endpoints of shape `(n, 2)`.
+	:type b: :class:`numpy.ndarray`
+	:param c: Right angle vertices of shape `(n, 2)`.
+	:type c: :class:`numpy.ndarray`
+	:return: Child triangles `(c, a, m)` followed by `(b, c, m)`, as arrays of shape `(2n, 2)`.
+	:rtype: :class:`tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]`"""
+	m = (a + b) >> 1
+	return np.concatenate((c, b)), np.concatenate((a, c)), np.concatenate((m, m))
+
+def compute_errors(heights: np.ndarray)->np.ndarray:
+	"""Computes the approximation error of every grid vertex. A vertex error is the largest height deviation
+	at the hypotenuse midpoints of the triangles, which are merged when this vertex is removed.
+	Heights between the midpoints aren't measured.
+
+	:param heights: Square height grid of size `2^n + 1`.
+	:type heights: :class:`numpy.ndarray`
+	:return: Errors of shape `(size, size)`.
+	:rtype: :class:`numpy.ndarray`"""
+	size = heights.shape[0]
+	if heights.shape != (size, size) or (size - 1) & (size - 2) or size < 3:
+		raise ValueError("RTIN heights have to be a square grid of size 2^n + 1.")
+	if size > MAX_GRID_SIZE:
+		raise ValueError(f"RTIN grids are limited to {MAX_GRID_SIZE}x{MAX_GRID_SIZE} vertices.")
+
+	flat = heights.ravel()
+	errors = np.zeros(size * size, dtype=np.float32)
+
+	levels = []
+	a, b, c = get_roots(size - 1)
+	while np.abs(a - c).sum(axis=1)[0] > 1:	# smallest triangles span two pixels along their hypotenuse
+		levels.append((a, b))
+		a, b, c = split(a, b, c)
+
+	for i, (a, b) in enumerate(reversed(levels)):	# children first
+		m = (a + b) >> 1
+		ia = a[:, 1] * size + a[:, 0]
+		ib = b[:, 1] * size + b[:, 0]
+		im = m[:, 1] * size + m[:, 0]
+
+		error = np.abs((flat[ia] + flat[ib]) * 0.5 - flat[im])
+		if i > 0:	# propagate errors of children, which are always split together with their parent
+			c = np.stack((m[:, 0] + m[:, 1] - a[:, 1], m[:, 1] + a[:, 0] - m[:, 0]), axis=1)
+			left = (a + c) >> 1
+			right = (b + c) >> 1
+			error = np.maximum(error, errors[left[:, 1] * size + left[:, 0]])
+			error = np.maximum(error, errors[right[:, 1] * size + right[:, 0]])
+		np.maximum.at(errors, im, error.astype(np.float32))
+
+	return errors.reshape((size, size))
+
+def triangulate(errors: np.ndarray, max_error: float)->np.ndarray:
+	"""Selects triangles approximating the heightmap. Triangles are split while the error at their hypotenuse midpoint exceeds `max_error`.
+
+	:param errors: Vertex errors, see :func:`compute_errors`.
+	:type errors: :class:`numpy.ndarray`
+	:param max_error: Error threshold at hypotenuse midpoints. Not a strict bound, other points can deviate more.
+	:type max_error: :class:`float`
+	:return: Counterclockwise triangles of shape `(n, 3)` as flat grid indices.
+	:rtype: :class:`numpy.ndarray`"""
+	size = errors.shape[0]
+	flat = errors.ravel()
+	ret = []
+
+	a, b, c = get_roots(size - 1)
+	while len(a) > 0:
+		m = (a + b) >> 1
+		splits = np.abs(a - c).sum(axis=1) > 1
+		splits[splits] = flat[m[splits, 1] * size + m[splits, 0]] > max_error
+
+		keep = ~splits
+		ret.append(np.stack([i[keep, 1] * size + i[keep, 0] for i in (a, c, b)], axis=1))
+		a, b, c = split(a[splits], b[splits], c[splits])
+
+	return np.concatenate(ret).astype(np.int32)
+
+def build_mesh(heights: np.ndarray, max_error: float)->tuple[np.ndarray, np.ndarray]:
+	"""Triangulates a heightmap and removes unused grid vertices.
+
+	:param heights: Square height grid of size `2^n + 1`.
+	:type heights: :class:`numpy.ndarray`
+	:param max_error: Error threshold at hypotenuse midpoints, see :func:`triangulate`.
+	:type max_error: :class:`float`
+	:return: Used grid indices of shape `(n,)` and triangles of shape `(m, 3)` indexing them.
+	:rtype: :class:`tuple[numpy.ndarray, numpy.ndarray]`"""
+	triangles = triangulate(compute_errors(heights), max_error)
+	used, triangles = np.unique(triangles, return_inverse=True)
+	return used.astype(np.int32), triangles.reshape((-1, 3)).astype(np.int32)
@@ -3,7 +3,7 @@
 import bpy, bpy.types
 import numpy as np
 import moderngl as mgl
-from Hydra.utils import model
+import hashlib, os
 from Hydra import common
 
 def get_or_make_image(size: 'tuple[int,int]', name: str)->tuple[bpy.types.Image, bool]:
@@ -26,35 +26,132 @@ def get_or_make_image(size: 'tuple[int,int]', name: str)->tuple[bpy.types.Image,
 	img.colorspace_settings.name = "Non-Color"
 
 	if tuple(img.size) != size:
-		img.scale(size[0], size[1])
+		if img.source == "GENERATED" and not img.packed_file:	# reallocates without resampling pixels, which get overwritten anyway
+			img.generated_width = size[0]
+			img.generated_height = size[1]
+		else:
+			img.scale(size[0], size[1])
 
 	img.hydra_erosion.is_generated = True
 	return img, updated
 
-def write_image(name: str, texture: mgl.Texture)->tuple[bpy.types.Image, bool]:
+def write_image(name: str, texture: mgl.Texture, level: int = 0, pack: bool = True)->tuple[bpy.types.Image, bool]:
 	"""Writes texture to an `Image` of the specified name.
 	
 	:param name: Image name.
 	:type name: :class:`str`
 	:param txt: Texture to be read.
 	:type txt: :class:`moderngl.Texture`
+	:param level: Mipmap level to write. Mipmaps have to be built first.
+	:type level: :class:`int`
+	:param pack: Packs the image into the blend file. Transient images, like previews, skip the encoding.
+	:type pack: :class:`bool`
 	:return: Created image.
 	:rtype: :class:`bpy.types.Image`"""
-	image, updated = get_or_make_image(texture.size, name)
+	size = get_level_size(texture.size, level)
+	image, updated = get_or_make_image(size, name)
+	_write_counts[name] = _write_counts.get(name, 0) + 1
 
 	if texture.components == 1:
-		pixels = np.frombuffer(texture.read(), dtype=np.float32)
-		pixels = [x for p in pixels for x in (p,p,p,1)]
-		image.pixels = pixels
+		pixels = common.data.buffers.get("image", (size[0] * size[1], 4))
+		pixels[:, :3] = read_into(texture, pool="readback", level=level).reshape((-1, 1))
+		pixels[:, 3] = 1
+		image.pixels.foreach_set(pixels.ravel())
 	elif texture.components == 2 or texture.components == 3:
 		raise ValueError("Two or three channel fill isn't supported.")
 	elif texture.components == 4:
-		image.pixels = np.frombuffer(texture.read(), dtype=np.float32)
+		image.pixels.foreach_set(read_into(texture, pool="readback", level=level).ravel())
 	
-	image.pack()
+	if pack:
+		image.pack()
+	else:
+		image.update()
 	return image, updated
 
-def create_texture(size: 'tuple[int,int]', pixels: bytes|None = None, image: bpy.types.Image|None = None, channels: int = 1)->mgl.Texture:
+def get_level_size(size: 'tuple[int,int]', level: int)->tuple[int,int]:
+	"""Computes the size of a mipmap level.
+
+	:param size: Full texture size.
+	:type size: :class:`tuple[int,int]`
+	:param level: Mipmap level. `0` is the full texture.
+	:type level: :class:`int`
+	:return: Level size.
+	:rtype: :class:`tuple[int,int]`"""
+	return (max(1, size[0] >> level), max(1, size[1] >> level))
+
+def read_into(txt: mgl.Texture, out: np.ndarray|None = None, viewport: 'tuple[int,int,int,int]|None' = None, pool: str|None = None, level: int = 0)->np.ndarray:
+	"""Reads texture data directly into a NumPy array, without allocating intermediate :class:`bytes`.
+
+	:param txt: Texture to read.
+	:type txt: :class:`moderngl.Texture`
+	:param out: Destination C-contiguous array. Allocated if not specified.
+	:type out: :class:`numpy.ndarray` or :class:`None`
+	:param viewport: Optional `(x, y, width, height)` rectangle to read. Reads the whole texture if not specified.
+	:type viewport: :class:`tuple[int,int,int,int]` or :class:`None`
+	:param pool: Name of a reused buffer, see :class:`Hydra.common.BufferPool`. Only used if `out` isn't specified.
+		Pooled arrays are overwritten by the next read with the same name, so they must not be kept.
+	:type pool: :class:`str` or :class:`None`
+	:param level: Mipmap level to read, see :func:`get_level_size`. Can't be combined with `viewport`.
+	:type level: :class:`int`
+	:return: `out` or an array of shape `(height, width, components)`.
+	:rtype: :class:`numpy.ndarray`"""
+	if viewport is not None and level != 0:
+		raise ValueError("Mipmap levels can't be read partially.")
+	x, y, w, h = viewport if viewport is not None else (0, 0, *get_level_size(txt.size, level))
+	shape = (h, w, txt.components)
+
+	if out is None:
+		out = common.data.buffers.get(pool, shape, txt.dtype) if pool else common.aligned_empty(shape, txt.dtype)
+	elif out.nbytes < w * h * txt.components * np.dtype(txt.dtype).itemsize:
+		raise ValueError("Output array is too small.")
+
+	if viewport is None:
+		txt.read_into(out, level=level)
+	else:
+		fbo = common.data.context.framebuffer(color_attachments=(txt,))
+		fbo.read_into(out, viewport=viewport, components=txt.components, dtype=txt.dtype)
+		fbo.release()
+	return out
+
+def sample_bilinear(pixels: np.ndarray, uv: np.ndarray)->np.ndarray:
+	"""Samples a single channel array with bilinear filtering and clamped edges, like a texture sampler.
+
+	:param pixels: Values of shape `(height, width)`.
+	:type pixels: :class:`numpy.ndarray`
+	:param uv: Normalized coordinates of shape `(n, 2)`. `(0, 0)` is the lower left corner of the first pixel.
+	:type uv: :class:`numpy.ndarray`
+	:return: Sampled values of shape `(n,)`.
+	:rtype: :class:`numpy.ndarray`"""
+	h, w = pixels.shape
+	x = np.clip(uv[:, 0] * w - 0.5, 0, w - 1)
+	y = np.clip(uv[:, 1] * h - 0.5, 0, h - 1)
+	x0 = np.minimum(x.astype(np.int32), w - 2) if w > 1 else np.zeros(len(x), dtype=np.int32)
+	y0 = np.minimum(y.astype(np.int32), h - 2) if h > 1 else np.zeros(len(y), dtype=np.int32)
+	x1 = np.minimum(x0 + 1, w - 1)
+	y1 = np.minimum(y0 + 1, h - 1)
+	fx = x - x0
+	fy = y - y0
+
+	bottom = pixels[y0, x0] * (1 - fx) + pixels[y0, x1] * fx
+	top = pixels[y1, x0] * (1 - fx) + pixels[y1, x1] * fx
+	return bottom * (1 - fy) + top * fy
+
+def read_pixels(image: bpy.types.Image, channel: int|None = None)->np.ndarray:
+	"""Reads image pixels into a `float32` array without iterating them in Python.
+
+	:param image: Image to read.
+	:type image: :class:`bpy.types.Image`
+	:param channel: Optional channel index. If set, only this channel is returned.
+	:type channel: :class:`int` or :class:`None`
+	:return: Flat contiguous array of all channels, or of the selected channel.
+	:rtype: :class:`numpy.ndarray`"""
+	pixels = np.empty(image.size[0] * image.size[1] * image.channels, dtype=np.float32)
+	image.pixels.foreach_get(pixels)
+	if channel is not None:
+		return np.ascontiguousarray(pixels[channel::image.channels])
+	return pixels
+
+def create_texture(size: 'tuple[int,int]', pixels: bytes|None = None, image: bpy.types.Image|None = None, channels: int = 1, dtype: str = "f4")->mgl.Texture:
 	"""Creates a :class:`moderngl.Texture` of the specified size.
 	
 	:param size: Resolution tuple.
@@ -65,6 +162,8 @@ def create_texture(size: 'tuple[int,int]', pixels: bytes|None = None, image: bpy
 	:type image: :class:`bpy.types.Image`
 	:param channels: Channel count.
 	:type channels: :class:`int`
+	:param dtype: Texture data type. Integer types (`i4`, `u4`) can't be created from images.
+	:type dtype: :class:`str`
 	:return: Created texture.
 	:rtype: :class:`moderngl.Texture`"""
 
@@ -77,28 +176,24 @@ def create_texture(size: 'tuple[int,int]', pixels: bytes|None = None, image: bpy
 	ctx = data.context
 
 	if image is not None:
-		pixels = np.array(image.pixels).astype('f4').tobytes()
-		color = ctx.texture(tuple(image.size), 4, dtype="f4", data=pixels)
+		color = ctx.texture(tuple(image.size), image.channels, dtype="f4", data=read_pixels(image))
 		
-		dest = ctx.texture(size, channels, dtype="f4")
-		
-		vao = model.create_vao(ctx, data.programs["redraw"])
-		fbo = ctx.framebuffer(color_attachments=(dest))
-		scope = ctx.scope(fbo)
-		with scope:
+		fbo = data.render.get_framebuffer(size, channels)
+		vao = data.render.get_quad(data.programs["redraw"])
+		with ctx.scope(fbo):
 			color.use(location=0)
 			vao.program["source"].value = 0
 			vao.program["linearize"] = not image.is_float
 			vao.render()
-		
-		fbo.release()
-		vao.release()
 		color.release()
+
+		dest = ctx.texture(size, channels, dtype="f4")
+		ctx.copy_framebuffer(dest, fbo)
 		return dest
 	else:
 		if pixels is None:	#pixels have to be cleared to zero if not specified!
-			pixels = np.zeros(size[0] * size[1] * channels, dtype='f4').tobytes()
-		return ctx.texture(size, channels, dtype="f4", data=pixels)
+			pixels = np.zeros(size[0] * size[1] * channels, dtype=dtype).tobytes()
+		return ctx.texture(size, channels, dtype=dtype, data=pixels)
 	
 def clone(txt: mgl.Texture)->mgl.Texture:
 	"""Clones a :class:`moderngl.Texture`.
@@ -107,4 +202,95 @@ def clone(txt: mgl.Texture)->mgl.Texture:
 	:type txt: :class:`mgl.Texture`
 	:return: Created texture.
 	:rtype: :class:`moderngl.Texture`"""
-	return common.data.context.texture(txt.size, txt.components, dtype="f4", data=txt.read())
+	return common.data.context.texture(txt.size, txt.components, dtype="f4", data=read_into(txt, pool="readback"))
+
+def get_statistics(txt: mgl.Texture, golden: np.ndarray|None = None)->dict[str, float|str]:
+	"""Computes a checksum and value statistics of a single channel texture.
+
+	The checksum is taken over the raw pixel data, so it only matches for bit-identical results.
+
+	:param txt: Texture to be evaluated.
+	:type txt: :class:`moderngl.Texture`
+	:param golden: Optional reference values of the same pixel count to compute errors against.
+	:type golden: :class:`numpy.ndarray`
+	:return: Dictionary with `checksum`, `mean`, `min`, `max` and, if `golden` is set, `rmse` and `max_error`.
+	:rtype: :class:`dict`"""
+	raw = read_into(txt, pool="readback")
+	pixels = raw[..., 0].ravel()
+
+	ret = {
+		"checksum": hashlib.sha256(raw).hexdigest()[:16],
+		"mean": float(pixels.mean(dtype=np.float64)),
+		"min": float(pixels.min()),
+		"max": float(pixels.max()),
+	}
+
+	if golden is not None:
+		if golden.size != pixels.size:
+			raise ValueError("Golden map size doesn't match the texture.")
+		dif = pixels.astype(np.float64) - golden.ravel()
+		ret["rmse"] = float(np.sqrt(np.mean(dif * dif)))
+		ret["max_error"] = float(np.abs(dif).max())
+
+	return ret
+
+def get_image_version(img: bpy.types.Image)->str:
+	"""Computes a version string of an image, which changes whenever its pixels or interpretation change.
+
+	:param img: Image to evaluate.
+	:type img: :class:`bpy.types.Image`
+	:return: Hexadecimal digest.
+	:rtype: :class:`str`"""
+	pixels = read_pixels(img)
+
+	h = hashlib.blake2b(digest_size=16)
+	h.update(repr((img.name, tuple(img.size), img.colorspace_settings.name)).encode())
+	h.update(pixels.tobytes())
+	return h.hexdigest()
+
+_write_counts: dict[str, int] = {}
+"""Number of writes into images by name. Packing written images clears their dirty flag, so writes are counted instead."""
+
+def get_image_key(img: bpy.types.Image)->tuple:
+	"""Creates a key, which changes whenever pixels or interpretation of an image change.
+	Cheap for unmodified images, hashes pixels only for images with unsaved changes.
+
+	:param img: Image to evaluate.
+	:type img: :class:`bpy.types.Image`
+	:return: Hashable key.
+	:rtype: :class:`tuple`"""
+	path = bpy.path.abspath(img.filepath_raw) if img.filepath_raw and not img.packed_file else ""
+	mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+	ret = (img.name, tuple(img.size), img.channels, img.is_float, img.colorspace_settings.name, img.source,
+		path, mtime, _write_counts.get(img.name, 0))
+	if img.is_dirty:
+		ret += (get_image_version(img),)
+	return ret
+
+def get_input_texture(img: bpy.types.Image, size: 'tuple[int,int]', channels: int = 1)->mgl.Texture:
+	"""Returns an image resampled into a texture, see :func:`create_texture`. Textures are cached on the GPU
+	until the image changes, so repeated runs with the same input images skip conversion and upload.
+
+	The returned texture is owned by the cache. Don't release or modify it, use :func:`clone` for writable copies.
+
+	:param img: Source image.
+	:type img: :class:`bpy.types.Image`
+	:param size: Texture size.
+	:type size: :class:`tuple[int,int]`
+	:param channels: Channel count.
+	:type channels: :class:`int`
+	:return: Cached texture.
+	:rtype: :class:`moderngl.Texture`"""
+	inputs = common.data.inputs
+	key = (img.name, tuple(size), channels)
+	version = get_image_key(img)
+
+	if key in inputs:
+		cached_version, txt = inputs[key]
+		if cached_version == version:
+			return txt
+		txt.release()
+
+	txt = create_texture(tuple(size), channels=channels, image=img)
+	inputs[key] = (version, txt)
+	return txt